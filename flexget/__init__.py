@@ -8,6 +8,8 @@ from flexget import logger
 from flexget.options import CoreArgumentParser
 from flexget import plugin
 from flexget.manager import Manager
+from flexget.daemon import Daemon
+from flexget.utils import trace
 
 __version__ = '{git}'
 
@@ -19,18 +21,26 @@ def main():
 
     logger.initialize()
 
-    parser = CoreArgumentParser()
-    plugin.load_plugins(parser)
+    # Start tracing before options are parsed, so that plugin loading is included
+    if any(arg.startswith('--trace-file') for arg in sys.argv):
+        trace.start()
 
-    options = parser.parse_args()
+    with trace.span('startup', 'manager'):
+        parser = CoreArgumentParser()
+        with trace.span('load plugins', 'plugin'):
+            plugin.load_plugins(parser, lazy=True)
 
-    try:
-        manager = Manager(options)
-    except IOError as e:
-        # failed to load config, TODO: why should it be handled here? So sys.exit isn't called in webui?
-        log.critical(e)
-        logger.flush_logging_to_console()
-        sys.exit(1)
+        options = parser.parse_args()
+        if not options.trace_file:
+            trace.stop()
+
+        try:
+            manager = Manager(options)
+        except IOError as e:
+            # failed to load config, TODO: why should it be handled here? So sys.exit isn't called in webui?
+            log.critical(e)
+            logger.flush_logging_to_console()
+            sys.exit(1)
 
     log_level = logging.getLevelName(options.loglevel.upper())
     log_file = os.path.expanduser(manager.options.logfile)
@@ -39,12 +49,18 @@ def main():
         log_file = os.path.join(manager.config_base, log_file)
     logger.start(log_file, log_level)
 
-    if options.profile:
-        try:
-            import cProfile as profile
-        except ImportError:
-            import profile
-        profile.runctx('manager.execute()', globals(), locals(), os.path.join(manager.config_base, 'flexget.profile'))
-    else:
-        manager.execute()
-    manager.shutdown()
+    try:
+        if options.daemon:
+            Daemon(manager).run()
+        elif options.profile:
+            try:
+                import cProfile as profile
+            except ImportError:
+                import profile
+            profile.runctx('manager.execute()', globals(), locals(),
+                           os.path.join(manager.config_base, 'flexget.profile'))
+        else:
+            manager.execute()
+        manager.shutdown()
+    finally:
+        trace.stop(options.trace_file)
@@ -0,0 +1,340 @@
+from __future__ import unicode_literals, division, absolute_import
+import os
+import sys
+import copy
+import json
+import heapq
+import socket
+import logging
+import threading
+import Queue
+import SocketServer
+from datetime import datetime
+
+from flexget import validator
+from flexget.logger import FlexGetFormatter
+from flexget.manager import register_config_key
+from flexget.utils.tools import parse_timedelta
+
+log = logging.getLogger('daemon')
+
+DEFAULT_INTERVAL = '1 hour'
+# Longest time daemon sleeps without checking config file and refreshing the lock file
+POLL_INTERVAL = 60
+# Options which are passed from `flexget --task X` to a running daemon, others only apply to the daemon itself
+EXECUTION_OPTIONS = ['onlytask', 'learn', 'nocache', 'retry', 'interval_ignore']
+# Marks end of execution output sent over control socket
+EOF = 'EOF'
+
+
+def daemon_config_validator():
+    root = validator.factory('dict')
+    root.accept('interval', key='interval')
+    root.accept('integer', key='port')
+    return root
+
+register_config_key('daemon', daemon_config_validator)
+
+
+def read_lockfile(lockfile):
+    """
+    :param string lockfile: Path to lock file written by manager.
+    :returns: Dict of fields in lock file, keys are lower case. Contains `port` and `token` if lock is held by a daemon.
+    """
+    info = {}
+    try:
+        with open(lockfile) as f:
+            for line in f:
+                if ':' in line:
+                    key, value = line.split(':', 1)
+                    info[key.strip().lower()] = value.strip()
+    except IOError:
+        pass
+    return info
+
+
+def send_execution(lockfile, options):
+    """
+    Hand execution over to a running daemon, and print its output.
+
+    :param string lockfile: Lock file of the daemon.
+    :param options: Parsed options, only :data:`EXECUTION_OPTIONS` are passed to the daemon.
+    :returns: Exit code for the process.
+    """
+    info = read_lockfile(lockfile)
+    request = {'token': info.get('token'),
+               'loglevel': getattr(options, 'loglevel', 'verbose'),
+               'options': dict((name, getattr(options, name)) for name in EXECUTION_OPTIONS if hasattr(options, name))}
+    try:
+        sock = socket.create_connection(('127.0.0.1', int(info['port'])))
+    except (socket.error, ValueError) as e:
+        print >> sys.stderr, 'Unable to connect to FlexGet daemon (PID: %s): %s' % (info.get('pid'), e)
+        print >> sys.stderr, 'If you\'re sure the daemon is not running, delete %s' % lockfile
+        return 1
+    try:
+        stream = sock.makefile('rw')
+        stream.write(json.dumps(request) + '\n')
+        stream.flush()
+        for line in stream:
+            if line.rstrip('\r\n') == EOF:
+                return 0
+            sys.stdout.write(line)
+    except socket.error as e:
+        print >> sys.stderr, 'Lost connection to FlexGet daemon: %s' % e
+    finally:
+        sock.close()
+    return 1
+
+
+class ControlHandler(SocketServer.StreamRequestHandler):
+    """Receives one execution request per connection and waits until daemon has executed it."""
+
+    def handle(self):
+        daemon = self.server.daemon
+        try:
+            request = json.loads(self.rfile.readline())
+        except ValueError:
+            log.warning('Invalid request from %s:%s' % self.client_address)
+            return
+        if request.get('token') != daemon.token:
+            log.warning('Request with invalid token from %s:%s' % self.client_address)
+            self.wfile.write('Invalid token, is the lock file from this daemon?\n')
+            return
+        done = threading.Event()
+        daemon.queue.put((request, self.wfile, done))
+        done.wait()
+
+
+class ControlServer(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class Daemon(object):
+    """
+    Keeps the :class:`~flexget.manager.Manager` running and executes tasks on schedule, so that startup costs
+    (plugin loading, config parsing and validation, database setup) are paid only once and caches stay warm
+    between executions.
+
+    Each task is executed every ``schedule`` interval given in its config, or the ``interval`` from the root
+    ``daemon`` config (default 1 hour). Next execution of a task is scheduled from the time its previous
+    execution completed. Config is reloaded when the config file has been modified.
+
+    ``flexget --task X`` (or any normal run) started while the daemon is running hands the execution over to
+    the daemon via control socket listening on localhost, at ``port`` from the ``daemon`` config (default is any
+    free port). Port and access token are written to the lock file.
+    """
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.queue = Queue.Queue()
+        self.token = os.urandom(16).encode('hex')
+        self.server = None
+        self.running = False
+        # heap of (time, task name), entries not matching next_run are outdated and skipped
+        self.schedule = []
+        self.next_run = {}
+        self.config_mtime = self._config_mtime()
+
+    @property
+    def config(self):
+        return self.manager.config.get('daemon') or {}
+
+    def _config_mtime(self):
+        if not self.manager.config_path:
+            return None
+        try:
+            return os.path.getmtime(self.manager.config_path)
+        except OSError:
+            return None
+
+    def task_config(self, name):
+        """:returns: Config of task *name* as it is in the config file."""
+        for key, config in self.manager.config.get('tasks', {}).iteritems():
+            # numeric task names are turned into strings by manager
+            if unicode(key) == name:
+                return config
+
+    def task_interval(self, name):
+        """
+        :param string name: Task name
+        :returns: Time between executions of the task.
+        :rtype: timedelta
+        """
+        task_config = self.task_config(name) or {}
+        return parse_timedelta(task_config.get('schedule') or self.config.get('interval', DEFAULT_INTERVAL))
+
+    def update_schedule(self):
+        """Schedule all enabled tasks, new tasks are scheduled to be executed right away."""
+        now = datetime.now()
+        self.next_run = dict((name, self.next_run.get(name, now)) for name in self.manager.tasks
+                             if not name.startswith('_'))
+        self.schedule = [(when, name) for name, when in self.next_run.iteritems()]
+        heapq.heapify(self.schedule)
+
+    def reschedule(self, names):
+        now = datetime.now()
+        for name in names:
+            if name not in self.next_run:
+                continue
+            when = now + self.task_interval(name)
+            self.next_run[name] = when
+            heapq.heappush(self.schedule, (when, name))
+            log.debug('Next execution of %s at %s' % (name, when))
+
+    def pop_due(self, now=None):
+        """
+        :returns: Names of tasks scheduled to be executed at *now* or before, they are removed from schedule.
+        """
+        now = now or datetime.now()
+        due = []
+        while self.schedule and self.schedule[0][0] <= now:
+            when, name = heapq.heappop(self.schedule)
+            if self.next_run.get(name) == when:
+                due.append(name)
+        return due
+
+    def seconds_to_next(self):
+        if not self.schedule:
+            return POLL_INTERVAL
+        delta = self.schedule[0][0] - datetime.now()
+        seconds = delta.days * 86400 + delta.seconds + delta.microseconds / 1000000
+        return min(max(seconds, 0), POLL_INTERVAL)
+
+    def check_config(self):
+        """Reload config if config file has been modified. Previous config is kept if new one is not valid."""
+        mtime = self._config_mtime()
+        if mtime == self.config_mtime:
+            return
+        self.config_mtime = mtime
+        manager = self.manager
+        log.info('Config file modified, reloading')
+        old_config = manager.config
+        try:
+            manager.load_config(manager.config_path)
+        except SystemExit:
+            # load_config exits on malformed file
+            log.error('Failed to load modified config, using previous config')
+            return
+        manager.load_config_plugins()
+        errors = manager.validate_config()
+        if errors:
+            for error in errors:
+                log.critical(error)
+            log.error('Modified config is not valid, using previous config')
+            manager.config = old_config
+            return
+        manager.create_tasks()
+        self.update_schedule()
+
+    def write_lock(self):
+        """Add control socket address to the lock file, readable only by the owner since it contains the token."""
+        fd = os.open(self.manager.lockfile, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0600)
+        with os.fdopen(fd, 'w') as f:
+            f.write('PID: %s\nPort: %s\nToken: %s\n' % (os.getpid(), self.server.server_address[1], self.token))
+
+    def touch_lock(self):
+        """Keep lock file fresh, old lock files are ignored."""
+        try:
+            os.utime(self.manager.lockfile, None)
+        except OSError as e:
+            log.warning('Unable to update lock file %s: %s' % (self.manager.lockfile, e))
+
+    def start_server(self):
+        self.server = ControlServer(('127.0.0.1', self.config.get('port', 0)), ControlHandler)
+        self.server.daemon = self
+        thread = threading.Thread(target=self.server.serve_forever, name='daemon-control')
+        thread.daemon = True
+        thread.start()
+        self.write_lock()
+        log.debug('Control socket listening on %s:%s' % self.server.server_address)
+
+    def stop_server(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def execute(self, tasks=None, options=None):
+        """
+        Execute tasks with fresh copies of their config.
+
+        :param list tasks: Names of tasks to execute, all tasks otherwise.
+        :param dict options: Options to override for this execution.
+        """
+        manager = self.manager
+        for name, task in manager.tasks.iteritems():
+            # presets are merged and tasks disabled (eg. by --task) in place during execution
+            task.config = copy.deepcopy(self.task_config(name))
+            task.enabled = not name.startswith('_')
+        old_options = manager.options
+        if options:
+            manager.options = copy.copy(old_options)
+            for name, value in options.iteritems():
+                setattr(manager.options, name, value)
+        try:
+            manager.execute(tasks=tasks)
+        finally:
+            manager.options = old_options
+
+    def handle_request(self, request, output):
+        """Execute request received from control socket, log output is sent back to the client."""
+        level = logging.getLevelName(request.get('loglevel', 'verbose').upper())
+        handler = logging.StreamHandler(output)
+        handler.setFormatter(FlexGetFormatter())
+        handler.setLevel(level)
+        root = logging.getLogger()
+        old_level = root.level
+        # daemon may be logging less than the client asked for (eg. started with --cron)
+        root.setLevel(min(level, root.getEffectiveLevel()))
+        root.addHandler(handler)
+        try:
+            self.execute(options=dict((name, value) for name, value in (request.get('options') or {}).iteritems()
+                                      if name in EXECUTION_OPTIONS))
+        finally:
+            root.removeHandler(handler)
+            root.setLevel(old_level)
+        try:
+            output.write(EOF + '\n')
+            output.flush()
+        except socket.error as e:
+            log.debug('Client disconnected: %s' % e)
+
+    def stop(self):
+        """Stop the daemon after current execution."""
+        self.running = False
+        # wake up main loop
+        self.queue.put(None)
+
+    def run(self):
+        """Run until :meth:`stop` is called or interrupted."""
+        self.running = True
+        self.start_server()
+        self.update_schedule()
+        log.info('Daemon started (PID: %s)' % os.getpid())
+        try:
+            while self.running:
+                self.touch_lock()
+                self.check_config()
+                try:
+                    item = self.queue.get(timeout=self.seconds_to_next())
+                except Queue.Empty:
+                    item = None
+                if item:
+                    request, output, done = item
+                    try:
+                        self.handle_request(request, output)
+                    finally:
+                        done.set()
+                due = self.pop_due()
+                if due:
+                    try:
+                        self.execute(tasks=due)
+                    finally:
+                        self.reschedule(due)
+                    self.manager.db_cleanup()
+        except KeyboardInterrupt:
+            log.info('Daemon interrupted')
+        finally:
+            self.stop_server()
+        log.info('Daemon stopped')
@@ -2,13 +2,30 @@ from __future__ import unicode_literals, division, absolute_import
 from exceptions import Exception, UnicodeDecodeError, TypeError, KeyError
 import logging
 import copy
+import weakref
+from datetime import date, time, timedelta
 
 from flexget.plugin import PluginError
 from flexget.utils.imdb import extract_id, make_url
 from flexget.utils.template import render_from_entry
+from flexget.utils import trace
 
 log = logging.getLogger('entry')
 
+# Values of these types can be shared between entry and its snapshots
+IMMUTABLE_TYPES = (basestring, int, long, float, bool, type(None), date, time, timedelta)
+
+
+def is_immutable(value):
+    """
+    :return: True if *value* cannot be modified in place, and can therefore be shared instead of copied.
+    """
+    if isinstance(value, IMMUTABLE_TYPES):
+        return True
+    if isinstance(value, (tuple, frozenset)):
+        return all(is_immutable(item) for item in value)
+    return False
+
 
 class EntryUnicodeError(Exception):
     """This exception is thrown when trying to set non-unicode compatible field value to entry."""
@@ -38,10 +55,11 @@ class LazyField(object):
 
     def __call__(self):
         # Return a result from the first lookup function which succeeds
-        for func in self.funcs[:]:
-            result = func(self.entry, self.field)
-            if result is not None:
-                return result
+        with trace.span(self.field, 'lazy field'):
+            for func in self.funcs[:]:
+                result = func(self.entry, self.field)
+                if result is not None:
+                    return result
 
     def __str__(self):
         return str(self())
@@ -67,9 +85,15 @@ class Entry(dict):
     and trigger :meth:`~flexget.task.Task.abort`.
     """
 
+    # Mutable values shared with snapshots by field name, copied when field is accessed. Never modified in place,
+    # so that copies of entry do not share changes.
+    _shared = {}
+
     def __init__(self, *args, **kwargs):
         self.traces = []
         self.snapshots = {}
+        # weak references to EntryContainers holding this entry, notified about state changes
+        self._containers = []
         self._state = 'undecided'
         self.task = None
 
@@ -81,6 +105,27 @@ class Entry(dict):
         # Make sure constructor does not escape our __setitem__ enforcement
         self.update(*args, **kwargs)
 
+    def _get_state(self):
+        return self._state_value
+
+    def _set_state(self, state):
+        old_state = self.__dict__.get('_state_value')
+        self._state_value = state
+        for ref in self.__dict__.get('_containers', []):
+            container = ref()
+            if container is not None:
+                container._state_changed(self, old_state, state)
+
+    _state = property(_get_state, _set_state)
+
+    def _add_container(self, container):
+        """Register :class:`~flexget.task.EntryContainer` to be notified when state of this entry changes."""
+        containers = [ref for ref in self.__dict__.get('_containers', []) if ref() is not None]
+        if not any(ref() is container for ref in containers):
+            containers.append(weakref.ref(container))
+        # new list, so that copies of this entry do not share it
+        self._containers = containers
+
     def trace(self, message, operation=None, plugin=None):
         """
         Adds trace message to the entry which should contain useful information about why
@@ -177,8 +222,15 @@ class Entry(dict):
         except Exception as e:
             log.debug('trying to debug key `%s` value threw exception: %s' % (key, e))
 
+        if key in self._shared:
+            self._unshare(key)
         dict.__setitem__(self, key, value)
 
+    def _unshare(self, key):
+        shared = dict(self._shared)
+        del shared[key]
+        self._shared = shared
+
     def update(self, *args, **kwargs):
         """Overridden so our __setitem__ is not avoided."""
         if args:
@@ -187,6 +239,14 @@ class Entry(dict):
             other = dict(args[0])
             for key in other:
                 self[key] = other[key]
+            # values shared with snapshots of other entry must be copied before they are modified here as well
+            source_shared = getattr(args[0], '_shared', None)
+            if source_shared:
+                shared = dict(self._shared)
+                for key, value in source_shared.iteritems():
+                    if dict.get(self, key) is value:
+                        shared[key] = value
+                self._shared = shared
         for key in kwargs:
             self[key] = kwargs[key]
 
@@ -199,6 +259,8 @@ class Entry(dict):
     def __getitem__(self, key):
         """Supports lazy loading of fields. If a stored value is a :class:`LazyField`, call it, return the result."""
         result = dict.__getitem__(self, key)
+        if key in self._shared:
+            result = self._copy_shared(key, result)
         if isinstance(result, LazyField):
             log.trace('evaluating lazy field %s' % key)
             return result()
@@ -225,6 +287,28 @@ class Entry(dict):
         except KeyError:
             return default
 
+    def iteritems(self):
+        """Overridden so that values shared with snapshots are copied before they are handed out."""
+        for key, value in dict.iteritems(self):
+            if key in self._shared:
+                value = self._copy_shared(key, value)
+            yield key, value
+
+    def items(self):
+        return list(self.iteritems())
+
+    def itervalues(self):
+        for key, value in self.iteritems():
+            yield value
+
+    def values(self):
+        return list(self.itervalues())
+
+    def pop(self, key, *args):
+        if key in self._shared and dict.__contains__(self, key):
+            self._copy_shared(key, dict.__getitem__(self, key))
+        return dict.pop(self, key, *args)
+
     def __contains__(self, key):
         """Will cause lazy field lookup to occur and will return false if a field exists but is None."""
         return self.get(key) is not None
@@ -292,21 +376,58 @@ class Entry(dict):
             return False
         return True
 
+    def _copy_shared(self, key, value):
+        """Replace value of field *key* shared with snapshots by a copy, which can be modified freely."""
+        shared = self._shared[key]
+        self._unshare(key)
+        if value is not shared:
+            return value
+        try:
+            value = copy.deepcopy(value)
+        except TypeError:
+            log.warning('Unable to copy field `%s` in `%s`, snapshots may see later changes' %
+                        (key, dict.get(self, 'title')))
+            return value
+        dict.__setitem__(self, key, value)
+        return value
+
     def take_snapshot(self, name):
         """
         Takes a snapshot of the entry under *name*. Snapshots can be accessed via :attr:`.snapshots`.
+
+        Snapshot shares values with the entry (and other snapshots) instead of copying them. Mutable values are
+        copied only when the field is next accessed from the entry, so unchanged fields are never copied.
+        Lazy fields are evaluated, snapshot stores their values.
+
         :param string name: Snapshot name
         """
-        snapshot = {}
-        for field, value in self.iteritems():
-            try:
-                snapshot[field] = copy.deepcopy(value)
-            except TypeError:
-                log.warning('Unable to take `%s` snapshot for field `%s` in `%s`' % (name, field, self['title']))
+        evaluated = dict((field, self.get(field)) for field in self.keys() if self.is_lazy(field))
+        snapshot = dict(self)
+        snapshot.update(evaluated)
         if snapshot:
             if name in self.snapshots:
                 log.warning('Snapshot `%s` is being overwritten for `%s`' % (name, self['title']))
             self.snapshots[name] = snapshot
+            shared = dict(self._shared)
+            for field, value in snapshot.iteritems():
+                if not is_immutable(value) and dict.get(self, field) is value:
+                    shared[field] = value
+            self._shared = shared
+
+    def checkpoint(self):
+        """
+        :returns: Current fields of the entry, which can be restored with :meth:`restore`.
+
+        Unlike :meth:`take_snapshot` this does not make the entry copy mutable values when they are accessed, fields
+        that are set again are restored but values modified in place are not.
+        """
+        return dict(self), self._shared
+
+    def restore(self, checkpoint):
+        """Restores fields of the entry to the state returned by :meth:`checkpoint`."""
+        fields, self._shared = checkpoint
+        dict.clear(self)
+        dict.update(self, fields)
 
     def update_using_map(self, field_map, source_item):
         """
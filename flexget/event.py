@@ -6,6 +6,8 @@ import logging
 
 log = logging.getLogger('event')
 
+# Mapping of event name to list of handlers ordered by priority. Lists are replaced, not modified,
+# when handlers are added or removed so that firing can iterate them without copying.
 _events = {}
 
 
@@ -15,7 +17,18 @@ class Event(object):
     def __init__(self, name, func, priority=128):
         self.name = name
         self.func = func
-        self.priority = priority
+        self._priority = priority
+
+    def _get_priority(self):
+        return self._priority
+
+    def _set_priority(self, priority):
+        self._priority = priority
+        # keep handler list ordered
+        if any(event is self for event in _events.get(self.name, [])):
+            _events[self.name] = _sorted(_events[self.name])
+
+    priority = property(_get_priority, _set_priority)
 
     def __call__(self, *args, **kwargs):
         return self.func(*args, **kwargs)
@@ -45,6 +58,11 @@ def event(name, priority=128):
     return decorator
 
 
+def _sorted(events):
+    """Sort handlers by priority, handlers with same priority stay in order of registration."""
+    return sorted(events, key=lambda event: event.priority, reverse=True)
+
+
 def get_events(name):
     """
     :param String name: event name
@@ -52,7 +70,6 @@ def get_events(name):
     """
     if not name in _events:
         raise KeyError('No such event %s' % name)
-    _events[name].sort(reverse=True)
     return _events[name]
 
 
@@ -65,22 +82,40 @@ def add_event_handler(name, func, priority=128):
     :rtype: Event
     :raises Exception: If *func* is already registered in an event
     """
-    events = _events.setdefault(name, [])
+    events = _events.get(name, [])
     for event in events:
         if event.func == func:
             raise Exception('%s has already been registered as event listener under name %s' % (func.__name__, name))
     log.trace('registered function %s to event %s' % (func.__name__, name))
     event = Event(name, func, priority)
-    events.append(event)
+    # insert after all handlers with same or higher priority
+    index = len(events)
+    while index > 0 and events[index - 1].priority < priority:
+        index -= 1
+    _events[name] = events[:index] + [event] + events[index:]
     return event
 
 
 def remove_event_handler(name, func):
     """
-    .. warning:: Not implemented!
+    :param string name: Event name
+    :param function func: Function that was registered as event handler
+    :return: Removed :class:`Event`
+    :raises ValueError: If *func* is not registered to event *name*
     """
-    # TODO: implement
-    raise NotImplementedError
+    events = _events.get(name, [])
+    for event in events:
+        if event.func == func:
+            break
+    else:
+        raise ValueError('%s is not registered as event listener under name %s' % (func.__name__, name))
+    log.trace('unregistered function %s from event %s' % (func.__name__, name))
+    remaining = [e for e in events if e is not event]
+    if remaining:
+        _events[name] = remaining
+    else:
+        del _events[name]
+    return event
 
 
 def fire_event(name, *args, **kwargs):
@@ -91,7 +126,8 @@ def fire_event(name, *args, **kwargs):
     :param args: List of arguments passed to handler function
     :param kwargs: Key Value arguments passed to handler function
     """
-    if not name in _events:
+    events = _events.get(name)
+    if not events:
         return
-    for event in get_events(name):
+    for event in events:
         event(*args, **kwargs)
@@ -6,15 +6,20 @@ import logging
 import yaml
 import codecs
 import atexit
+import threading
+import itertools
+import Queue
 from datetime import datetime, timedelta
 
 import sqlalchemy
+from sqlalchemy import event as sqlalchemy_event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.pool import SingletonThreadPool
+from sqlalchemy.pool import SingletonThreadPool, QueuePool
 
 from flexget.event import fire_event
 from flexget import validator
+from flexget.utils import trace
 
 log = logging.getLogger('manager')
 
@@ -22,6 +27,8 @@ Base = declarative_base()
 Session = sessionmaker()
 manager = None
 DB_CLEANUP_INTERVAL = timedelta(days=7)
+# Plugins changing state shared by all tasks, tasks are not executed in parallel when any of them is configured
+GLOBAL_STATE_PLUGINS = ['disable_builtins', 'plugin_priority']
 
 # Validator that handles root structure of config.
 _config_validator = validator.factory('dict')
@@ -42,6 +49,28 @@ def register_config_key(key, validator, required=False):
     _config_validator.accept(validator, key=key, required=required)
 
 
+register_config_key('workers', 'integer')
+
+# Settings applied to each new SQLite connection, can be changed with `database` key in the root of the config
+SQLITE_JOURNAL_MODES = ['wal', 'delete', 'truncate', 'persist', 'memory', 'off']
+SQLITE_SYNCHRONOUS = ['off', 'normal', 'full']
+SQLITE_DEFAULTS = {'busy_timeout': 60000}
+
+
+def database_config_validator():
+    root = validator.factory('dict')
+    root.accept('choice', key='journal_mode').accept_choices(SQLITE_JOURNAL_MODES, ignore_case=True)
+    root.accept('choice', key='synchronous').accept_choices(SQLITE_SYNCHRONOUS, ignore_case=True)
+    # sizes in bytes, cache_size in pages or negative for kibibytes like in SQLite
+    root.accept('integer', key='mmap_size')
+    root.accept('integer', key='cache_size')
+    # milliseconds
+    root.accept('integer', key='busy_timeout')
+    return root
+
+register_config_key('database', database_config_validator)
+
+
 def useExecLogging(func):
     """
     Decorator for setting task name to log messages.
@@ -86,6 +115,17 @@ class Manager(object):
     * manager.shutdown
 
       When the manager is exiting
+
+    Tasks can be executed on a pool of worker threads by giving ``--workers N`` or ``workers: N`` in the root of
+    the config. Tasks with the same priority run at the same time, each in their own thread with their own database
+    session, log context and requests session. Lower priority tasks are started only after all higher priority
+    tasks have completed. Tasks sharing state must hold the same :meth:`shared_lock` (see
+    :meth:`flexget.task.Task.lock_shared_state`) until they have committed, so they will run those parts one at
+    a time.
+
+    SQLite connections are tuned with ``database`` key in the root of the config, which accepts ``journal_mode``,
+    ``synchronous``, ``mmap_size``, ``cache_size`` and ``busy_timeout`` with the same meaning as the SQLite pragmas.
+    With ``journal_mode: wal`` webui and other threads can read while a task is committing.
     """
 
     unit_test = False
@@ -101,6 +141,7 @@ class Manager(object):
         self.options = options
         self.config_base = None
         self.config_name = None
+        self.config_path = None
         self.db_filename = None
         self.engine = None
         self.lockfile = None
@@ -110,6 +151,10 @@ class Manager(object):
         self.config = {}
         self.tasks = {}
 
+        # Locks for state shared between tasks executed in parallel
+        self._shared_locks = {}
+        self._shared_locks_lock = threading.Lock()
+
         self.initialize()
 
         # cannot be imported at module level because of circular references
@@ -134,6 +179,7 @@ class Manager(object):
         """Separated from __init__ so that unit tests can modify options before loading config."""
         self.setup_yaml()
         self.find_config()
+        self.load_config_plugins()
         self.acquire_lock()
         self.init_sqlalchemy()
         errors = self.validate_config()
@@ -268,12 +314,36 @@ class Manager(object):
             sys.exit(1)
 
         # config loaded successfully
+        self.config_path = config
         self.config_name = os.path.splitext(os.path.basename(config))[0]
         self.config_base = os.path.normpath(os.path.dirname(config))
         self.lockfile = os.path.join(self.config_base, '.%s-lock' % self.config_name)
         log.debug('config_name: %s' % self.config_name)
         log.debug('config_base: %s' % self.config_base)
 
+    def load_config_plugins(self):
+        """Import deferred plugins (see :func:`flexget.plugin.load_deferred_plugins`) that config may refer to.
+
+        All keys and string values in the config are considered, since plugins can be configured under other
+        plugins (eg. if, discover, inputs) or referred to by name."""
+        from flexget.plugin import load_deferred_plugins
+
+        names = set()
+
+        def collect(item):
+            if isinstance(item, dict):
+                for key, value in item.iteritems():
+                    names.add(key)
+                    collect(value)
+            elif isinstance(item, list):
+                for value in item:
+                    collect(value)
+            elif isinstance(item, basestring):
+                names.add(item)
+
+        collect(self.config)
+        load_deferred_plugins(names)
+
     def save_config(self):
         """Dumps current config to yaml config file"""
         config_file = file(os.path.join(self.config_base, self.config_name) + '.yml', 'w')
@@ -398,6 +468,8 @@ class Manager(object):
 
     def validate_config(self):
         """Check all root level keywords are valid."""
+        # errors from previously validated config would be kept otherwise
+        del _config_validator.errors.messages[:]
         _config_validator.validate(self.config)
         return _config_validator.errors.messages
 
@@ -428,13 +500,27 @@ class Manager(object):
         if self.db_filename and not os.path.exists(self.db_filename):
             log.verbose('Creating new database %s ...' % self.db_filename)
 
+        engine_args = {}
+        if self.database_uri in ['sqlite://', 'sqlite:///:memory:']:
+            # each connection would get a separate in-memory database
+            engine_args['poolclass'] = SingletonThreadPool
+        elif self.database_uri.startswith('sqlite') and self.workers > 1:
+            # Connections are shared between threads, so webui and tasks executed in parallel can read at the
+            # same time. Used connections are not returned to the pool until their transaction has ended.
+            engine_args['poolclass'] = QueuePool
+            engine_args['pool_size'] = self.workers + 2
+            engine_args['max_overflow'] = 10
+            engine_args['connect_args'] = {'check_same_thread': False}
+
         # fire up the engine
         log.debug('Connecting to: %s' % self.database_uri)
         try:
             self.engine = sqlalchemy.create_engine(self.database_uri,
                                                    echo=self.options.debug_sql,
-                                                   poolclass=SingletonThreadPool,
+                                                   **engine_args
                                                    )  # assert_unicode=True
+            if self.database_uri.startswith('sqlite'):
+                sqlalchemy_event.listen(self.engine, 'connect', self._sqlite_connect)
         except ImportError:
             print >> sys.stderr, ('FATAL: Unable to use SQLite. Are you running Python 2.5 - 2.7 ?\n'
                                   'Python should normally have SQLite support built in.\n'
@@ -459,6 +545,37 @@ class Manager(object):
                                      (e.message, self.config_base)
             raise Exception(e.message)
 
+    @property
+    def sqlite_pragmas(self):
+        """
+        Pragmas set on each SQLite connection, from defaults and `database` key in the config.
+
+        :returns: List of (name, value) tuples
+        """
+        settings = dict(SQLITE_DEFAULTS)
+        config = (self.config or {}).get('database')
+        if isinstance(config, dict):
+            settings.update(config)
+        pragmas = []
+        # config is not validated yet when database is initialized, so check values before putting them in sql
+        for name, choices in [('journal_mode', SQLITE_JOURNAL_MODES), ('synchronous', SQLITE_SYNCHRONOUS)]:
+            value = unicode(settings.get(name, '')).lower()
+            if value in choices:
+                pragmas.append((name, value))
+        for name in ['busy_timeout', 'cache_size', 'mmap_size']:
+            if isinstance(settings.get(name), int):
+                pragmas.append((name, settings[name]))
+        return pragmas
+
+    def _sqlite_connect(self, dbapi_connection, connection_record):
+        """Applies :attr:`sqlite_pragmas` to new SQLite connection."""
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in self.sqlite_pragmas:
+                cursor.execute('PRAGMA %s = %s' % (name, value))
+        finally:
+            cursor.close()
+
     def check_lock(self):
         """Checks if there is already a lock, returns True if there is."""
         if os.path.exists(self.lockfile):
@@ -476,6 +593,10 @@ class Manager(object):
 
         # Exit if there is an existing lock.
         if self.check_lock():
+            from flexget import daemon
+            if 'port' in daemon.read_lockfile(self.lockfile) and not getattr(self.options, 'daemon', False):
+                # hand execution over to running daemon
+                sys.exit(daemon.send_execution(self.lockfile, self.options))
             if not self.options.quiet:
                 f = file(self.lockfile)
                 pid = f.read()
@@ -522,6 +643,21 @@ class Manager(object):
                 task.enabled = False
             self.tasks[name] = task
 
+    @property
+    def workers(self):
+        """Number of tasks that can be executed at the same time. Given by ``--workers`` or ``workers`` config key."""
+        workers = getattr(self.options, 'workers', None) or (self.config or {}).get('workers') or 1
+        return max(workers, 1)
+
+    def shared_lock(self, key):
+        """
+        :param string key: Name of the shared state
+        :return: Lock for *key*, same lock is returned for all tasks during the lifetime of the manager.
+        :rtype: threading.RLock
+        """
+        with self._shared_locks_lock:
+            return self._shared_locks.setdefault(key, threading.RLock())
+
     def disable_tasks(self):
         """Disables all tasks."""
         for task in self.tasks.itervalues():
@@ -607,27 +743,90 @@ class Manager(object):
                      ('--reset' if self.options.reset else '--learn'))
             disable_phases.extend(['download', 'output'])
 
+        workers = self.workers
+        if workers > 1:
+            if self.database_uri in ['sqlite://', 'sqlite:///:memory:']:
+                # every thread would get a separate in-memory database
+                log.warning('Cannot execute tasks in parallel with in-memory database, using one worker.')
+                workers = 1
+            elif entries:
+                # given entries would be shared between tasks running at the same time
+                log.debug('Entries given for execution, using one worker.')
+                workers = 1
+
         fire_event('manager.execute.started', self)
         self.process_start(tasks=run_tasks)
 
-        for task in sorted(run_tasks):
-            if not task.enabled or task._abort:
-                continue
-            try:
-                task.execute(disable_phases=disable_phases, entries=entries)
-            except Exception as e:
-                task.enabled = False
-                log.exception('Task %s: %s' % (task.name, e))
-            except KeyboardInterrupt:
-                # show real stack trace in debug mode
-                if self.options.debug:
-                    raise
-                print '**** Keyboard Interrupt ****'
-                return
+        if workers > 1:
+            # checked after process_start, so that configuration from presets is included
+            for task in run_tasks:
+                used = [name for name in GLOBAL_STATE_PLUGINS if name in task.config]
+                if used:
+                    log.debug('Task %s uses %s, which affect all tasks, using one worker.' %
+                              (task.name, ', '.join(used)))
+                    workers = 1
+                    break
+
+        try:
+            if workers > 1:
+                self._execute_parallel(run_tasks, workers, disable_phases, entries)
+            else:
+                for task in sorted(run_tasks):
+                    self._execute_task(task, disable_phases, entries)
+        except KeyboardInterrupt:
+            # show real stack trace in debug mode
+            if self.options.debug:
+                raise
+            print '**** Keyboard Interrupt ****'
+            return
 
         self.process_end(tasks=run_tasks)
         fire_event('manager.execute.completed', self)
 
+    def _execute_task(self, task, disable_phases, entries):
+        if not task.enabled or task._abort:
+            return
+        try:
+            with trace.span(task.name, 'task'):
+                task.execute(disable_phases=disable_phases, entries=entries)
+        except Exception as e:
+            task.enabled = False
+            log.exception('Task %s: %s' % (task.name, e))
+
+    def _execute_parallel(self, tasks, workers, disable_phases, entries):
+        """
+        Execute *tasks* using up to *workers* threads. Tasks are executed in groups of same priority,
+        all tasks in a group have completed before next group is started.
+        """
+        from flexget import logger
+        execution = logger.get_execution()
+
+        def worker(queue):
+            logger.set_execution(execution)
+            while True:
+                try:
+                    task = queue.get_nowait()
+                except Queue.Empty:
+                    return
+                self._execute_task(task, disable_phases, entries)
+
+        for priority, group in itertools.groupby(sorted(tasks), key=lambda task: task.priority):
+            queue = Queue.Queue()
+            for task in group:
+                queue.put(task)
+            log.debug('Executing %s tasks with priority %s using %s workers' %
+                      (queue.qsize(), priority, min(workers, queue.qsize())))
+            threads = []
+            for i in xrange(min(workers, queue.qsize())):
+                thread = threading.Thread(target=worker, args=(queue,), name='worker-%s' % i)
+                thread.daemon = True
+                thread.start()
+                threads.append(thread)
+            for thread in threads:
+                # join with timeout, so that KeyboardInterrupt is delivered to the main thread
+                while thread.is_alive():
+                    thread.join(0.5)
+
     def db_cleanup(self):
         """ Perform database cleanup if cleanup interval has been met.
         """
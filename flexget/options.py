@@ -134,6 +134,13 @@ class CoreArgumentParser(ArgumentParser):
                           help='Disables stdout and stderr output, log file used. Reduces logging level slightly.')
         self.add_argument('--db-cleanup', action='store_true', dest='db_cleanup', default=False,
                           help='Forces the database cleanup event to run right now.')
+        self.add_argument('--daemon', action='store_true', dest='daemon', default=False,
+                          help='Keep running and execute tasks on schedule. Other runs are executed by the daemon.')
+        self.add_argument('--workers', action='store', type=int, dest='workers', default=None, metavar='N',
+                          help='Execute up to N tasks at the same time. Overrides `workers` from config.')
+        self.add_argument('--trace-file', action='store', dest='trace_file', default=None, metavar='FILE',
+                          help='Write timeline of the execution to FILE in Chrome trace format, '
+                               'viewable in chrome://tracing.')
 
         # Plugins should respect this flag and retry where appropriate
         self.add_argument('--retry', action='store_true', dest='retry', default=0, help=SUPPRESS)
@@ -151,6 +158,9 @@ class CoreArgumentParser(ArgumentParser):
     def parse_args(self, args=None, namespace=None):
         args = super(CoreArgumentParser, self).parse_args(args or self._unit_test and ['--reset'] or None, namespace)
 
+        if args.test and args.daemon:
+            self.error('--test and --daemon are mutually exclusive')
+
         if args.test and (args.learn or args.reset):
             self.error('--test and %s are mutually exclusive' % ('--learn' if args.learn else '--reset'))
 
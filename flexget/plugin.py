@@ -7,6 +7,7 @@ import os
 import re
 import logging
 import time
+import json
 import pkgutil
 from itertools import ifilter
 
@@ -14,12 +15,13 @@ from requests import RequestException
 
 from flexget.event import add_event_handler as add_phase_handler
 from flexget import plugins as plugins_pkg
+from flexget.utils import trace
 
 log = logging.getLogger('plugin')
 
 __all__ = ['PluginWarning', 'PluginError', 'register_plugin', 'register_parser_option', 'register_task_phase',
            'get_plugin_by_name', 'get_plugins_by_group', 'get_plugin_keywords', 'get_plugins_by_phase',
-           'get_phases_by_plugin', 'internet', 'priority']
+           'get_phases_by_plugin', 'plugins_changed', 'load_deferred_plugins', 'internet', 'priority']
 
 
 class DependencyError(Exception):
@@ -186,6 +188,34 @@ _loaded_plugins = {}
 _plugin_options = []
 _new_phase_queue = {}
 
+# Incremented when plugins, phases, handler priorities or builtin status change
+_registry_version = 0
+
+# All registered PluginInfo instances in order of registration, used to find out what a module registers
+_registrations = []
+
+# Manifest records of plugin modules which have not been imported yet, by module name
+_deferred_modules = {}
+# Module names of plugins which have not been imported yet, by plugin name
+_deferred_plugins = {}
+
+# Increment when contents of the manifest change, causes manifest to be rebuilt
+MANIFEST_VERSION = 1
+
+
+def plugins_changed():
+    """
+    Invalidates execution plans built by tasks. Must be called after changing plugin
+    handler priorities or builtin status at runtime.
+    """
+    global _registry_version
+    _registry_version += 1
+
+
+def get_registry_version():
+    """:return: Number that changes whenever execution plans need to be rebuilt."""
+    return _registry_version
+
 
 def register_parser_option(*args, **kwargs):
     """Adds a parser option to the global parser."""
@@ -222,6 +252,7 @@ def register_task_phase(name, before=None, after=None):
         # create possibly newly available phase handlers
         for loaded_plugin in plugins:
             plugins[loaded_plugin].build_phase_handlers()
+        plugins_changed()
 
         return True
 
@@ -296,6 +327,7 @@ class PluginInfo(dict):
         else:
             self.build_phase_handlers()
             plugins[self.name] = self
+            _registrations.append(self)
 
     def reset_phase_handlers(self):
         """Temporary utility method"""
@@ -323,6 +355,7 @@ class PluginInfo(dict):
                 # provides backwards compatibility
                 event.plugin = self
                 self.phase_handlers[phase] = event
+        plugins_changed()
 
     def __getattr__(self, attr):
         if attr in self:
@@ -365,12 +398,93 @@ def get_standard_plugins_path():
     return paths
 
 
-def _load_plugins_from_dirs(dirs):
+def get_manifest_path():
+    """
+    :returns: Path to the plugin manifest file. Can be set with FLEXGET_PLUGIN_MANIFEST environment variable.
+    """
+    return os.environ.get('FLEXGET_PLUGIN_MANIFEST',
+                          os.path.join(os.path.expanduser('~'), '.flexget', 'plugin_manifest.json'))
+
+
+def _read_manifest(path):
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (IOError, ValueError) as e:
+        log.debug('Unable to read plugin manifest %s: %s' % (path, e))
+        return {}
+    if manifest.get('version') != MANIFEST_VERSION:
+        log.debug('Plugin manifest %s is outdated' % path)
+        return {}
+    return manifest.get('modules', {})
+
+
+def _write_manifest(path, modules):
+    try:
+        with open(path, 'w') as f:
+            json.dump({'version': MANIFEST_VERSION, 'modules': modules}, f, indent=1, sort_keys=True)
+    except IOError as e:
+        log.debug('Unable to write plugin manifest %s: %s' % (path, e))
+    else:
+        log.debug('Wrote plugin manifest %s' % path)
+
+
+def _registry_state():
+    """
+    :returns: Tuple describing everything a plugin module can register besides non-builtin plugins.
+      If it changes during import, the module must always be imported on startup.
+    """
+    from flexget import event, manager
+    return (len(_plugin_options), len(task_phases), len(_new_phase_queue),
+            sum(len(handlers) for name, handlers in event._events.iteritems() if not name.startswith('plugin.')),
+            sum(len(validators) for validators in manager._config_validator.valid.itervalues()),
+            len(manager.Base.metadata.tables))
+
+
+def _import_plugin_module(name, loader=None):
+    """
+    Import plugin module *name* using *loader*, or the normal import mechanism.
+
+    :returns: True if module was imported successfully
+    """
+    try:
+        if loader:
+            loaded_module = loader.load_module(name)
+        else:
+            __import__(name)
+            loaded_module = sys.modules[name]
+    except DependencyError as e:
+        if e.has_message():
+            msg = e.message
+        else:
+            msg = 'Plugin `%s` requires `%s` to load.' % (e.issued_by or name, e.missing or 'N/A')
+        if not e.silent:
+            log.warning(msg)
+        else:
+            log.debug(msg)
+    except ImportError as e:
+        log.critical('Plugin `%s` failed to import dependencies' % name)
+        log.exception(e)
+    except Exception as e:
+        log.critical('Exception while loading plugin %s' % name)
+        log.exception(e)
+        raise
+    else:
+        log.trace('Loaded module %s from %s' % (name, loaded_module.__file__))
+        return True
+    return False
+
+
+def _load_plugins_from_dirs(dirs, manifest=None):
     """
     :param list dirs: Directories from where plugins are loaded from
+    :param dict manifest: Records of plugin modules from a previous run. Modules whose file has not changed
+      and which only register non-builtin plugins are not imported, but deferred until their plugins are needed.
+    :returns: Records of all plugin modules, for a manifest
     """
 
     log.debug('Trying to load plugins from: %s' % dirs)
+    records = {}
     # add all dirs to plugins_pkg load path so that plugins are loaded from flexget and from ~/.flexget/plugins/
     plugins_pkg.__path__ = map(_strip_trailing_sep, dirs)
     for importer, name, ispkg in pkgutil.walk_packages(dirs, plugins_pkg.__name__ + '.'):
@@ -384,35 +498,91 @@ def _load_plugins_from_dirs(dirs):
         # Don't load from pyc files
         if not loader.filename.endswith('.py'):
             continue
-        try:
-            loaded_module = loader.load_module(name)
-        except DependencyError as e:
-            if e.has_message():
-                msg = e.message
-            else:
-                msg = 'Plugin `%s` requires `%s` to load.' % (e.issued_by or name, e.missing or 'N/A')
-            if not e.silent:
-                log.warning(msg)
-            else:
-                log.debug(msg)
-        except ImportError as e:
-            log.critical('Plugin `%s` failed to import dependencies' % name)
-            log.exception(e)
-        except Exception as e:
-            log.critical('Exception while loading plugin %s' % name)
-            log.exception(e)
-            raise
-        else:
-            log.trace('Loaded module %s from %s' % (name, loaded_module.__file__))
+        stat = os.stat(loader.filename)
+        file_info = [loader.filename, stat.st_mtime, stat.st_size]
+
+        record = (manifest or {}).get(name)
+        if record and record['file'] == file_info and not record['eager']:
+            log.trace('Deferring import of %s' % name)
+            _deferred_modules[name] = record
+            for info in record['plugins']:
+                _deferred_plugins[info['name']] = name
+            records[name] = record
+            continue
+
+        state = _registry_state()
+        registered = len(_registrations)
+        imported = _import_plugin_module(name, loader)
+        module_plugins = _registrations[registered:]
+        records[name] = {
+            'file': file_info,
+            # modules which could not be imported are imported on every run, so problems are always reported
+            'eager': not imported or state != _registry_state() or any(p.builtin for p in module_plugins),
+            'plugins': [{'name': p.name, 'phases': list(p.phase_handlers), 'groups': p.groups,
+                         'contexts': p.contexts, 'category': p.category, 'api_ver': p.api_ver,
+                         'validator': hasattr(p.instance, 'validator')} for p in module_plugins]}
 
     if _new_phase_queue:
         for phase, args in _new_phase_queue.iteritems():
             log.error('Plugin %s requested new phase %s, but it could not be created at requested '
                       'point (before, after). Plugin is not working properly.' % (args[0], phase))
+    return records
 
 
-def load_plugins(parser):
-    """Load plugins from the standard plugin paths."""
+def _load_deferred_module(name):
+    record = _deferred_modules.pop(name, None)
+    if record is None:
+        return
+    for info in record['plugins']:
+        _deferred_plugins.pop(info['name'], None)
+    log.debug('Loading deferred plugin module %s' % name)
+    with trace.span(name, 'plugin'):
+        _import_plugin_module(name)
+
+
+def load_deferred_plugins(names=None):
+    """
+    Import plugin modules which were not imported during :func:`load_plugins` because of the manifest.
+
+    :param names: Import modules of plugins with these names, or all modules if not given.
+      Names that are not names of deferred plugins are ignored.
+    """
+    if names is None:
+        modules = _deferred_modules.keys()
+    else:
+        modules = set(_deferred_plugins[name] for name in names if name in _deferred_plugins)
+    for module in modules:
+        _load_deferred_module(module)
+
+
+def _load_deferred_matching(phase=None, group=None, context=None, category=None, min_api=None):
+    """Import deferred plugin modules with plugins matching the :func:`get_plugins` criteria."""
+
+    def matches(info):
+        if phase and not phase in info['phases']:
+            return False
+        if group and not group in info['groups']:
+            return False
+        if context and not context in info['contexts']:
+            return False
+        if category and not category == info['category']:
+            return False
+        if min_api is not None and info['api_ver'] < min_api:
+            return False
+        return True
+
+    for name, record in _deferred_modules.items():
+        if any(matches(info) for info in record['plugins']):
+            _load_deferred_module(name)
+
+
+def load_plugins(parser, lazy=False):
+    """Load plugins from the standard plugin paths.
+
+    :param parser: Parser where plugins add their options
+    :param bool lazy: Use plugin manifest to defer importing plugin modules until their plugins are needed.
+      See :func:`load_deferred_plugins`.
+    """
     global plugins_loaded, _parser
 
     if plugins_loaded:
@@ -426,13 +596,16 @@ def load_plugins(parser):
 
     start_time = time.time()
     _parser = parser
+    manifest = _read_manifest(get_manifest_path()) if lazy else None
     try:
-        _load_plugins_from_dirs(get_standard_plugins_path())
+        records = _load_plugins_from_dirs(get_standard_plugins_path(), manifest)
     finally:
         _parser = None
+    if lazy and records and records != manifest:
+        _write_manifest(get_manifest_path(), records)
     took = time.time() - start_time
     plugins_loaded = True
-    log.debug('Plugins took %.2f seconds to load' % took)
+    log.debug('Plugins took %.2f seconds to load (%s modules deferred)' % (took, len(_deferred_modules)))
 
 
 def get_plugins(phase=None, group=None, context=None, category=None, min_api=None):
@@ -461,7 +634,9 @@ def get_plugins(phase=None, group=None, context=None, category=None, min_api=Non
         if min_api is not None and plugin.api_ver < min_api:
             return False
         return True
-    return ifilter(matches, plugins.itervalues())
+    _load_deferred_matching(phase, group, context, category, min_api)
+    # iterate over a copy, plugins may be loaded while this is consumed
+    return ifilter(matches, plugins.values())
 
 
 def get_plugins_by_phase(phase):
@@ -492,12 +667,22 @@ def get_plugins_by_group(group):
 
 
 def get_plugin_keywords():
-    """Return iterator over all plugin keywords."""
-    return plugins.iterkeys()
+    """Return iterator over all plugin keywords, including plugins which have not been imported yet."""
+    return iter(plugins.keys() + _deferred_plugins.keys())
+
+
+def get_validated_plugin_keywords():
+    """Return list of keywords of plugins which have a validator, including plugins which have not been imported."""
+    keywords = [name for name, plugin in plugins.iteritems() if hasattr(plugin.instance, 'validator')]
+    for record in _deferred_modules.itervalues():
+        keywords.extend(info['name'] for info in record['plugins'] if info['validator'])
+    return keywords
 
 
 def get_plugin_by_name(name, issued_by='???'):
     """Get plugin by name, preferred way since this structure may be changed at some point."""
+    if name in _deferred_plugins:
+        _load_deferred_module(_deferred_plugins[name])
     if not name in plugins:
         raise DependencyError(issued_by=issued_by, missing=name, message='Unknown plugin %s' % name)
     return plugins[name]
@@ -2,7 +2,7 @@ from __future__ import unicode_literals, division, absolute_import
 import logging
 import sys
 from flexget.event import event
-from flexget.plugin import register_parser_option, plugins
+from flexget.plugin import register_parser_option, plugins, load_deferred_plugins
 
 log = logging.getLogger('doc')
 
@@ -38,6 +38,7 @@ def print_doc(manager):
     if manager.options.doc:
         manager.disable_tasks()
         plugin_name = manager.options.doc
+        load_deferred_plugins([plugin_name])
         plugin = plugins.get(plugin_name, None)
         if plugin:
             if not plugin.instance.__doc__:
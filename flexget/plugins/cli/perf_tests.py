@@ -6,6 +6,12 @@ import logging
 
 log = logging.getLogger('perftests')
 
+#: Offline benchmarks on generated data, ran in a temporary database. ``--perf-test synthetic`` runs all of them.
+SYNTHETIC_TESTS = ['series', 'series_match', 'seen', 'archive', 'quality', 'bdecode', 'template']
+
+# Rows inserted into database per statement when seeding tables
+SEED_BATCH = 10000
+
 
 class PerfTests(object):
 
@@ -15,14 +21,276 @@ class PerfTests(object):
             task.manager.disable_tasks()
         else:
             return
+        self.results = []
         session = Session()
         try:
             if test_name == 'imdb_query':
                 self.imdb_query(session)
+            elif test_name == 'entry_phases':
+                self.entry_phases(task)
+            elif test_name == 'events':
+                self.events()
+            elif test_name == 'snapshots':
+                self.snapshots()
+            elif test_name == 'synthetic':
+                for name in SYNTHETIC_TESTS:
+                    self.synthetic(task.manager, name)
+            elif test_name in SYNTHETIC_TESTS:
+                self.synthetic(task.manager, test_name)
             else:
                 log.critical('Unknown performance test %s' % test_name)
         finally:
             session.close()
+            if self.results:
+                self.write_results(task.manager.options.perf_test_output)
+
+    def record(self, test, metric, value, **params):
+        """Record a benchmark result, written out as one JSON object after all tests have been run."""
+        result = {'test': test, 'metric': metric, 'value': value}
+        result.update(params)
+        self.results.append(result)
+        log.info('%-10s %-25s %10.4f %s' % (test, metric, value,
+                                            ' '.join('%s=%s' % item for item in sorted(params.iteritems()))))
+
+    def write_results(self, path=None):
+        """Write results as JSON-lines to file *path*, or stdout."""
+        import sys
+        import json
+        f = open(path, 'a') if path else sys.stdout
+        try:
+            for result in self.results:
+                f.write(json.dumps(result, sort_keys=True) + '\n')
+        finally:
+            if path:
+                f.close()
+
+    def synthetic(self, manager, test_name):
+        """Run synthetic benchmark *test_name* in a temporary database, which is removed afterwards."""
+        import os
+        import tempfile
+        import sqlalchemy
+        from sqlalchemy.pool import SingletonThreadPool
+        from flexget.manager import Base
+
+        options = manager.options
+        fd, db_filename = tempfile.mkstemp(suffix='.sqlite', prefix='flexget-perftest-')
+        os.close(fd)
+        engine = sqlalchemy.create_engine('sqlite:///%s' % db_filename, poolclass=SingletonThreadPool)
+        try:
+            Base.metadata.create_all(bind=engine)
+            Session.configure(bind=engine)
+            getattr(self, 'synthetic_%s' % test_name)(manager, options.perf_test_entries,
+                                                      options.perf_test_series, options.perf_test_rows)
+        finally:
+            Session.configure(bind=manager.engine)
+            engine.dispose()
+            os.remove(db_filename)
+
+    def seed(self, table, rows, make_row):
+        """Insert *rows* rows made by *make_row(index)* into *table*.
+
+        :returns: Seconds taken
+        """
+        import time
+        start_time = time.time()
+        session = Session()
+        try:
+            for start in xrange(0, rows, SEED_BATCH):
+                session.execute(table.insert(), [make_row(i) for i in xrange(start, min(start + SEED_BATCH, rows))])
+            session.commit()
+        finally:
+            session.close()
+        return time.time() - start_time
+
+    def run_task(self, manager, config):
+        """Execute a task with *config*.
+
+        :returns: Measurements of the execution, {(phase, plugin): {metric: value}}
+        """
+        from flexget.task import Task
+        from flexget.plugins.cli.performance import performance, enabled, enable, disable
+
+        was_enabled = enabled()
+        enable()
+        task = Task(manager, 'perftest', config)
+        performance.pop(task.name, None)
+        try:
+            task.execute()
+        finally:
+            if not was_enabled:
+                disable()
+        return performance.pop(task.name, {})
+
+    def record_plugins(self, test, measurements, plugins, **params):
+        for phase, plugin in plugins:
+            data = measurements.get((phase, plugin))
+            if not data:
+                log.error('Plugin %s was not run on %s phase' % (plugin, phase))
+                continue
+            self.record(test, '%s_%s_seconds' % (phase, plugin), data['wall_seconds'],
+                        queries=data['sql_queries'], **params)
+
+    def synthetic_series(self, manager, entries, series, rows):
+        """Series metainfo and filter phases, with *rows* releases of other episodes in database."""
+        from datetime import datetime
+        from flexget.plugins.filter.series import Series, Episode, Release
+
+        names = ['Series %s' % i for i in xrange(series)]
+        now = datetime.now()
+        episodes = max(rows // 2, 1)
+        # other series in database besides the configured ones
+        series_count = max(series, rows // 1000)
+        per_series = max(episodes // series_count, 1)
+        took = self.seed(Series.__table__, series_count,
+                         lambda i: {'id': i + 1, 'name': 'Series %s' % i, 'name_lower': 'series %s' % i,
+                                    'identified_by': 'ep'})
+        took += self.seed(Episode.__table__, episodes,
+                          lambda i: {'id': i + 1, 'identifier': 'S%02dE%02d' % divmod(i // series_count, 100),
+                                     'season': i // series_count // 100, 'number': i // series_count % 100,
+                                     'identified_by': 'ep', 'series_id': i % series_count + 1})
+        took += self.seed(Release.__table__, rows,
+                          lambda i: {'episode_id': i // 2 + 1, 'quality': '720p hdtv' if i % 2 else 'sdtv',
+                                     'downloaded': bool(i % 2), 'proper_count': 0, 'title': 'Release %s' % i,
+                                     'first_seen': now})
+        self.record('series', 'seed_seconds', took, rows=rows)
+        # new episodes after the ones in database
+        mock = [{'title': '%s S%02dE%02d 720p HDTV x264-GRP' % (names[i % series], 99, i // series % 100),
+                 'url': 'http://localhost/series/%s' % i} for i in xrange(entries)]
+        measurements = self.run_task(manager, {'mock': mock, 'series': names})
+        self.record_plugins('series', measurements, [('metainfo', 'series'), ('filter', 'series')],
+                            entries=entries, series=series, rows=rows)
+
+    def synthetic_series_match(self, manager, entries, series, rows):
+        """Matching titles to series, every series against every title versus only candidates from the name index."""
+        import time
+        from flexget.utils.titles import SeriesParser, SeriesIndex, ParseWarning, parse_cache
+
+        names = ['Series %s' % i for i in xrange(series)]
+        # half of the titles do not belong to any series
+        titles = ['%s S%02dE%02d 720p HDTV x264-GRP' % (names[i % series], 1, i // series % 100) if i % 2 else
+                  'Unknown Show %s S01E%02d HDTV' % (i, i % 100) for i in xrange(entries)]
+
+        def match(candidates):
+            # measure parsing, not results cached by previous run
+            parse_cache.clear()
+            found = {}
+            for position, name in enumerate(names):
+                parser = SeriesParser(name)
+                for title in candidates.get(position, []):
+                    try:
+                        parser.parse(title)
+                    except ParseWarning:
+                        pass
+                    if parser.valid:
+                        found.setdefault(title, (name, parser.identifier))
+            return found
+
+        start_time = time.time()
+        everything = match(dict((position, titles) for position in xrange(series)))
+        self.record('series_match', 'parse_all_seconds', time.time() - start_time, entries=entries, series=series)
+
+        start_time = time.time()
+        index = SeriesIndex()
+        for position, name in enumerate(names):
+            index.add(position, name)
+        candidates = {}
+        for title in titles:
+            for position in index.candidates(title):
+                candidates.setdefault(position, []).append(title)
+        indexed = match(candidates)
+        self.record('series_match', 'parse_indexed_seconds', time.time() - start_time, entries=entries,
+                    series=series)
+        if indexed != everything:
+            log.error('Series name index matched %s titles, parsing every series matched %s titles' %
+                      (len(indexed), len(everything)))
+
+    def synthetic_seen(self, manager, entries, series, rows):
+        """Seen filter with *rows* seen entries in database, half of the entries have been seen."""
+        from datetime import datetime
+        from flexget.plugins.filter.seen import SeenEntry, SeenField, value_hash, period_of
+
+        now = datetime.now()
+        took = self.seed(SeenEntry.__table__, rows,
+                         lambda i: {'id': i + 1, 'title': 'Seen %s' % i, 'reason': 'perftest', 'feed': 'perftest',
+                                    'added': now, 'local': False, 'period': period_of(now)})
+
+        def seen_field(i):
+            value = 'http://localhost/seen/%s' % (i // 2) if i % 2 else 'Seen %s' % (i // 2)
+            return {'seen_entry_id': i // 2 + 1, 'field': 'url' if i % 2 else 'title', 'value': value,
+                    'value_hash': value_hash(value), 'added': now}
+
+        took += self.seed(SeenField.__table__, rows * 2, seen_field)
+        self.record('seen', 'seed_seconds', took, rows=rows)
+        # every other entry is in the database
+        mock = [{'title': 'Seen %s' % (i * rows // entries if i % 2 else rows + i),
+                 'url': 'http://localhost/seen/%s' % (i * rows // entries if i % 2 else rows + i)}
+                for i in xrange(entries)]
+        measurements = self.run_task(manager, {'mock': mock, 'seen': True})
+        self.record_plugins('seen', measurements, [('filter', 'seen')], entries=entries, rows=rows)
+
+    def synthetic_archive(self, manager, entries, series, rows):
+        """Archive exit phase with *rows* entries already archived."""
+        from datetime import datetime
+        from flexget.plugins.generic.archive import ArchiveEntry
+
+        now = datetime.now()
+        took = self.seed(ArchiveEntry.__table__, rows,
+                         lambda i: {'id': i + 1, 'title': 'Archived %s' % i, 'url': 'http://localhost/archive/%s' % i,
+                                    'description': 'Description of archived entry %s' % i, 'added': now})
+        self.record('archive', 'seed_seconds', took, rows=rows)
+        # every other entry is already in archive
+        mock = [{'title': 'Archived %s' % (i * rows // entries if i % 2 else rows + i),
+                 'url': 'http://localhost/archive/%s' % (i * rows // entries if i % 2 else rows + i)}
+                for i in xrange(entries)]
+        measurements = self.run_task(manager, {'mock': mock, 'archive': ['perftest']})
+        self.record_plugins('archive', measurements, [('exit', 'archive')], entries=entries, rows=rows)
+
+    def synthetic_quality(self, manager, entries, series, rows):
+        """Quality parsing of release titles."""
+        import time
+        from flexget.utils.qualities import Quality
+
+        variants = ['720p HDTV x264', '1080p BluRay DTS x264', 'DVDRip XviD', 'WEB-DL 1080i AAC2.0 H.264',
+                    'HR PDTV', 'bdrip 720p ac3 proper', 'REPACK 480p WEBRip', 'Unknown Quality']
+        titles = ['Series %s S01E%02d %s-GRP' % (i, i % 100, variants[i % len(variants)]) for i in xrange(entries)]
+        start_time = time.time()
+        for title in titles:
+            Quality(title)
+        self.record('quality', 'parse_seconds', time.time() - start_time, entries=entries)
+
+    def synthetic_bdecode(self, manager, entries, series, rows):
+        """Decoding a torrent with *entries* files."""
+        import time
+        from flexget.utils.bittorrent import bencode, bdecode
+
+        files = [{'length': i * 1000, 'path': ['Folder %s' % (i // 100), 'File %s.mkv' % i]}
+                 for i in xrange(entries)]
+        data = bencode({'announce': 'http://localhost/announce',
+                        'info': {'name': 'perftest', 'piece length': 262144, 'pieces': b'x' * 20 * entries,
+                                 'files': files}})
+        start_time = time.time()
+        bdecode(data)
+        self.record('bdecode', 'decode_seconds', time.time() - start_time, entries=entries, bytes=len(data))
+
+    def synthetic_template(self, manager, entries, series, rows):
+        """Rendering a path template for each entry."""
+        import time
+        from flexget.entry import Entry
+        from flexget.task import Task
+        from flexget.utils.template import render_from_entry
+
+        template = '/storage/{{series_name|default("unknown")|pathscrub}}/Season {{series_season|pad(2)}}/' \
+                   '{{title|re_replace(" ", ".")}}.{{quality|lower}}'
+        items = [Entry(title='Series %s S01E%02d 720p' % (i, i % 100), url='http://localhost/%s' % i,
+                       series_name='Series %s' % (i % max(series, 1)), series_season=1, quality='720p')
+                 for i in xrange(entries)]
+        task = Task(manager, 'perftest', {})
+        for entry in items:
+            entry.task = task
+        start_time = time.time()
+        for entry in items:
+            render_from_entry(template, entry)
+        self.record('template', 'render_seconds', time.time() - start_time, entries=entries)
 
     def imdb_query(self, session):
         import time
@@ -71,7 +339,123 @@ class PerfTests(object):
         took = time.time() - start_time
         log.debug('Took %.2f seconds to query %i movies' % (took, len(imdb_urls)))
 
+    def entry_phases(self, task, amount=5000):
+        """Measures per entry overhead of looking up plugins for entry phases (accept, reject, fail)."""
+        import time
+        from flexget.plugin import get_plugins
+
+        def sorted_lookup(phase):
+            # how plugins were looked up before execution plans, sorting all plugins on every call
+            plugins = sorted(get_plugins(phase=phase), key=lambda p: p.phase_handlers[phase], reverse=True)
+            return (p for p in plugins if p.name in task.config or p.builtin)
+
+        def run(lookup):
+            start_time = time.time()
+            for i in xrange(amount):
+                for phase in ['accept', 'reject', 'fail']:
+                    for plugin in lookup(phase):
+                        pass
+            return time.time() - start_time
+
+        before = run(sorted_lookup)
+        planned = run(task.plugins)
+        log.info('Entry phase lookups for %i entries: %.3f seconds sorting plugins on every lookup, '
+                 '%.3f seconds using execution plan (%.1f us vs %.1f us per entry)' %
+                 (amount, before, planned, before / amount * 1000000, planned / amount * 1000000))
+
+    def events(self, amount=100000):
+        """Measures cost of firing an event with zero, one and many handlers."""
+        import time
+        from flexget.event import add_event_handler, remove_event_handler, fire_event
+
+        def handler(*args, **kwargs):
+            pass
+
+        handlers = []
+        for count in [0, 1, 10, 100]:
+            while len(handlers) < count:
+                # each handler must be a distinct function
+                func = lambda *args, **kwargs: handler(*args, **kwargs)
+                add_event_handler('perftests.event', func, priority=len(handlers) % 5)
+                handlers.append(func)
+            start_time = time.time()
+            for i in xrange(amount):
+                fire_event('perftests.event', None, 'keyword')
+            took = time.time() - start_time
+            log.info('Firing event with %3i handlers: %.2f us per event' % (count, took / amount * 1000000))
+        for func in handlers:
+            remove_event_handler('perftests.event', func)
+
+    def snapshots(self, amount=10000, snapshots=3):
+        """Measures memory and time used by entry snapshots, compared to deep copying every field."""
+        import sys
+        import copy
+        import time
+        from flexget.entry import Entry
+
+        class Parsed(object):
+            # stands for parsed objects stored in entries, like torrents and series parsers
+            def __init__(self, i):
+                self.content = {'info': {'name': 'file %s' % i, 'pieces': b'x' * 2000, 'files': range(20)}}
+
+        def make_entries():
+            entries = []
+            for i in xrange(amount):
+                entry = Entry('Title %s' % i, 'http://localhost/%s' % i)
+                entry['description'] = '<p>description %s</p>' % i * 100
+                entry['tags'] = ['tag%s' % t for t in xrange(20)]
+                entry['info'] = {'size': i, 'seeds': i, 'peers': i}
+                entry['parsed'] = Parsed(i)
+                entries.append(entry)
+            return entries
+
+        def legacy_snapshot(entry, name):
+            entry.snapshots[name] = dict((field, copy.deepcopy(value)) for field, value in entry.iteritems())
+
+        def size(obj, seen):
+            # approximate size of objects reachable from obj and not already seen
+            if id(obj) in seen:
+                return 0
+            seen.add(id(obj))
+            total = sys.getsizeof(obj)
+            if isinstance(obj, dict):
+                total += sum(size(k, seen) + size(v, seen) for k, v in obj.iteritems())
+            elif isinstance(obj, (list, tuple, set, frozenset)):
+                total += sum(size(item, seen) for item in obj)
+            elif hasattr(obj, '__dict__'):
+                total += size(obj.__dict__, seen)
+            return total
+
+        def run(take_snapshot):
+            entries = make_entries()
+            start_time = time.time()
+            for i in xrange(snapshots):
+                for entry in entries:
+                    take_snapshot(entry, 'snapshot%s' % i)
+                    # plugins access and modify some of the fields between snapshots
+                    entry['info']['seeds'] += 1
+            took = time.time() - start_time
+            # values in entries are not counted
+            seen = set()
+            for entry in entries:
+                for value in dict.itervalues(entry):
+                    size(value, seen)
+            return took, sum(size(entry.snapshots, seen) for entry in entries)
+
+        legacy_took, legacy_size = run(legacy_snapshot)
+        took, snapshot_size = run(Entry.take_snapshot)
+        log.info('%i snapshots of %i entries: deep copy %.2f seconds %.1f MB, copy-on-write %.2f seconds %.1f MB' %
+                 (snapshots, amount, legacy_took, legacy_size / 1024 / 1024, took, snapshot_size / 1024 / 1024))
+
 
 register_plugin(PerfTests, 'perftests', api_ver=2, debug=True, builtin=True)
 register_parser_option('--perf-test', action='store', dest='perf_test', default='',
                        help=SUPPRESS)
+register_parser_option('--perf-test-output', action='store', dest='perf_test_output', metavar='FILE',
+                       help=SUPPRESS)
+register_parser_option('--perf-test-entries', action='store', type=int, dest='perf_test_entries', default=1000,
+                       help=SUPPRESS)
+register_parser_option('--perf-test-series', action='store', type=int, dest='perf_test_series', default=100,
+                       help=SUPPRESS)
+register_parser_option('--perf-test-rows', action='store', type=int, dest='perf_test_rows', default=1000000,
+                       help=SUPPRESS)
@@ -1,69 +1,294 @@
 from __future__ import unicode_literals, division, absolute_import
+import os
+import sys
+import json
+import time
 import logging
+import threading
 from argparse import SUPPRESS
+from datetime import datetime
+
 from flexget.plugin import register_parser_option
-from flexget.event import event
+from flexget.event import event, add_event_handler, remove_event_handler
+
+try:
+    import resource
+except ImportError:
+    resource = None
 
 log = logging.getLogger('performance')
 
+#: Measurements of current execution, {task name: {(phase, plugin): {metric: value}}}
 performance = {}
 
 _start = {}
 
 query_count = 0
 
+# Time current execution was started
+_execution_started = None
+# Event handlers registered while measuring
+_handlers = []
+_sql_listening = False
+
+#: Metrics recorded for each task, phase and plugin, with their description
+METRICS = [
+    ('calls', 'Number of times plugin was run'),
+    ('wall_seconds', 'Wall clock time spent in plugin'),
+    ('cpu_seconds', 'Process CPU time spent in plugin'),
+    ('sql_queries', 'Number of SQL queries executed'),
+    ('sql_seconds', 'Time spent executing SQL queries'),
+    ('http_requests', 'Number of HTTP requests made'),
+    ('http_bytes', 'Bytes in HTTP responses, as reported by Content-Length'),
+    ('http_seconds', 'Time spent in HTTP requests'),
+    ('entries_in', 'Entries in task before plugin was run'),
+    ('entries_out', 'Entries in task after plugin was run'),
+    ('peak_rss_bytes', 'Peak resident set size of the process after plugin was run')]
+
+
+#: Statistics kept for each cache, with their description
+CACHE_METRICS = [
+    ('hits', 'Number of lookups found from cache'),
+    ('misses', 'Number of lookups not found from cache'),
+    ('size', 'Number of items in cache')]
+
+
+class Counters(threading.local):
+    """Running totals of SQL queries and HTTP requests. Per thread, so that tasks executed in parallel don't mix."""
+
+    def __init__(self):
+        self.sql_queries = 0
+        self.sql_seconds = 0
+        self.http_requests = 0
+        self.http_bytes = 0
+        self.http_seconds = 0
+        self.query_started = []
+
+counters = Counters()
+
 
 def log_query_count(name_point):
     """Debugging purposes, allows logging number of executed queries at :name_point:"""
     log.info('At point named `%s` total of %s queries were ran' % (name_point, query_count))
 
 
+def cpu_time():
+    """:returns: User and system CPU time used by the process, in seconds."""
+    times = os.times()
+    return times[0] + times[1]
+
+
+def peak_rss():
+    """:returns: Peak resident set size of the process in bytes, or None if not available on this platform."""
+    if not resource:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # reported in bytes on OS X, kilobytes elsewhere
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _handlers:
+        counters.query_started.append(time.time())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    global query_count
+    if _handlers and counters.query_started:
+        counters.sql_seconds += time.time() - counters.query_started.pop()
+        counters.sql_queries += 1
+        query_count += 1
+
+
+def _listen_sql():
+    global _sql_listening
+    if _sql_listening:
+        return
+    # listeners can not be removed in this SQLAlchemy version, they do nothing when not measuring
+    from sqlalchemy import event as sa_event
+    from sqlalchemy.engine import Engine
+    sa_event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    sa_event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    _sql_listening = True
+
+
+def _sample(task):
+    return {'wall_seconds': time.time(),
+            'cpu_seconds': cpu_time(),
+            'sql_queries': counters.sql_queries,
+            'sql_seconds': counters.sql_seconds,
+            'http_requests': counters.http_requests,
+            'http_bytes': counters.http_bytes,
+            'http_seconds': counters.http_seconds,
+            'entries': len(task.all_entries)}
+
+
+def execute_started(manager):
+    global _execution_started
+    _execution_started = datetime.now()
+    performance.clear()
+    _start.clear()
+
+
+def before_plugin(task, keyword):
+    _start[task.name] = _sample(task)
+
+
+def after_plugin(task, keyword):
+    start = _start.pop(task.name, None)
+    if start is None:
+        return
+    end = _sample(task)
+    data = performance.setdefault(task.name, {}).setdefault((task.current_phase, keyword),
+                                                            dict.fromkeys((name for name, desc in METRICS), 0))
+    data['calls'] += 1
+    for metric in ['wall_seconds', 'cpu_seconds', 'sql_queries', 'sql_seconds', 'http_requests', 'http_bytes',
+                   'http_seconds']:
+        data[metric] += end[metric] - start[metric]
+    # summed over reruns
+    data['entries_in'] += start['entries']
+    data['entries_out'] += end['entries']
+    rss = peak_rss()
+    if rss is not None:
+        data['peak_rss_bytes'] = max(data['peak_rss_bytes'], rss)
+
+
+def request_completed(url, response, took):
+    counters.http_requests += 1
+    counters.http_seconds += took
+    try:
+        counters.http_bytes += int(response.headers.get('content-length') or 0)
+    except ValueError:
+        pass
+
+
+def cache_stats():
+    """:returns: Dict of statistics of shared caches, by cache name."""
+    from flexget.utils.titles import parse_cache
+    from flexget.utils.tools import regexp_cache
+    return {'title_parse': parse_cache.stats(), 'regexp': regexp_cache.stats()}
+
+
+def records():
+    """:returns: List of dicts, measurements of current execution for each task, phase and plugin."""
+    result = []
+    started = _execution_started.isoformat() if _execution_started else None
+    for task_name, plugins in sorted(performance.iteritems()):
+        for (phase, plugin), data in sorted(plugins.iteritems()):
+            record = {'execution': started, 'task': task_name, 'phase': phase, 'plugin': plugin}
+            record.update(data)
+            result.append(record)
+    return result
+
+
+def write_json_lines(path, records):
+    """Append *records* to JSON-lines file at *path*, one JSON object per line."""
+    with open(path, 'a') as f:
+        for record in records:
+            f.write(json.dumps(record, sort_keys=True) + '\n')
+
+
+def _prometheus_label(value):
+    return unicode(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def write_prometheus(path, records, caches=None):
+    """
+    Write *records* and statistics of *caches* to *path* in Prometheus text exposition format, replacing previous
+    contents.
+    File is replaced atomically so that it can be read by the node exporter textfile collector at any time.
+    """
+    lines = []
+    for metric, description in METRICS:
+        name = 'flexget_plugin_%s' % metric
+        lines.append('# HELP %s %s' % (name, description))
+        lines.append('# TYPE %s gauge' % name)
+        for record in records:
+            labels = ','.join('%s="%s"' % (label, _prometheus_label(record[label]))
+                              for label in ['task', 'phase', 'plugin'])
+            lines.append('%s{%s} %s' % (name, labels, record[metric]))
+    for metric, description in CACHE_METRICS if caches else []:
+        name = 'flexget_cache_%s' % metric
+        lines.append('# HELP %s %s' % (name, description))
+        lines.append('# TYPE %s gauge' % name)
+        for cache, stats in sorted(caches.iteritems()):
+            lines.append('%s{cache="%s"} %s' % (name, _prometheus_label(cache), stats[metric]))
+    if _execution_started:
+        lines.append('# HELP flexget_execution_timestamp_seconds Time the execution was started')
+        lines.append('# TYPE flexget_execution_timestamp_seconds gauge')
+        lines.append('flexget_execution_timestamp_seconds %s' % time.mktime(_execution_started.timetuple()))
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        f.write('\n'.join(lines).encode('utf-8') + '\n')
+    os.rename(temp_path, path)
+
+
+def execute_completed(manager):
+    options = manager.options
+    if options.debug_perf:
+        for name, data in performance.iteritems():
+            log.info('Performance results for task %s:' % name)
+            # results of plugins running on multiple phases are combined
+            combined = {}
+            for (phase, keyword), results in data.iteritems():
+                took, queries = combined.get(keyword, (0, 0))
+                combined[keyword] = (took + results['wall_seconds'], queries + results['sql_queries'])
+            for keyword, (took, queries) in combined.iteritems():
+                if took > 0.1 or queries > 10:
+                    log.info('%-15s took %0.2f sec (%s queries)' % (keyword, took, queries))
+        for name, stats in sorted(cache_stats().iteritems()):
+            log.info('%s cache: %s hits, %s misses, %s of %s items used' %
+                     (name, stats['hits'], stats['misses'], stats['size'], stats['max_size']))
+    if options.telemetry_json or options.telemetry_prometheus:
+        results = records()
+        try:
+            if options.telemetry_json:
+                write_json_lines(options.telemetry_json, results)
+            if options.telemetry_prometheus:
+                write_prometheus(options.telemetry_prometheus, results, cache_stats())
+        except (IOError, OSError) as e:
+            log.error('Unable to write telemetry: %s' % e)
+
+
+def enable():
+    """Start measuring plugin executions."""
+    if _handlers:
+        return
+    _listen_sql()
+    for name, func in [('manager.execute.started', execute_started),
+                       ('task.execute.before_plugin', before_plugin),
+                       ('task.execute.after_plugin', after_plugin),
+                       ('requests.completed', request_completed),
+                       ('manager.execute.completed', execute_completed)]:
+        add_event_handler(name, func)
+        _handlers.append((name, func))
+
+
+def enabled():
+    """:returns: True if plugin executions are being measured."""
+    return bool(_handlers)
+
+
+def disable():
+    """Stop measuring plugin executions."""
+    while _handlers:
+        remove_event_handler(*_handlers.pop())
+
+
 @event('manager.startup')
 def startup(manager):
-    if manager.options.debug_perf:
+    options = manager.options
+    if options.debug_perf:
         log.info('Enabling plugin and SQLAlchemy performance debugging')
-        import time
-
-        # Monkeypatch query counter for SQLAlchemy
-        from sqlalchemy.engine import Connection
-        if hasattr(Connection, 'execute'):
-            orig_f = Connection.execute
-
-            def monkeypatched(*args, **kwargs):
-                global query_count
-                query_count += 1
-                return orig_f(*args, **kwargs)
-
-            Connection.execute = monkeypatched
-        else:
-            log.critical('Unable to monkeypatch sqlalchemy')
-
-        @event('task.execute.before_plugin')
-        def before(task, keyword):
-            fd = _start.setdefault(task.name, {})
-            fd.setdefault('time', {})[keyword] = time.time()
-            fd.setdefault('queries', {})[keyword] = query_count
-
-        @event('task.execute.after_plugin')
-        def after(task, keyword):
-            took = time.time() - _start[task.name]['time'][keyword]
-            queries = query_count - _start[task.name]['queries'][keyword]
-            # Store results, increases previous values
-            pd = performance.setdefault(task.name, {})
-            data = pd.setdefault(keyword, {})
-            data['took'] = data.get('took', 0) + took
-            data['queries'] = data.get('queries', 0) + queries
-
-        @event('manager.execute.completed')
-        def results(manager):
-            for name, data in performance.iteritems():
-                log.info('Performance results for task %s:' % name)
-                for keyword, results in data.iteritems():
-                    took = results['took']
-                    queries = results['queries']
-                    if took > 0.1 or queries > 10:
-                        log.info('%-15s took %0.2f sec (%s queries)' % (keyword, took, queries))
+    if options.debug_perf or options.telemetry_json or options.telemetry_prometheus:
+        enable()
 
 
 register_parser_option('--debug-perf', action='store_true', dest='debug_perf', default=False,
                        help=SUPPRESS)
+register_parser_option('--telemetry-json', action='store', dest='telemetry_json', metavar='FILE',
+                       help='Append per task, phase and plugin performance measurements of each execution to '
+                            'JSON-lines FILE.')
+register_parser_option('--telemetry-prometheus', action='store', dest='telemetry_prometheus', metavar='FILE',
+                       help='Write performance measurements of the latest execution to FILE in Prometheus '
+                            'text format.')
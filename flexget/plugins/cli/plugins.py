@@ -1,7 +1,7 @@
 from __future__ import unicode_literals, division, absolute_import
 import logging
 from argparse import SUPPRESS
-from flexget.plugin import register_parser_option, plugins
+from flexget.plugin import register_parser_option, plugins, load_deferred_plugins
 from flexget.event import event
 
 log = logging.getLogger('plugins')
@@ -11,6 +11,7 @@ log = logging.getLogger('plugins')
 def plugins_summary(manager):
     if manager.options.plugins:
         manager.disable_tasks()
+        load_deferred_plugins()
         print '-' * 79
         print '%-20s%-30s%s' % ('Name', 'Roles (priority)', 'Info')
         print '-' * 79
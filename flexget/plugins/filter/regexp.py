@@ -5,6 +5,7 @@ import re
 
 from flexget.entry import Entry
 from flexget.plugin import register_plugin, priority, get_plugin_by_name
+from flexget.utils.tools import compile_regexp
 
 log = logging.getLogger('regexp')
 
@@ -113,10 +114,10 @@ class FilterRegexp(object):
                 # compile `not` option regexps
                 if 'not' in opts:
                     for idx, not_re in enumerate(opts['not'][:]):
-                        opts['not'][idx] = re.compile(not_re, re.IGNORECASE | re.UNICODE)
+                        opts['not'][idx] = compile_regexp(not_re, re.IGNORECASE | re.UNICODE)
 
                 # compile regexp and make sure regexp is a string for series like '24'
-                regexp = re.compile(unicode(regexp), re.IGNORECASE | re.UNICODE)
+                regexp = compile_regexp(unicode(regexp), re.IGNORECASE | re.UNICODE)
                 out_config.setdefault(operation, []).append({regexp: opts})
         return out_config
 
@@ -6,23 +6,57 @@ forget (string)
     Given string can be task name, remembered field (url, imdb_url) or a title. If given value is a
     task name then everything in that task will be forgotten. With title all learned fields from it and the
     title will be forgotten. With field value only that particular field is forgotten.
+
+Seen values are indexed by a fixed width hash of the value. Titles are partitioned by the month they were learned
+in. Database cleanup compacts monthly partitions older than :data:`COMPACT_AFTER` into yearly partitions, a batch
+of titles at a time, removing values the same task has already learned earlier.
+
+Seen values are looked up in bulk for the whole task. Values are first checked against a bloom filter of all
+seen values, which is kept in memory and stored in the database, so that most unseen values never reach the
+database.
 """
 
 from __future__ import unicode_literals, division, absolute_import
 import logging
+import struct
+import hashlib
+import threading
 from datetime import datetime, timedelta
-from sqlalchemy import Column, Integer, String, DateTime, Unicode, Boolean, asc, or_, select, update, Index
+from sqlalchemy import (Column, Integer, BigInteger, String, DateTime, Unicode, Boolean, LargeBinary, asc, or_,
+                        and_, select, update, exists, func, bindparam, Index)
 from sqlalchemy.schema import ForeignKey
 from sqlalchemy.orm import relation
 from flexget.manager import Session
 from flexget.event import event
 from flexget.plugin import register_plugin, priority, register_parser_option
 from flexget import schema
-from flexget.utils.sqlalchemy_utils import table_schema, table_add_column
+from flexget.utils.sqlalchemy_utils import table_schema, table_add_column, create_index
 from flexget.utils.imdb import is_imdb_url, extract_id
+from flexget.utils.tools import chunked
+from flexget.utils.bloom import BloomFilter
 
 log = logging.getLogger('seen')
-Base = schema.versioned_base('seen', 4)
+Base = schema.versioned_base('seen', 7)
+
+#: Number of rows updated at once by schema upgrade
+UPGRADE_BATCH = 10000
+#: Monthly partitions older than this are compacted into yearly partitions
+COMPACT_AFTER = timedelta(days=180)
+#: Number of titles compacted in one transaction
+COMPACT_BATCH = 900
+
+
+def value_hash(value):
+    """:returns: Fixed width digest of seen *value*, which is indexed instead of the value."""
+    value = value or ''
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+    return struct.unpack(b'<q', hashlib.md5(value).digest()[:8])[0]
+
+
+def period_of(date):
+    """:returns: Monthly partition of titles learned at *date*, yearly partitions have month 0."""
+    return date.year * 100 + date.month
 
 
 @schema.upgrade('seen')
@@ -49,6 +83,57 @@ def upgrade(ver, session):
         entry_table = table_schema('seen_entry', session)
         session.execute(update(entry_table, entry_table.c.local == None, {'local': False}))
         ver = 4
+    if ver == 4:
+        log.info('Adding hashed values to seen table, this may take a while.')
+        table_add_column('seen_field', 'value_hash', BigInteger, session)
+        table = table_schema('seen_field', session)
+        # go through rows by id, so they are not updated while being selected
+        query = select([table.c.id, table.c.value], order_by=table.c.id).limit(UPGRADE_BATCH)
+        statement = update(table, table.c.id == bindparam('row_id'), {'value_hash': bindparam('new_hash')})
+        last_id = 0
+        while True:
+            rows = session.execute(query.where(table.c.id > last_id)).fetchall()
+            if not rows:
+                break
+            session.execute(statement, [{'row_id': row['id'], 'new_hash': value_hash(row['value'])} for row in rows])
+            last_id = rows[-1]['id']
+        create_index('seen_field', session, 'value_hash')
+        # unbounded index of values is replaced by the hashes
+        session.execute('DROP INDEX IF EXISTS ix_seen_field_value')
+        ver = 5
+    if ver == 5:
+        log.info('Partitioning seen titles by age, this may take a while.')
+        table_add_column('seen_entry', 'period', Integer, session)
+        table = table_schema('seen_entry', session)
+        query = select([table.c.id, table.c.added], order_by=table.c.id).limit(UPGRADE_BATCH)
+        statement = update(table, table.c.id == bindparam('row_id'), {'period': bindparam('new_period')})
+        last_id = 0
+        while True:
+            rows = session.execute(query.where(table.c.id > last_id)).fetchall()
+            if not rows:
+                break
+            session.execute(statement, [{'row_id': row['id'], 'new_period': period_of(row['added'] or datetime.now())}
+                                        for row in rows])
+            last_id = rows[-1]['id']
+        create_index('seen_entry', session, 'period')
+        ver = 6
+    if ver == 6:
+        log.info('Rebuilding seen_field table, so that ids of removed values are not reused.')
+        session.execute('ALTER TABLE seen_field RENAME TO seen_field_old')
+        for index in ['ix_seen_field_seen_entry_id', 'ix_seen_field_value_hash']:
+            session.execute('DROP INDEX IF EXISTS %s' % index)
+        session.execute('CREATE TABLE seen_field (id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT, '
+                        'seen_entry_id INTEGER NOT NULL REFERENCES seen_entry (id), field VARCHAR, value VARCHAR, '
+                        'value_hash BIGINT, added DATETIME)')
+        session.execute('INSERT INTO seen_field (id, seen_entry_id, field, value, value_hash, added) '
+                        'SELECT id, seen_entry_id, field, value, value_hash, added FROM seen_field_old')
+        session.execute('DROP TABLE seen_field_old')
+        create_index('seen_field', session, 'seen_entry_id')
+        create_index('seen_field', session, 'value_hash')
+        # stored prefilter does not know how many values it has, it is built again
+        table_add_column('seen_prefilter', 'field_count', Integer, session)
+        session.execute('DELETE FROM seen_prefilter')
+        ver = 7
 
     return ver
 
@@ -63,6 +148,7 @@ class SeenEntry(Base):
     task = Column('feed', Unicode)
     added = Column(DateTime)
     local = Column(Boolean)
+    period = Column(Integer, index=True)
 
     fields = relation('SeenField', backref='seen_entry', cascade='all, delete, delete-orphan')
 
@@ -72,6 +158,7 @@ class SeenEntry(Base):
         self.task = task
         self.added = datetime.now()
         self.local = local
+        self.period = period_of(self.added)
 
     def __str__(self):
         return '<SeenEntry(title=%s,reason=%s,task=%s,added=%s)>' % (self.title, self.reason, self.task, self.added)
@@ -80,22 +167,248 @@ class SeenEntry(Base):
 class SeenField(Base):
 
     __tablename__ = 'seen_field'
+    # ids are never reused, prefilter finds new values by their ids
+    __table_args__ = {'sqlite_autoincrement': True}
 
     id = Column(Integer, primary_key=True)
     seen_entry_id = Column(Integer, ForeignKey('seen_entry.id'), nullable=False, index=True)
     field = Column(Unicode)
-    value = Column(Unicode, index=True)
+    value = Column(Unicode)
+    value_hash = Column(BigInteger, index=True)
     added = Column(DateTime)
 
     def __init__(self, field, value):
         self.field = field
         self.value = value
+        self.value_hash = value_hash(value)
         self.added = datetime.now()
 
     def __str__(self):
         return '<SeenField(field=%s,value=%s,added=%s)>' % (self.field, self.value, self.added)
 
 
+class SeenPrefilterState(Base):
+    """Stored :class:`SeenPrefilter`, only one row."""
+
+    __tablename__ = 'seen_prefilter'
+
+    id = Column(Integer, primary_key=True)
+    last_field_id = Column(Integer)
+    field_count = Column(Integer)
+    size = Column(Integer)
+    hashes = Column(Integer)
+    count = Column(Integer)
+    bits = Column(LargeBinary)
+
+
+class SeenPrefilter(object):
+    """
+    Bloom filter of all values in `seen_field`. Values not in the filter have certainly not been seen.
+
+    Rows added to `seen_field` after the filter was last updated, also by other processes, are added to the filter
+    by :meth:`sync` using their ids, which are never reused. Filter is built again when the number of rows does not
+    match, eg. when values have been removed.
+    """
+
+    #: Probability of an unseen value passing the filter
+    error_rate = 0.01
+    #: Smallest number of values a new filter is sized for
+    min_capacity = 100000
+
+    def __init__(self):
+        self.bloom = None
+        self.last_field_id = 0
+        self.field_count = 0
+        self.dirty = False
+        self.lock = threading.Lock()
+
+    def sync(self, session):
+        """Loads or builds the filter, and adds values learned since last sync."""
+        max_id, count = session.query(func.max(SeenField.id), func.count(SeenField.id)).one()
+        max_id = max_id or 0
+        if self.bloom is None:
+            self.load(session)
+        if self.bloom is not None and max_id >= self.last_field_id:
+            self.update(session, max_id)
+        if (self.bloom is None or max_id < self.last_field_id or self.field_count != count or
+                self.bloom.count > self.bloom.capacity):
+            self.rebuild(session, max_id)
+
+    def update(self, session, max_id=None):
+        """Adds values of rows added after last sync, eg. by this process."""
+        if self.bloom is None:
+            return
+        if max_id is None:
+            max_id = session.query(func.max(SeenField.id)).scalar() or 0
+        if max_id <= self.last_field_id:
+            return
+        query = select([SeenField.value], (SeenField.id > self.last_field_id) & (SeenField.id <= max_id))
+        values = [row[0] for row in session.execute(query)]
+        self.bloom.update(value for value in values if value)
+        self.field_count += len(values)
+        self.last_field_id = max_id
+        self.dirty = True
+
+    def load(self, session):
+        state = session.query(SeenPrefilterState).first()
+        if state and state.bits:
+            log.debug('Loaded seen prefilter of %s values' % state.count)
+            self.bloom = BloomFilter(state.size, state.hashes, state.bits, state.count)
+            self.last_field_id = state.last_field_id
+            self.field_count = state.field_count or 0
+
+    def rebuild(self, session, max_id):
+        count = session.query(func.count(SeenField.id)).filter(SeenField.id <= max_id).scalar()
+        log.verbose('Building seen prefilter of %s values, this is done only once.' % count)
+        self.bloom = BloomFilter.for_capacity(max(count * 2, self.min_capacity), self.error_rate)
+        self.bloom.update(row[0] for row in session.execute(select([SeenField.value], SeenField.id <= max_id))
+                          if row[0])
+        self.last_field_id = max_id
+        self.field_count = count
+        self.dirty = True
+
+    def invalidate(self, session):
+        """Values have been removed, filter is built again on next sync, also by other processes."""
+        session.query(SeenPrefilterState).delete()
+        self.reset()
+
+    def filter(self, values):
+        """:returns: Values which may have been seen, all of them if filter has not been loaded."""
+        if self.bloom is None:
+            return list(values)
+        return [value for value in values if value in self.bloom]
+
+    def save(self, session):
+        if not self.dirty or self.bloom is None:
+            return
+        state = session.query(SeenPrefilterState).first() or SeenPrefilterState()
+        state.last_field_id = self.last_field_id
+        state.field_count = self.field_count
+        state.size = self.bloom.size
+        state.hashes = self.bloom.hashes
+        state.count = self.bloom.count
+        state.bits = self.bloom.bits
+        session.add(state)
+        self.dirty = False
+
+    def reset(self):
+        self.bloom = None
+        self.last_field_id = 0
+        self.field_count = 0
+        self.dirty = False
+
+
+prefilter = SeenPrefilter()
+
+
+@event('manager.startup')
+def reset_prefilter(manager):
+    """Filter belongs to database of the manager."""
+    prefilter.reset()
+
+
+@event('manager.execute.completed')
+def save_prefilter(manager):
+    with prefilter.lock:
+        if not prefilter.dirty:
+            return
+        session = Session()
+        try:
+            prefilter.save(session)
+            session.commit()
+        finally:
+            session.close()
+
+
+def find_seen(session, values, task_name=None):
+    """
+    Looks up values in chunks.
+
+    :param values: Values to look for
+    :param string task_name: Look only for values learned by this task, otherwise for globally learned values
+    :returns: Dict of found values and the fields they were learned from
+    """
+    found = {}
+    values = set(values)
+    for chunk in chunked(set(value_hash(value) for value in values)):
+        query = session.query(SeenField.field, SeenField.value).join(SeenEntry).\
+            filter(SeenField.value_hash.in_(chunk))
+        if task_name:
+            query = query.filter(SeenEntry.task == task_name)
+        else:
+            query = query.filter(SeenEntry.local == False)
+        for field, value in query:
+            # different values may have the same hash
+            if value in values:
+                found.setdefault(value, field)
+    return found
+
+
+def _insert_entries(session, rows):
+    """Inserts `seen_entry` *rows*, returns their ids."""
+    table = SeenEntry.__table__
+    first_id = session.execute(table.insert(), rows[0]).inserted_primary_key[0]
+    if session.bind.dialect.name != 'sqlite':
+        return [first_id] + [session.execute(table.insert(), row).inserted_primary_key[0] for row in rows[1:]]
+    # This transaction now holds the write lock and sqlite gives the row after the largest id, so following ids
+    # can be given at once
+    ids = range(first_id, first_id + len(rows))
+    if len(rows) > 1:
+        session.execute(table.insert(), [dict(row, id=id) for id, row in zip(ids[1:], rows[1:])])
+    return ids
+
+
+def learn_seen(session, task_name, items, reason=None, local=False):
+    """
+    Marks values as seen with bulk inserts. Values already seen in the same scope are not stored again.
+
+    :param string task_name: Task learning the values
+    :param items: List of (title, fields) tuples, where fields is a list of (field, value) tuples
+    :param string reason: Reason stored with each title
+    :param bool local: Values are seen only by this task
+    :returns: Number of titles stored
+    """
+    values = set(value for title, fields in items for field, value in fields)
+    # pending changes must not be flushed while other tasks wait for the prefilter
+    session.flush()
+    with prefilter.lock:
+        prefilter.sync(session)
+        candidates = prefilter.filter(values)
+    seen = set(find_seen(session, candidates, task_name if local else None))
+
+    now = datetime.now()
+    entry_rows = []
+    field_rows = []
+    for title, fields in items:
+        new_fields = [(field, value) for field, value in fields if value not in seen]
+        if not new_fields:
+            log.debug("'%s' is already seen" % title)
+            continue
+        seen.update(value for field, value in new_fields)
+        entry_rows.append({'title': title, 'reason': reason, 'feed': task_name, 'added': now, 'local': local,
+                           'period': period_of(now)})
+        field_rows.append([{'field': field, 'value': value, 'value_hash': value_hash(value), 'added': now}
+                           for field, value in new_fields])
+        for field, value in new_fields:
+            log.debug("Learned '%s' (field: %s)" % (value, field))
+    if not entry_rows:
+        return 0
+
+    ids = _insert_entries(session, entry_rows)
+    session.execute(SeenField.__table__.insert(),
+                    [dict(row, seen_entry_id=id) for id, rows in zip(ids, field_rows) for row in rows])
+    removed = 0
+    if not local:
+        # Other tasks may have learned the same values after they were looked up. This transaction holds the write
+        # lock since the inserts, so values committed by them are visible now, copies learned here are removed.
+        removed, removed_fields = remove_duplicates(session, ids, same_task=False)
+        if removed_fields:
+            log.debug('%s values were learned meanwhile by other tasks' % removed_fields)
+    with prefilter.lock:
+        prefilter.update(session)
+    return len(entry_rows) - removed
+
+
 @event('forget')
 def forget(value):
     """
@@ -115,12 +428,16 @@ def forget(value):
             log.debug('forgetting %s' % se)
             session.delete(se)
 
-        for sf in session.query(SeenField).filter(SeenField.value == value).all():
+        for sf in session.query(SeenField).filter(SeenField.value_hash == value_hash(value)).\
+                filter(SeenField.value == value).all():
             se = session.query(SeenEntry).filter(SeenEntry.id == sf.seen_entry_id).first()
             field_count += len(se.fields)
             count += 1
             log.debug('forgetting %s' % se)
             session.delete(se)
+        if count:
+            with prefilter.lock:
+                prefilter.invalidate(session)
         return count, field_count
     finally:
         session.commit()
@@ -191,6 +508,7 @@ class MigrateSeen(object):
                 bar.update(index)
             se = SeenEntry(u'N/A', seen.task, u'migrated')
             se.added = seen.added
+            se.period = period_of(seen.added)
             se.fields.append(SeenField(seen.field, seen.value))
             session.add(se)
         bar.finish()
@@ -276,11 +594,11 @@ class SeenCmd(object):
                 seen_name = imdb_id
 
         session = Session()
-        se = SeenEntry(u'--seen', unicode(task.name))
-        sf = SeenField(u'--seen', seen_name)
-        se.fields.append(sf)
-        session.add(se)
-        session.commit()
+        try:
+            learn_seen(session, unicode(task.name), [(u'--seen', [(u'--seen', unicode(seen_name))])])
+            session.commit()
+        finally:
+            session.close()
 
         log.info('Added %s as seen. This will affect all tasks.' % seen_name)
 
@@ -317,8 +635,9 @@ class FilterSeen(object):
         fields = self.fields
         local = config == 'local'
 
+        # construct list of values looked for each entry
+        entry_values = []
         for entry in task.entries:
-            # construct list of values looked
             values = []
             for field in fields:
                 if field not in entry:
@@ -326,18 +645,27 @@ class FilterSeen(object):
                 if entry[field] not in values and entry[field]:
                     values.append(unicode(entry[field]))
             if values:
-                log.trace('querying for: %s' % ', '.join(values))
-                # check if SeenField.value is any of the values
-                found = task.session.query(SeenField).join(SeenEntry).filter(SeenField.value.in_(values))
-                if local:
-                    found = found.filter(SeenEntry.task == task.name)
-                else:
-                    found = found.filter(SeenEntry.local == False)
-                found = found.first()
-                if found:
-                    log.debug("Rejecting '%s' '%s' because of seen '%s'" % (entry['url'], entry['title'], found.value))
-                    entry.reject('Entry with %s `%s` is already seen' % (found.field, found.value),
-                                remember=remember_rejected)
+                entry_values.append((entry, values))
+        if not entry_values:
+            return
+
+        candidates = set(value for entry, values in entry_values for value in values)
+        task.session.flush()
+        with prefilter.lock:
+            prefilter.sync(task.session)
+            candidates = prefilter.filter(candidates)
+        log.trace('%s values may have been seen' % len(candidates))
+
+        # check which candidates are any SeenField.value
+        found = find_seen(task.session, candidates, task.name if local else None)
+
+        for entry, values in entry_values:
+            for value in values:
+                if value in found:
+                    log.debug("Rejecting '%s' '%s' because of seen '%s'" % (entry['url'], entry['title'], value))
+                    entry.reject('Entry with %s `%s` is already seen' % (found[value], value),
+                                 remember=remember_rejected)
+                    break
 
     def on_task_exit(self, task, config):
         """Remember succeeded entries"""
@@ -347,34 +675,46 @@ class FilterSeen(object):
 
         fields = self.fields
         if isinstance(config, list):
-            fields.extend(config)
+            # plugin instance is shared by all tasks, do not modify its fields
+            fields = fields + config
 
-        for entry in task.accepted:
-            self.learn(task, entry, fields=fields, local=config == 'local')
-            # verbose if in learning mode
-            if task.manager.options.learn:
+        self.learn_entries(task, task.accepted, fields=fields, local=config == 'local')
+        # verbose if in learning mode
+        if task.manager.options.learn:
+            for entry in task.accepted:
                 log.info("Learned '%s' (will skip this in the future)" % (entry['title']))
 
     def learn(self, task, entry, fields=None, reason=None, local=False):
         """Marks entry as seen"""
+        self.learn_entries(task, [entry], fields=fields, reason=reason, local=local)
+
+    def learn_entries(self, task, entries, fields=None, reason=None, local=False):
+        """Marks entries as seen, all of them at once"""
         # no explicit fields given, use default
         if not fields:
             fields = self.fields
-        se = SeenEntry(entry['title'], unicode(task.name), reason, local)
-        remembered = []
-        for field in fields:
-            if not field in entry:
-                continue
-            # removes duplicate values (eg. url, original_url are usually same)
-            if entry[field] in remembered:
-                continue
-            remembered.append(entry[field])
-            sf = SeenField(unicode(field), unicode(entry[field]))
-            se.fields.append(sf)
-            log.debug("Learned '%s' (field: %s)" % (entry[field], field))
-        # Only add the entry to the session if it has one of the required fields
-        if se.fields:
-            task.session.add(se)
+        items = []
+        for entry in entries:
+            remembered = []
+            values = []
+            for field in fields:
+                if not field in entry:
+                    continue
+                # removes duplicate values (eg. url, original_url are usually same)
+                if entry[field] in remembered:
+                    continue
+                remembered.append(entry[field])
+                values.append((unicode(field), unicode(entry[field])))
+            # Only entries which have one of the required fields are stored
+            if values:
+                items.append((entry['title'], values))
+        if items:
+            # values learned by other tasks after filtering are checked again by learn_seen
+            learn_seen(task.session, unicode(task.name), items, reason, local)
+            if not local:
+                # Global seen is shared by tasks, commit one at a time. Taken only after learn_seen holds the database
+                # write lock, so tasks waiting for it do not block the task holding it.
+                task.lock_shared_state('seen')
 
     def forget(self, task, title):
         """Forget SeenEntry with :title:. Return True if forgotten."""
@@ -382,18 +722,77 @@ class FilterSeen(object):
         if se:
             log.debug("Forgotten '%s' (%s fields)" % (title, len(se.fields)))
             task.session.delete(se)
+            task.session.flush()
+            with prefilter.lock:
+                prefilter.invalidate(task.session)
             return True
 
 
+def remove_duplicates(session, entry_ids, same_task=True):
+    """
+    Removes values of titles *entry_ids* which the same task has already learned earlier, and titles left without
+    values. Done with set based deletes, duplicates are not loaded from the database.
+
+    :param bool same_task: If False, globally learned values are removed if any task has learned them earlier
+    :returns: Tuple of removed titles and values
+    """
+    field, entry = SeenField.__table__, SeenEntry.__table__
+    # the deleted table must not be correlated into subqueries, so only aliases are selected from
+    duplicate_field, duplicate_entry = field.alias(), entry.alias()
+    earlier_field, earlier_entry = field.alias(), entry.alias()
+    same_scope = earlier_entry.c.feed == duplicate_entry.c.feed
+    if not same_task:
+        # globally learned values are seen by all tasks
+        same_scope = or_(same_scope, duplicate_entry.c.local == False)
+    earlier = select([earlier_field.c.id],
+                     and_(earlier_field.c.value_hash == duplicate_field.c.value_hash,
+                          earlier_field.c.value == duplicate_field.c.value, earlier_field.c.id < duplicate_field.c.id,
+                          earlier_entry.c.id == earlier_field.c.seen_entry_id,
+                          same_scope, earlier_entry.c.local == duplicate_entry.c.local))
+    duplicates = select([duplicate_field.c.id],
+                        and_(duplicate_entry.c.id.in_(entry_ids),
+                             duplicate_entry.c.id == duplicate_field.c.seen_entry_id, exists(earlier)))
+    removed_fields = session.execute(field.delete().where(field.c.id.in_(duplicates))).rowcount
+    removed_entries = 0
+    if removed_fields:
+        empty = ~exists(select([field.c.id], field.c.seen_entry_id == entry.c.id))
+        removed_entries = session.execute(entry.delete().where(entry.c.id.in_(entry_ids) & empty)).rowcount
+        with prefilter.lock:
+            prefilter.invalidate(session)
+    return removed_entries, removed_fields
+
+
+def compact(session, now=None):
+    """
+    Compacts monthly partitions older than :data:`COMPACT_AFTER` into yearly partitions. Titles are compacted
+    :data:`COMPACT_BATCH` at a time and *session* is committed after each batch, so the database is not locked
+    for long.
+
+    :returns: Tuple of removed titles and values
+    """
+    entry = SeenEntry.__table__
+    oldest_kept = period_of((now or datetime.now()) - COMPACT_AFTER)
+    monthly = select([entry.c.id], (entry.c.period < oldest_kept) & (entry.c.period % 100 != 0),
+                     order_by=entry.c.id).limit(COMPACT_BATCH)
+    removed_entries = removed_fields = 0
+    while True:
+        entry_ids = [row[0] for row in session.execute(monthly)]
+        if not entry_ids:
+            break
+        entries, fields = remove_duplicates(session, entry_ids)
+        removed_entries += entries
+        removed_fields += fields
+        session.execute(update(entry, entry.c.id.in_(entry_ids), {'period': entry.c.period - entry.c.period % 100}))
+        session.commit()
+    return removed_entries, removed_fields
+
+
 @event('manager.db_cleanup')
 def db_cleanup(session):
-    log.debug('TODO: Disabled because of ticket #1321')
-    return
-
-    # Remove seen fields over a year old
-    result = session.query(SeenField).filter(SeenField.added < datetime.now() - timedelta(days=365)).delete()
-    if result:
-        log.verbose('Removed %d seen fields older than 1 year.' % result)
+    # Seen values are not removed by age because of ticket #1321, old partitions are compacted instead
+    entries, fields = compact(session)
+    if entries or fields:
+        log.verbose('Compacted seen database, removed %d duplicate values and %d titles.' % (fields, entries))
 
 
 register_plugin(FilterSeen, 'seen', builtin=True, api_ver=2)
@@ -2,12 +2,14 @@ from __future__ import unicode_literals, division, absolute_import
 import logging
 import re
 import time
+import weakref
 from copy import copy
 from datetime import datetime, timedelta
 
 from sqlalchemy import (Column, Integer, String, Unicode, DateTime, Boolean,
                         desc, select, update, delete, ForeignKey, Index, func, and_, or_)
-from sqlalchemy.orm import relation, join
+from sqlalchemy.orm import relation, join, joinedload
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy.ext.hybrid import Comparator, hybrid_property
 from sqlalchemy.exc import OperationalError
 
@@ -15,10 +17,10 @@ from flexget import schema
 from flexget.event import event
 from flexget.utils import qualities
 from flexget.utils.log import log_once
-from flexget.utils.titles import SeriesParser, ParseWarning, ID_TYPES
+from flexget.utils.titles import SeriesParser, SeriesIndex, ParseWarning, ID_TYPES
 from flexget.utils.sqlalchemy_utils import (table_columns, table_exists, drop_tables, table_schema, table_add_column,
                                             create_index)
-from flexget.utils.tools import merge_dict_from_to, parse_timedelta
+from flexget.utils.tools import merge_dict_from_to, parse_timedelta, chunked
 from flexget.utils.database import quality_property
 from flexget.manager import Session
 from flexget.plugin import (register_plugin, register_parser_option, get_plugin_by_name, get_plugin_keywords,
@@ -313,6 +315,130 @@ class Release(Base):
         return unicode(self).encode('ascii', 'replace')
 
 
+# session -> SeriesCache
+_caches = weakref.WeakKeyDictionary()
+
+
+class SeriesCache(object):
+    """
+    Identity map of series, episodes and releases in a session. Series, and episodes with their releases, are
+    preloaded in bulk queries instead of being looked up one at a time. Lookups of anything not preloaded fall
+    back to querying the database.
+    """
+
+    def __init__(self, session):
+        # weak, so that the cache does not keep its session alive
+        self._session = weakref.ref(session)
+        # normalized name -> Series, or None if series is not in database
+        self.series = {}
+        # Series -> {identifier: Episode}, for series which have their episodes preloaded
+        self.episodes = {}
+        # Series -> {identified_by: count}
+        self.type_totals = {}
+
+    @property
+    def session(self):
+        return self._session()
+
+    @staticmethod
+    def of(session, create=False):
+        """:returns: Cache for *session*, or None if there isn't one and *create* is not given."""
+        cache = _caches.get(session)
+        if cache is None and create:
+            cache = _caches[session] = SeriesCache(session)
+        return cache
+
+    def preload_series(self, names):
+        """Loads all series with *names* in one query."""
+        names = set(normalize_series_name(unicode(name)) for name in names) - set(self.series)
+        if not names:
+            return
+        for name in names:
+            self.series[name] = None
+        for chunk in chunked(names):
+            for series in self.session.query(Series).filter(Series._name_normalized.in_(chunk)):
+                self.series[series._name_normalized] = series
+        log.debug('preloaded %s series' % len(names))
+
+    def preload_episodes(self, series):
+        """Loads episodes and releases of all *series* in one query."""
+        new = [s for s in series if s not in self.episodes]
+        by_id = dict((s.id, s) for s in new if s.id is not None)
+        episodes = dict((s, []) for s in by_id.itervalues())
+        for s in new:
+            self.episodes[s] = {}
+            self.type_totals.pop(s, None)
+        for chunk in chunked(by_id):
+            query = self.session.query(Episode).options(joinedload(Episode.releases)).\
+                filter(Episode.series_id.in_(chunk)).order_by(Episode.id)
+            for episode in query:
+                s = by_id[episode.series_id]
+                episodes[s].append(episode)
+                self.episodes[s].setdefault(episode.identifier, episode)
+        for s, eps in episodes.iteritems():
+            if 'episodes' not in s.__dict__:
+                # so that appending new episodes does not load them again
+                set_committed_value(s, 'episodes', eps)
+        log.debug('preloaded episodes of %s series' % len(new))
+
+    def preload_type_totals(self, series):
+        """Counts episodes of each identified_by type for all *series* in one query."""
+        ids = dict((s.id, s) for s in series if s.id is not None and s not in self.type_totals
+                   and s not in self.episodes)
+        for s in ids.itervalues():
+            self.type_totals[s] = {}
+        for chunk in chunked(ids):
+            query = self.session.query(Episode.series_id, Episode.identified_by, func.count(Episode.identified_by)).\
+                filter(Episode.series_id.in_(chunk)).group_by(Episode.series_id, Episode.identified_by)
+            for series_id, identified_by, count in query:
+                self.type_totals[ids[series_id]][identified_by] = count
+
+    def get_series(self, name):
+        """:returns: Series with *name*, or None if it is not in the database."""
+        key = normalize_series_name(unicode(name))
+        if key not in self.series:
+            self.series[key] = self.session.query(Series).filter(Series.name == name).first()
+        return self.series[key]
+
+    def add_series(self, series):
+        self.series[normalize_series_name(series.name)] = series
+        # a new series does not have any episodes to load
+        self.episodes[series] = {}
+
+    def get_episode(self, series, identifier):
+        """:returns: Episode of *series* with *identifier*, or None if it is not in the database."""
+        if series in self.episodes:
+            return self.episodes[series].get(identifier)
+        return self.session.query(Episode).filter(Episode.series_id == series.id).\
+            filter(Episode.identifier == identifier).\
+            filter(Episode.series_id != None).first()
+
+    def add_episode(self, series, episode):
+        if series in self.episodes:
+            self.episodes[series].setdefault(episode.identifier, episode)
+        self.type_totals.pop(series, None)
+
+    def get_release(self, series, episode, parser):
+        """:returns: Release of *episode* matching *parser*, or None if it is not in the database."""
+        if series in self.episodes:
+            # releases were loaded with the episode, or the episode is new
+            for release in episode.releases:
+                if (release.title == parser.data and release._quality == parser.quality.name and
+                        release.proper_count == parser.proper_count):
+                    return release
+            return
+        # NOTE:
+        #
+        # filter(Release.episode_id != None) fixes weird bug where release had/has been added
+        # to database but doesn't have episode_id, this causes all kinds of havoc with the plugin.
+        # perhaps a bug in sqlalchemy?
+        return self.session.query(Release).filter(Release.episode_id == episode.id).\
+            filter(Release.title == parser.data).\
+            filter(Release.quality == parser.quality).\
+            filter(Release.proper_count == parser.proper_count).\
+            filter(Release.episode_id != None).first()
+
+
 class SeriesDatabase(object):
 
     """Provides API to series database"""
@@ -341,8 +467,17 @@ class SeriesDatabase(object):
         """
 
         session = Session.object_session(series)
-        type_totals = dict(session.query(Episode.identified_by, func.count(Episode.identified_by)).join(Series).
-                           filter(Series.id == series.id).group_by(Episode.identified_by).all())
+        cache = SeriesCache.of(session)
+        if cache and series in cache.episodes:
+            type_totals = {}
+            for episode in cache.episodes[series].itervalues():
+                if episode.identified_by is not None:
+                    type_totals[episode.identified_by] = type_totals.get(episode.identified_by, 0) + 1
+        elif cache and series in cache.type_totals:
+            type_totals = dict(cache.type_totals[series])
+        else:
+            type_totals = dict(session.query(Episode.identified_by, func.count(Episode.identified_by)).join(Series).
+                               filter(Series.id == series.id).group_by(Episode.identified_by).all())
         # Remove None and specials from the dict,
         # we are only considering episodes that we know the type of (parsed with new parser)
         type_totals.pop(None, None)
@@ -376,15 +511,28 @@ class SeriesDatabase(object):
         :return: Instance of Episode or None if not found.
         """
         session = Session.object_session(series)
-        downloaded = session.query(Episode).join(Release, Series).\
-            filter(Series.id == series.id).\
-            filter(Release.downloaded == True)
-        if series.identified_by in ['ep', 'sequence']:
-            latest_download = downloaded.order_by(desc(Episode.season), desc(Episode.number)).first()
-        elif series.identified_by == 'date':
-            latest_download = downloaded.order_by(desc(Episode.identifier)).first()
+        cache = SeriesCache.of(session)
+        if cache and series in cache.episodes:
+            downloaded = [ep for ep in cache.episodes[series].itervalues() if ep.downloaded_releases]
+            # sorted like the query, where nulls are smaller than any value
+            nullable = lambda value: (value is not None, value)
+            if series.identified_by in ['ep', 'sequence']:
+                key = lambda ep: (nullable(ep.season), nullable(ep.number))
+            elif series.identified_by == 'date':
+                key = lambda ep: nullable(ep.identifier)
+            else:
+                key = lambda ep: ep.first_seen
+            latest_download = max(downloaded, key=key) if downloaded else None
         else:
-            latest_download = downloaded.order_by(desc(Episode.first_seen)).first()
+            downloaded = session.query(Episode).join(Release, Series).\
+                filter(Series.id == series.id).\
+                filter(Release.downloaded == True)
+            if series.identified_by in ['ep', 'sequence']:
+                latest_download = downloaded.order_by(desc(Episode.season), desc(Episode.number)).first()
+            elif series.identified_by == 'date':
+                latest_download = downloaded.order_by(desc(Episode.identifier)).first()
+            else:
+                latest_download = downloaded.order_by(desc(Episode.first_seen)).first()
 
         if not latest_download:
             log.debug('get_latest_download returning None, no downloaded episodes found for: %s' % series.name)
@@ -426,24 +574,22 @@ class SeriesDatabase(object):
         :param series: Series in database to add release to. Will be looked up if not provided.
         :return:
         """
+        cache = SeriesCache.of(session) or SeriesCache(session)
         if not series:
             # if series does not exist in database, add new
-            series = session.query(Series).\
-                filter(Series.name == parser.name).\
-                filter(Series.id != None).first()
+            series = cache.get_series(parser.name)
             if not series:
                 log.debug('adding series %s into db' % parser.name)
                 series = Series()
                 series.name = parser.name
                 session.add(series)
+                cache.add_series(series)
                 log.debug('-> added %s' % series)
 
         releases = []
         for ix, identifier in enumerate(parser.identifiers):
             # if episode does not exist in series, add new
-            episode = session.query(Episode).filter(Episode.series_id == series.id).\
-                filter(Episode.identifier == identifier).\
-                filter(Episode.series_id != None).first()
+            episode = cache.get_episode(series, identifier)
             if not episode:
                 log.debug('adding episode %s into series %s' % (identifier, parser.name))
                 episode = Episode()
@@ -457,20 +603,11 @@ class SeriesDatabase(object):
                     episode.season = 0
                     episode.number = parser.id + ix
                 series.episodes.append(episode)  # pylint:disable=E1103
+                cache.add_episode(series, episode)
                 log.debug('-> added %s' % episode)
 
             # if release does not exists in episodes, add new
-            #
-            # NOTE:
-            #
-            # filter(Release.episode_id != None) fixes weird bug where release had/has been added
-            # to database but doesn't have episode_id, this causes all kinds of havoc with the plugin.
-            # perhaps a bug in sqlalchemy?
-            release = session.query(Release).filter(Release.episode_id == episode.id).\
-                filter(Release.title == parser.data).\
-                filter(Release.quality == parser.quality).\
-                filter(Release.proper_count == parser.proper_count).\
-                filter(Release.episode_id != None).first()
+            release = cache.get_release(series, episode, parser)
             if not release:
                 log.debug('adding release %s into episode' % parser)
                 release = Release()
@@ -774,14 +911,48 @@ class FilterSeries(SeriesDatabase, FilterSeriesBase):
     def on_task_metainfo(self, task):
         config = self.prepare_config(task.config.get('series', {}))
         self.auto_exact(config)
+        cache = SeriesCache.of(task.session, create=True)
+        cache.preload_series(series_item.keys()[0] for series_item in config)
+        # history is needed for series which do not have their id type locked in yet
+        auto_series = []
         for series_item in config:
+            series_name, series_config = series_item.items()[0]
+            series = cache.get_series(series_name)
+            if series and 'identified_by' not in series_config and \
+                    (not series.identified_by or series.identified_by == 'auto'):
+                auto_series.append(series)
+        cache.preload_type_totals(auto_series)
+        candidates = self.candidate_entries(task.entries, config)
+        for index, series_item in enumerate(config):
             series_name, series_config = series_item.items()[0]
             log.trace('series_name: %s series_config: %s' % (series_name, series_config))
             start_time = time.clock()
-            self.parse_series(task.session, task.entries, series_name, series_config)
+            self.parse_series(task.session, candidates.get(index, []), series_name, series_config)
             took = time.clock() - start_time
             log.trace('parsing %s took %s' % (series_name, took))
 
+    def candidate_entries(self, entries, config):
+        """
+        Find entries which may match each series in *config*, so that series are not parsed from entries
+        which cannot match their name.
+
+        :returns: Dict from index of series in *config* to list of entries in original order
+        """
+        index = SeriesIndex()
+        for position, series_item in enumerate(config):
+            series_name, series_config = series_item.items()[0]
+            index.add(position, unicode(series_name), series_config.get('name_regexp'))
+        candidates = {}
+        for entry in entries:
+            found = set()
+            for field in ('title', 'description'):
+                data = entry.get(field)
+                if isinstance(data, basestring) and data:
+                    found.update(index.candidates(data))
+            for position in found:
+                candidates.setdefault(position, []).append(entry)
+        return candidates
+
     def on_task_filter(self, task):
         """Filter series"""
         # Parsing was done in metainfo phase, create the dicts to pass to process_series from the task entries
@@ -794,29 +965,42 @@ class FilterSeries(SeriesDatabase, FilterSeriesBase):
             if entry.get('series_name') and entry.get('series_id') and entry.get('series_parser'):
                 found_series.setdefault(entry['series_name'], []).append(entry)
 
+        cache = SeriesCache.of(task.session, create=True)
+        cache.preload_series(series_item.keys()[0] for series_item in config)
+        db_series = {}
         for series_item in config:
             series_name, series_config = series_item.items()[0]
             if series_config.get('parse_only'):
-                log.debug('Skipping filtering of series %s because of parse_only' % series_name)
                 continue
             # Make sure number shows (e.g. 24) are turned into strings
             series_name = unicode(series_name)
             # Update database with capitalization from config
-            db_series = task.session.query(Series).filter(Series.name == series_name).first()
-            if db_series:
-                db_series.name = series_name
+            series = cache.get_series(series_name)
+            if series:
+                series.name = series_name
             else:
                 log.debug('adding series %s into db' % series_name)
-                db_series = Series()
-                db_series.name = series_name
-                task.session.add(db_series)
-                log.debug('-> added %s' % db_series)
+                series = Series()
+                series.name = series_name
+                task.session.add(series)
+                cache.add_series(series)
+                log.debug('-> added %s' % series)
+            db_series[series_name] = series
+        # episodes and releases are needed only for series which have entries in this task
+        cache.preload_episodes(series for name, series in db_series.iteritems() if name in found_series)
+
+        for series_item in config:
+            series_name, series_config = series_item.items()[0]
+            if series_config.get('parse_only'):
+                log.debug('Skipping filtering of series %s because of parse_only' % series_name)
+                continue
+            series_name = unicode(series_name)
             if not series_name in found_series:
                 continue
             series_entries = {}
             for entry in found_series[series_name]:
                 # store found episodes into database and save reference for later use
-                releases = self.store(task.session, entry['series_parser'], series=db_series)
+                releases = self.store(task.session, entry['series_parser'], series=db_series[series_name])
                 entry['series_releases'] = releases
                 series_entries.setdefault(releases[0].episode, []).append(entry)
 
@@ -865,7 +1049,7 @@ class FilterSeries(SeriesDatabase, FilterSeriesBase):
 
         # set parser flags flags based on config / database
         identified_by = config.get('identified_by', 'auto')
-        series = session.query(Series).filter(Series.name == series_name).first()
+        series = SeriesCache.of(session, create=True).get_series(series_name)
         if series:
             # configuration always overrides everything
             if 'identified_by' in config:
@@ -60,7 +60,8 @@ class Discover(object):
                     raise PluginError('Plugin %s does not support API v2' % input_name)
                 method = input.phase_handlers['input']
                 try:
-                    result = method(task, input_config)
+                    # input may produce entries lazily, errors can happen while they are produced
+                    result = list(method(task, input_config) or [])
                 except PluginError as e:
                     log.warning('Error during input plugin %s: %s' % (input_name, e))
                     continue
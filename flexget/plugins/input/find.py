@@ -57,7 +57,6 @@ class InputFind(object):
     @cached('find')
     def on_task_input(self, task, config):
         self.prepare_config(config)
-        entries = []
         match = re.compile(config['regexp'], re.IGNORECASE).match
         # Default to utf-8 if we get None from getfilesystemencoding()
         fs_encoding = sys.getfilesystemencoding() or 'utf-8'
@@ -86,10 +85,9 @@ class InputFind(object):
                     if not filepath.startswith('/'):
                         filepath = '/' + filepath
                     e['url'] = 'file://%s' % (filepath)
-                    entries.append(e)
+                    yield e
                 # If we are not searching recursively, break after first (base) directory
                 if not config['recursive']:
                     break
-        return entries
 
 register_plugin(InputFind, 'find', api_ver=2)
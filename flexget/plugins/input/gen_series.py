@@ -64,7 +64,7 @@ class GenSeries(object):
         if self.entries:
             log.info('There are still %d left to be processed!' % len(self.entries))
             # rerun ad infinitum, also commits session between them
-            task._rerun = True
+            task.rerun(reuse_entries=False)
             task._rerun_count = 0
 
 
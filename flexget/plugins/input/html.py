@@ -71,7 +71,7 @@ class InputHtml(object):
             log.debug('Basic auth enabled. User: %s Password: %s' % (config['username'], config['password']))
             auth = (config['username'], config['password'])
 
-        page = task.requests.get(config['url'], auth=auth)
+        page = task.requests.get(config['url'], auth=auth, share_response=True)
         soup = get_soup(page.text)
 
         # dump received content into a file
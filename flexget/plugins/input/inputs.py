@@ -24,7 +24,7 @@ class PluginInputs(object):
         return root
 
     def on_task_input(self, task, config):
-        entries = []
+        """Yields entries from each input as they are produced, skipping duplicates."""
         entry_titles = set()
         entry_urls = set()
         for item in config:
@@ -34,30 +34,30 @@ class PluginInputs(object):
                     raise PluginError('Plugin %s does not support API v2' % input_name)
 
                 method = input.phase_handlers['input']
+                produced = 0
                 try:
-                    result = method(task, input_config)
+                    # input may also produce entries lazily, so errors can happen during iteration
+                    for entry in method(task, input_config) or []:
+                        produced += 1
+                        if entry['title'] in entry_titles:
+                            log.debug('Title `%s` already in entry list, skipping.' % entry['title'])
+                            continue
+                        urls = ([entry['url']] if entry.get('url') else []) + entry.get('urls', [])
+                        if any(url in entry_urls for url in urls):
+                            log.debug('URL for `%s` already in entry list, skipping.' % entry['title'])
+                            continue
+                        entry_titles.add(entry['title'])
+                        entry_urls.update(urls)
+                        yield entry
                 except PluginError as e:
                     log.warning('Error during input plugin %s: %s' % (input_name, e))
                     continue
-                if not result:
+                if not produced:
                     msg = 'Input %s did not return anything' % input_name
                     if getattr(task, 'no_entries_ok', False):
                         log.verbose(msg)
                     else:
                         log.warning(msg)
-                    continue
-                for entry in result:
-                    if entry['title'] in entry_titles:
-                        log.debug('Title `%s` already in entry list, skipping.' % entry['title'])
-                        continue
-                    urls = ([entry['url']] if entry.get('url') else []) + entry.get('urls', [])
-                    if any(url in entry_urls for url in urls):
-                        log.debug('URL for `%s` already in entry list, skipping.' % entry['title'])
-                        continue
-                    entries.append(entry)
-                    entry_titles.add(entry['title'])
-                    entry_urls.update(urls)
-        return entries
 
 
 register_plugin(PluginInputs, 'inputs', api_ver=2)
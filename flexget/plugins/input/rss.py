@@ -211,7 +211,8 @@ class InputRSS(object):
                 auth = (config['username'], config['password'])
             try:
                 # Use the raw response so feedparser can read the headers and status values
-                response = task.requests.get(config['url'], timeout=60, headers=headers, raise_status=False, auth=auth)
+                response = task.requests.get(config['url'], timeout=60, headers=headers, raise_status=False, auth=auth,
+                                             share_response=True)
                 content = response.content
             except RequestException as e:
                 raise PluginError('Unable to download the RSS for task %s (%s): %s' %
@@ -1,10 +1,10 @@
 from __future__ import unicode_literals, division, absolute_import
 import os
-import re
 import logging
 from flexget.entry import Entry
 from flexget.plugin import register_plugin, register_parser_option, PluginError
 from flexget.utils.cached_input import cached
+from flexget.utils.tools import compile_regexp
 
 log = logging.getLogger('tail')
 
@@ -126,7 +126,7 @@ class InputTail(object):
 
                 for field, regexp in entry_config.iteritems():
                     #log.debug('search field: %s regexp: %s' % (field, regexp))
-                    match = re.search(regexp, line)
+                    match = compile_regexp(regexp).search(line)
                     if match:
                         # check if used field detected, in such case start with new entry
                         if field in used:
@@ -2,6 +2,7 @@ from __future__ import unicode_literals, division, absolute_import
 import logging
 import re
 from flexget.plugin import priority, register_plugin
+from flexget.utils.tools import compile_regexp
 
 log = logging.getLogger('manipulate')
 
@@ -101,7 +102,7 @@ class Manipulate(object):
                     if not field_value:
                         log.warning('Cannot extract, field `%s` is not present' % from_field)
                         continue
-                    match = re.search(config['extract'], field_value, re.I | re.U)
+                    match = compile_regexp(config['extract'], re.I | re.U).search(field_value)
                     if match:
                         groups = [x for x in match.groups() if x is not None]
                         log.debug('groups: %s' % groups)
@@ -113,7 +114,7 @@ class Manipulate(object):
                         log.warning('Cannot replace, field `%s` is not present' % from_field)
                         continue
                     replace_config = config['replace']
-                    regexp = re.compile(replace_config['regexp'], flags=re.I | re.U)
+                    regexp = compile_regexp(replace_config['regexp'], re.I | re.U)
                     field_value = regexp.sub(replace_config['format'], field_value).strip()
                     log.debug('field `%s` after replace: `%s`' % (field, field_value))
 
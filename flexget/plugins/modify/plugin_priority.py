@@ -1,6 +1,6 @@
 from __future__ import unicode_literals, division, absolute_import
 import logging
-from flexget.plugin import plugins, register_plugin
+from flexget.plugin import plugins, register_plugin, plugins_changed
 
 log = logging.getLogger('p_priority')
 
@@ -37,6 +37,7 @@ class PluginPriority(object):
                 log.debug('stored %s original value %s' % (phase, event.priority))
                 event.priority = priority
                 log.debug('set %s new value %s' % (phase, priority))
+        plugins_changed()
         log.debug('Changed priority for: %s' % ', '.join(names))
 
     def on_task_exit(self, task):
@@ -49,6 +50,7 @@ class PluginPriority(object):
             originals = self.priorities[name]
             for phase, priority in originals.iteritems():
                 plugins[name].phase_handlers[phase].priority = priority
+        plugins_changed()
         log.debug('Restored priority for: %s' % ', '.join(names))
         self.priorities = {}
 
@@ -1,7 +1,7 @@
 from __future__ import unicode_literals, division, absolute_import
 import logging
 from flexget import plugin
-from flexget.plugin import priority, register_plugin, plugins
+from flexget.plugin import priority, register_plugin, plugins, plugins_changed
 
 log = logging.getLogger('builtins')
 
@@ -38,6 +38,7 @@ class PluginDisableBuiltins(object):
             if config is True or plugin.name in config:
                 plugin.builtin = False
                 self.disabled.append(plugin.name)
+        plugins_changed()
         log.debug('Disabled builtin plugin(s): %s' % ', '.join(self.disabled))
 
     @priority(-255)
@@ -47,6 +48,7 @@ class PluginDisableBuiltins(object):
 
         for name in self.disabled:
             plugin.plugins[name].builtin = True
+        plugins_changed()
         log.debug('Enabled builtin plugin(s): %s' % ', '.join(self.disabled))
         self.disabled = []
 
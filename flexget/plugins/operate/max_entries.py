@@ -0,0 +1,22 @@
+from __future__ import unicode_literals, division, absolute_import
+import logging
+from flexget.plugin import register_plugin
+
+log = logging.getLogger('max_entries')
+
+
+class PluginMaxEntries(object):
+    """
+        Limits number of entries taken from inputs. Inputs which produce entries lazily (eg. find) are stopped
+        once task has this many entries, and the rest of the inputs are not run.
+
+        Example:
+
+        max_entries: 1000
+    """
+
+    def validator(self):
+        from flexget import validator
+        return validator.factory('integer')
+
+register_plugin(PluginMaxEntries, 'max_entries', api_ver=2)
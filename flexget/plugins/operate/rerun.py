@@ -7,7 +7,7 @@ log = logging.getLogger('rerun')
 
 
 class MaxReRuns(object):
-    """Force a task to rerun for debugging purposes."""
+    """Force a task to rerun for debugging purposes, entries from the first run are reused."""
 
     def validator(self):
         root = validator.factory('boolean')
@@ -16,7 +16,7 @@ class MaxReRuns(object):
     def on_task_start(self, task, config):
         if config and not task.is_rerun:
             log.debug('forcing a task rerun')
-            task.rerun()
+            task.rerun(reuse_entries=True)
 
 
 register_plugin(MaxReRuns, 'rerun', api_ver=2, debug=True)
@@ -0,0 +1,24 @@
+from __future__ import unicode_literals, division, absolute_import
+import logging
+from flexget.plugin import register_plugin
+
+log = logging.getLogger('schedule')
+
+
+class PluginSchedule(object):
+    """
+        Interval between executions of the task when FlexGet is running with --daemon.
+        Has no effect otherwise, use interval plugin to limit how often task is executed from cron.
+
+        Format: [n] [minutes|hours|days|weeks]
+
+        Example:
+
+        schedule: 15 minutes
+    """
+
+    def validator(self):
+        from flexget import validator
+        return validator.factory('interval')
+
+register_plugin(PluginSchedule, 'schedule', api_ver=2)
@@ -48,7 +48,7 @@ class ImportSeries(FilterSeriesBase):
                 raise PluginError('Plugin %s does not support API v2' % input_name)
 
             method = input.phase_handlers['input']
-            result = method(task, input_config)
+            result = list(method(task, input_config) or [])
             if not result:
                 log.warning('Input %s did not return anything' % input_name)
                 continue
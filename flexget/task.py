@@ -4,22 +4,47 @@ import copy
 import hashlib
 from functools import wraps
 import itertools
+import bisect
+import threading
+import time
 
 from sqlalchemy import Column, Unicode, String, Integer
 
 from flexget import validator
 from flexget import schema
 from flexget.manager import Session, register_config_key
-from flexget.plugin import (get_plugins_by_phase, get_plugin_by_name, task_phases, PluginWarning, PluginError,
-                            DependencyError, plugins as all_plugins)
+from flexget.plugin import (get_plugin_by_name, get_registry_version, get_validated_plugin_keywords, task_phases,
+                            phase_methods, PluginWarning, PluginError, DependencyError, plugins as all_plugins)
 from flexget.utils.simple_persistence import SimpleTaskPersistence
-from flexget.event import fire_event
+from flexget.event import event, fire_event
 from flexget.entry import Entry, EntryUnicodeError
+from flexget.utils import trace
 import flexget.utils.requests as requests
 
 log = logging.getLogger('task')
 Base = schema.versioned_base('feed', 0)
 
+# Validator trees built by plugins, by plugin name. Cleared when plugins change.
+_plugin_validators = {}
+_plugin_validators_version = None
+# Cached validators are not thread safe, they hold the errors of current validation
+_validation_lock = threading.Lock()
+# Results of config validation by task name, as tuples of ((config hash, registry version), errors, checked
+# filesystem)
+_validation_results = {}
+validation_stats = {'hits': 0, 'misses': 0}
+# Guards validation results and stats, tasks are validated by parallel workers
+_validation_results_lock = threading.Lock()
+
+
+@event('manager.execute.started')
+def clear_validation_results(manager):
+    """Results which depend on the filesystem (eg. paths existing) are only reused within an execution."""
+    with _validation_results_lock:
+        for name, result in _validation_results.items():
+            if result[2]:
+                del _validation_results[name]
+
 
 class TaskConfigHash(Base):
     """Stores the config hash for tasks so that we can tell if the config has changed since last run."""
@@ -50,22 +75,51 @@ def useTaskLogging(func):
 
 
 class EntryIterator(object):
-    """An iterator over a subset of entries to emulate old task.accepted/rejected/failed/entries properties."""
+    """An iterator over a subset of entries to emulate old task.accepted/rejected/failed/entries properties.
+
+    Entries are looked up from per state indexes kept by :class:`EntryContainer`, so length and truth value
+    are O(1). Iteration follows the order of the container and, like filtering the container would, sees
+    entries changing state during iteration."""
 
     def __init__(self, entries, states):
         self.all_entries = entries
         if isinstance(states, basestring):
             states = [states]
-        self.filter = lambda e: e._state in states
+        self.states = tuple(states)
 
     def __iter__(self):
-        return itertools.ifilter(self.filter, self.all_entries)
+        seqs, entries = self.all_entries._index_seqs, self.all_entries._index_entries
+        if len(self.states) == 1:
+            state_seqs, state_entries = seqs[self.states[0]], entries[self.states[0]]
+            index = 0
+            while index < len(state_seqs):
+                seq = state_seqs[index]
+                yield state_entries[index]
+                if index < len(state_seqs) and state_seqs[index] == seq:
+                    index += 1
+                else:
+                    # entries have changed state while we were yielding, find our position again
+                    index = bisect.bisect_right(state_seqs, seq)
+            return
+        last = -1
+        while True:
+            found = None
+            for state in self.states:
+                index = bisect.bisect_right(seqs[state], last)
+                if index < len(seqs[state]) and (found is None or seqs[state][index] < found[0]):
+                    found = (seqs[state][index], entries[state][index])
+            if found is None:
+                return
+            last = found[0]
+            yield found[1]
 
     def __bool__(self):
-        return any(e for e in self)
+        return len(self) > 0
+
+    __nonzero__ = __bool__
 
     def __len__(self):
-        return sum(1 for e in self)
+        return sum(len(self.all_entries._index_seqs[state]) for state in self.states)
 
     def __add__(self, other):
         return itertools.chain(self, other)
@@ -76,6 +130,8 @@ class EntryIterator(object):
     def __getitem__(self, item):
         if not isinstance(item, int):
             raise ValueError('Index must be integer.')
+        if len(self.states) == 1 and 0 <= item < len(self):
+            return self.all_entries._index_entries[self.states[0]][item]
         for index, entry in enumerate(self):
             if index == item:
                 return entry
@@ -92,14 +148,36 @@ class EntryIterator(object):
         self.all_entries.sort(*args, **kwargs)
 
 
+def _reindexing(method):
+    """Decorates a list method of :class:`EntryContainer` to rebuild state indexes after it has been called."""
+
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._reindex()
+
+    wrapper.__name__ = method.__name__
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+
 class EntryContainer(list):
-    """Container for a list of entries, also contains accepted, rejected failed iterators over them."""
+    """Container for a list of entries, also contains accepted, rejected failed iterators over them.
+
+    Keeps an index of entries per state, updated by :class:`~flexget.entry.Entry` when its state changes.
+    Entries in the index are ordered by a sequence number which follows their position in the container."""
+
+    states = ['undecided', 'accepted', 'rejected', 'failed']
+    # entries in these states hide undecided entries with same title and url from Task.undecided
+    decided_states = ['accepted', 'rejected']
 
     def __init__(self, iterable=None, task=None):
         list.__init__(self, iterable or [])
         self.task = task
         for entry in self:
             entry.task = task
+        self._reindex()
 
         self._entries = EntryIterator(self, ['undecided', 'accepted'])
         self._accepted = EntryIterator(self, 'accepted')  # accepted entries, can still be rejected
@@ -114,6 +192,63 @@ class EntryContainer(list):
     failed = property(lambda self: self._failed)
     undecided = property(lambda self: self._undecided)
 
+    def _reindex(self):
+        """Rebuild state indexes, numbering entries by their position in the container."""
+        self._members = {}
+        self._index_seqs = dict((state, []) for state in self.states)
+        self._index_entries = dict((state, []) for state in self.states)
+        # number of decided entries by (title, url), and (title, url) of each decided entry by sequence number
+        self._decided = {}
+        self._decided_keys = {}
+        for seq, entry in enumerate(self):
+            self._add_to_index(seq, entry)
+        self._next_seq = len(self)
+
+    def _add_to_index(self, seq, entry):
+        self._members.setdefault(id(entry), []).append(seq)
+        entry._add_container(self)
+        self._index_insert(entry._state, seq, entry)
+
+    def _index_insert(self, state, seq, entry):
+        if state in self.decided_states:
+            key = (entry.get('title'), entry.get('url'))
+            self._decided_keys[seq] = key
+            self._decided[key] = self._decided.get(key, 0) + 1
+        seqs, entries = self._index_seqs[state], self._index_entries[state]
+        if not seqs or seqs[-1] < seq:
+            seqs.append(seq)
+            entries.append(entry)
+        else:
+            index = bisect.bisect_left(seqs, seq)
+            seqs.insert(index, seq)
+            entries.insert(index, entry)
+
+    def _index_remove(self, state, seq):
+        key = self._decided_keys.pop(seq, None) if state in self.decided_states else None
+        if key is not None:
+            self._decided[key] -= 1
+            if not self._decided[key]:
+                del self._decided[key]
+        seqs, entries = self._index_seqs[state], self._index_entries[state]
+        index = bisect.bisect_left(seqs, seq)
+        if index < len(seqs) and seqs[index] == seq:
+            del seqs[index]
+            del entries[index]
+
+    def is_decided(self, entry):
+        """
+        :returns: True if an accepted or rejected entry in the container has same title and url as *entry*, as they
+            were when it was accepted or rejected.
+        """
+        return (entry.get('title'), entry.get('url')) in self._decided
+
+    def _state_changed(self, entry, old_state, new_state):
+        """Called by :class:`~flexget.entry.Entry` when its state changes."""
+        for seq in self._members.get(id(entry), []):
+            if old_state is not None:
+                self._index_remove(old_state, seq)
+            self._index_insert(new_state, seq, entry)
+
     def append(self, entry):
         """
         Add entry to this container and set :attr:`~flexget.entry.Entry.task`
@@ -125,11 +260,26 @@ class EntryContainer(list):
             raise ValueError('Entry is not valid, title or url is missing.')
         entry.task = self.task
         list.append(self, entry)
+        self._add_to_index(self._next_seq, entry)
+        self._next_seq += 1
 
     def extend(self, iterable):
         for entry in iterable:
             self.append(entry)
 
+    # Other list modifications may reorder entries, rebuild the index after them
+    insert = _reindexing(list.insert)
+    remove = _reindexing(list.remove)
+    pop = _reindexing(list.pop)
+    sort = _reindexing(list.sort)
+    reverse = _reindexing(list.reverse)
+    __setitem__ = _reindexing(list.__setitem__)
+    __delitem__ = _reindexing(list.__delitem__)
+    __setslice__ = _reindexing(list.__setslice__)
+    __delslice__ = _reindexing(list.__delslice__)
+    __iadd__ = _reindexing(list.__iadd__)
+    __imul__ = _reindexing(list.__imul__)
+
     def __repr__(self):
         return '<EntryContainer(task=%s,%s)' % (self.task.name, list.__repr__(self))
 
@@ -164,6 +314,9 @@ class Task(object):
 
     max_reruns = 5
 
+    #: Phases which are not executed again on rerun, entries and their metainfo from previous run are reused
+    rerun_reused_phases = ['input', 'metainfo']
+
     def __init__(self, manager, name, config):
         """
         :param Manager manager: Manager instance.
@@ -179,10 +332,20 @@ class Task(object):
 
         # not to be reset
         self._rerun_count = 0
+        # entries carried over from previous execution to a rerun
+        self._rerun_entries = None
+        # checkpoints of entries after the phases reused on rerun, {id(entry): (entry, checkpoint)}
+        self._rerun_checkpoints = None
+        # time spent in phases during the execution, used to report time saved by reruns
+        self._phase_times = {}
 
         # This should not be used until after process_start, when it is evaluated
         self.config_modified = None
 
+        # execution plan, rebuilt when plugins or configured plugin keywords change
+        self._plan = None
+        self._plan_key = None
+
         # use reset to init variables when creating
         self._reset()
 
@@ -217,6 +380,10 @@ class Task(object):
         self._silent_abort = False
 
         self._rerun = False
+        self._rerun_reuse = True
+
+        # shared state locks held by this task until it has committed
+        self._held_locks = {}
 
         # current state
         self.current_phase = None
@@ -239,7 +406,9 @@ class Task(object):
     @property
     def undecided(self):
         """Iterate over undecided entries"""
-        return (entry for entry in self.entries if not entry in self.accepted and entry not in self.rejected)
+        # entries are compared by title and url, as `entry in self.accepted` would do, when they are reached so that
+        # entries accepted or rejected during iteration hide later entries
+        return (entry for entry in self.all_entries.undecided if not self.all_entries.is_decided(entry))
 
     def disable_phase(self, phase):
         """Disable ``phase`` from execution.
@@ -256,6 +425,26 @@ class Task(object):
             log.debug('Disabling %s phase' % phase)
             self.disabled_phases.append(phase)
 
+    def lock_shared_state(self, key):
+        """Acquire manager wide lock for shared state *key*, blocking while another task holds it.
+
+        The lock is held until the task has committed its session, which is the conflict rule for
+        tasks executed in parallel (see :class:`~flexget.manager.Manager`). Tasks sharing state run
+        the part from acquiring the lock to committing one at a time, in order of acquiring.
+
+        :param string key: Name of the shared state, eg. ``seen``
+        """
+        if key in self._held_locks:
+            return
+        lock = self.manager.shared_lock(key)
+        lock.acquire()
+        self._held_locks[key] = lock
+
+    def _release_shared_state(self):
+        for lock in self._held_locks.itervalues():
+            lock.release()
+        self._held_locks = {}
+
     def abort(self, reason='Unknown', **kwargs):
         """Abort this task execution, no more plugins will be executed after the current one exists."""
         if self._abort:
@@ -299,10 +488,26 @@ class Task(object):
           An iterator over configured :class:`flexget.plugin.PluginInfo` instances enabled on this task.
         """
         if phase:
-            plugins = sorted(get_plugins_by_phase(phase), key=lambda p: p.phase_handlers[phase], reverse=True)
-        else:
-            plugins = all_plugins.itervalues()
-        return (p for p in plugins if p.name in self.config or p.builtin)
+            return iter(self.execution_plan(phase))
+        return (p for p in all_plugins.itervalues() if p.name in self.config or p.builtin)
+
+    def execution_plan(self, phase):
+        """Get enabled plugins for a phase in execution order.
+
+        Plugins for all phases are sorted once into an execution plan, which is rebuilt only when plugin keywords
+        in the task config change or when :func:`flexget.plugin.plugins_changed` has been called.
+
+        :param string phase: Name of the phase, including entry phases (accept, reject, fail)
+        :return: Tuple of :class:`flexget.plugin.PluginInfo` instances
+        """
+        if phase not in phase_methods:
+            raise Exception('Unknown phase %s' % phase)
+        key = (get_registry_version(), frozenset(self.config))
+        if key != self._plan_key:
+            log.trace('building execution plan for %s' % self.name)
+            self._plan = build_execution_plan(self.config)
+            self._plan_key = key
+        return self._plan.get(phase, ())
 
     def __run_task_phase(self, phase):
         """Executes task phase, ie. call all enabled plugins on the task.
@@ -330,6 +535,9 @@ class Task(object):
             # Abort this phase if one of the plugins disables it
             if phase in self.disabled_phases:
                 return
+            if phase == 'input' and self._max_entries_reached():
+                log.verbose('Task has %s entries (max_entries), skipping rest of the inputs' % len(self.all_entries))
+                return
             # store execute info, except during entry events
             self.current_phase = phase
             self.current_plugin = plugin.name
@@ -344,10 +552,7 @@ class Task(object):
 
             try:
                 fire_event('task.execute.before_plugin', self, plugin.name)
-                response = self.__run_plugin(plugin, phase, args)
-                if phase == 'input' and response:
-                    # add entries returned by input to self.entries
-                    self.all_entries.extend(response)
+                self.__run_plugin(plugin, phase, args)
             finally:
                 fire_event('task.execute.after_plugin', self, plugin.name)
 
@@ -359,8 +564,7 @@ class Task(object):
         # TODO: entry events are not very elegant, refactor into real (new) events or something ...
         if phase not in ['accept', 'reject', 'fail']:
             raise Exception('Not a valid entry phase')
-        phase_plugins = self.plugins(phase)
-        for plugin in phase_plugins:
+        for plugin in self.execution_plan(phase):
             self.__run_plugin(plugin, phase, (self, entry), kwargs)
 
     def __run_plugin(self, plugin, phase, args=None, kwargs=None):
@@ -383,7 +587,11 @@ class Task(object):
         # log.trace('Running %s method %s' % (keyword, method))
         # call the plugin
         try:
-            return method(*args, **kwargs)
+            response = method(*args, **kwargs)
+            if phase == 'input' and response:
+                # inputs may produce entries lazily, consumed here so that errors are handled the same way
+                self._add_input_entries(response)
+            return response
         except PluginWarning as warn:
             # check if this warning should be logged only once (may keep repeating)
             if warn.kwargs.get('log_once', False):
@@ -413,10 +621,40 @@ class Task(object):
             if self.manager.unit_test:
                 raise
 
-    def rerun(self):
+    def _max_entries_reached(self):
+        max_entries = self.config.get('max_entries')
+        return bool(max_entries) and len(self.all_entries) >= max_entries
+
+    def _add_input_entries(self, entries):
+        """
+        Add entries produced by an input plugin to the task as they are produced. Invalid entries are skipped.
+        Stops consuming *entries* when task has `max_entries`.
+
+        :param entries: List of entries, or an iterator producing them
+        """
+        for entry in entries:
+            if not entry.isvalid():
+                log.warning('Input %s produced invalid entry %r, title or url is missing' %
+                            (self.current_plugin, dict.get(entry, 'title')))
+                continue
+            self.all_entries.append(entry)
+            if self._max_entries_reached():
+                log.verbose('Task has %s entries (max_entries), ignoring rest of the input' % len(self.all_entries))
+                # stop generator, so that it does not hold resources until garbage collected
+                if hasattr(entries, 'close'):
+                    entries.close()
+                break
+
+    def rerun(self, reuse_entries=False):
         """Immediately re-run the task after execute has completed,
-        task can be re-run up to :attr:`.max_reruns` times."""
+        task can be re-run up to :attr:`.max_reruns` times.
+
+        :param bool reuse_entries: Rerun only filter and later phases for entries from this run, keeping their
+            metainfo. Entries can be reused only if rerun is requested before :attr:`.rerun_reused_phases` have
+            completed (eg. on task start), otherwise input and metainfo phases are executed again.
+        """
         self._rerun = True
+        self._rerun_reuse = self._rerun_reuse and reuse_entries
         log.info('Plugin %s has requested task to be ran again after execution has completed.' %
                  self.current_plugin)
 
@@ -447,12 +685,20 @@ class Task(object):
 
         # Store original config state to be restored if a rerun is needed
         config_backup = copy.deepcopy(self.config)
+        rerun_entries, self._rerun_entries = self._rerun_entries, None
+        if rerun_entries is None:
+            self._phase_times = {}
+            self._rerun_checkpoints = None
 
         self._reset()
         # Handle keyword args
         if disable_phases:
             map(self.disable_phase, disable_phases)
-        if entries:
+        if rerun_entries is not None:
+            # Entries from previous run already went through input and metainfo
+            map(self.disable_phase, self.rerun_reused_phases)
+            self.all_entries.extend(rerun_entries)
+        elif entries:
             # If entries are passed for this execution (eg. rerun), disable the input phase
             self.disable_phase('input')
             self.all_entries.extend(entries)
@@ -471,9 +717,10 @@ class Task(object):
 
         log.debug('starting session')
         self.session = Session()
+        self.simple_persistence.begin()
 
         # Save current config hash and set config_modidied flag
-        config_hash = hashlib.md5(str(sorted(self.config.items()))).hexdigest()
+        config_hash = self.config_hash()
         last_hash = self.session.query(TaskConfigHash).filter(TaskConfigHash.task == self.name).first()
         if self.is_rerun:
             # Make sure on rerun config is not marked as modified
@@ -491,6 +738,9 @@ class Task(object):
         try:
             # run phases
             for phase in task_phases:
+                if rerun_entries is not None and phase in self.rerun_reused_phases:
+                    log.debug('Reusing %s phase results from previous run' % phase)
+                    continue
                 if phase in self.disabled_phases:
                     # log keywords not executed
                     for plugin in self.plugins(phase):
@@ -500,7 +750,15 @@ class Task(object):
                     continue
 
                 # run all plugins with this phase
-                self.__run_task_phase(phase)
+                started = time.time()
+                with trace.span(phase, 'phase', task=self.name):
+                    self.__run_task_phase(phase)
+                if rerun_entries is None:
+                    self._phase_times[phase] = time.time() - started
+                    if phase == self.rerun_reused_phases[-1] and self._rerun and self._rerun_reuse:
+                        # reruns continue from entries as they were after this phase
+                        self._rerun_checkpoints = dict((id(entry), (entry, entry.checkpoint()))
+                                                       for entry in self.all_entries)
 
                 # if abort flag has been set task should be aborted now
                 # since this calls return rerun will not be done
@@ -508,11 +766,14 @@ class Task(object):
                     return
 
             log.debug('committing session, abort=%s' % self._abort)
+            self.simple_persistence.flush()
             self.session.commit()
             fire_event('task.execute.completed', self)
         finally:
             # this will cause database rollback on exception and task.abort
             self.session.close()
+            self.simple_persistence.end()
+            self._release_shared_state()
 
         # rerun task
         if self._rerun:
@@ -525,7 +786,10 @@ class Task(object):
                 self._rerun_count += 1
                 # Restore config to original state before running again
                 self.config = config_backup
+                if self._rerun_reuse and self._rerun_checkpoints is not None:
+                    self._rerun_entries = self._prepare_rerun_entries()
                 self.execute(disable_phases=disable_phases, entries=entries)
+        self._rerun_checkpoints = None
 
         # Clean up entries after the task has executed to reduce ram usage, #1652
         # TODO: This doesn't work with unified entries, not sure best replacement
@@ -535,20 +799,71 @@ class Task(object):
             self.rejected = []
             self.failed = []"""
 
+    def _prepare_rerun_entries(self):
+        """
+        Collect entries from this execution for a rerun. Accepted entries have already been handled by outputs
+        and failed ones are not retried within the same run, only undecided and rejected entries can end up
+        differently on rerun. Their fields are restored to the state after the reused phases, so they keep their
+        metainfo (parser results, lazy lookups) but not the changes made by later phases, and their state is reset.
+
+        :returns: List of entries for rerun.
+        """
+        reused = []
+        dropped = 0
+        for entry in self.all_entries:
+            if entry.accepted or entry.failed:
+                dropped += 1
+                continue
+            checkpoint = self._rerun_checkpoints.get(id(entry))
+            if checkpoint and checkpoint[0] is entry:
+                entry.restore(checkpoint[1])
+            entry._state = 'undecided'
+            entry.traces = []
+            reused.append(entry)
+        saved = sum(self._phase_times.get(phase, 0) for phase in self.rerun_reused_phases)
+        log.verbose('Rerun reuses %s entries, skipping phases %s (%.2f seconds in first run), '
+                    '%s accepted or failed entries are not processed again' %
+                    (len(reused), ', '.join(self.rerun_reused_phases), saved, dropped))
+        return reused
+
     def _process_start(self):
         """Execute process_start phase"""
-        self.__run_task_phase('process_start')
+        with trace.span('process_start', 'phase', task=self.name):
+            self.__run_task_phase('process_start')
 
     def _process_end(self):
         """Execute terminate phase for this task"""
         if self.manager.options.validate:
             log.debug('No process_end phase with --check')
             return
-        self.__run_task_phase('process_end')
+        with trace.span('process_end', 'phase', task=self.name):
+            self.__run_task_phase('process_end')
+
+    def config_hash(self):
+        """:returns: md5 hash of current config, stored in :class:`TaskConfigHash`."""
+        return hashlib.md5(str(sorted(self.config.items()))).hexdigest()
 
     def validate(self):
-        """Called during task execution. Validates config, prints errors and aborts task if invalid."""
-        errors = self.validate_config(self.config)
+        """
+        Called during task execution. Validates config, prints errors and aborts task if invalid.
+        Validation is skipped if config (or plugins) have not changed since the task was last validated, or during
+        current execution if validation checked the filesystem.
+        """
+        key = (self.config_hash(), get_registry_version())
+        with _validation_results_lock:
+            cached = _validation_results.get(self.name)
+            if cached and cached[0] == key:
+                validation_stats['hits'] += 1
+                errors = list(cached[1])
+            else:
+                validation_stats['misses'] += 1
+                errors = None
+            stats = dict(validation_stats)
+        if errors is None:
+            errors, checked_filesystem = self._validate_config(self.config)
+            with _validation_results_lock:
+                _validation_results[self.name] = (key, list(errors), checked_filesystem)
+        log.debug('config validation cache hits: %(hits)s misses: %(misses)s' % stats)
         # log errors and abort
         if errors:
             log.critical('Task \'%s\' has configuration errors:' % self.name)
@@ -561,11 +876,17 @@ class Task(object):
     @staticmethod
     def validate_config(config):
         """Plugin configuration validation. Return list of error messages that were detected."""
+        return Task._validate_config(config)[0]
+
+    @staticmethod
+    def _validate_config(config):
+        """:returns: Tuple of error messages, and whether validation checked the filesystem"""
         validate_errors = []
+        checked_filesystem = False
         # validate config is a dictionary
         if not isinstance(config, dict):
             validate_errors.append('Config is not a dictionary.')
-            return validate_errors
+            return validate_errors, checked_filesystem
         # validate all plugins
         for keyword in config:
             if keyword.startswith('_'):
@@ -576,28 +897,63 @@ class Task(object):
                 validate_errors.append('Unknown plugin \'%s\'' % keyword)
                 continue
             if hasattr(plugin.instance, 'validator'):
-                try:
-                    validator = plugin.instance.validator()
-                except TypeError as e:
-                    log.critical('Invalid validator method in plugin %s' % keyword)
-                    log.exception(e)
-                    continue
-                if not validator.name == 'root':
-                    # if validator is not root type, add root validator as it's parent
-                    validator = validator.add_root_parent()
-                if not validator.validate(config[keyword]):
-                    for msg in validator.errors.messages:
-                        validate_errors.append('%s %s' % (keyword, msg))
+                with _validation_lock:
+                    try:
+                        validator = get_plugin_validator(plugin)
+                    except TypeError as e:
+                        log.critical('Invalid validator method in plugin %s' % keyword)
+                        log.exception(e)
+                        continue
+                    if not validator.validate(config[keyword]):
+                        for msg in validator.errors.messages:
+                            validate_errors.append('%s %s' % (keyword, msg))
+                    checked_filesystem = checked_filesystem or validator.errors.checked_filesystem
             else:
                 log.warning('Used plugin %s does not support validating. Please notify author!' % keyword)
 
-        return validate_errors
+        return validate_errors, checked_filesystem
+
+
+def get_plugin_validator(plugin):
+    """
+    :param plugin: :class:`~flexget.plugin.PluginInfo` of a plugin that has a validator
+    :return: Root validator built by *plugin*, with no errors. Cached until plugins change.
+    """
+    global _plugin_validators_version
+    if _plugin_validators_version != get_registry_version():
+        _plugin_validators.clear()
+        _plugin_validators_version = get_registry_version()
+    root = _plugin_validators.get(plugin.name)
+    if root is None:
+        root = plugin.instance.validator()
+        if not root.name == 'root':
+            # if validator is not root type, add root validator as it's parent
+            root = root.add_root_parent()
+        _plugin_validators[plugin.name] = root
+    # forget errors from previous validation
+    root._errors = None
+    return root
+
+
+def build_execution_plan(config):
+    """
+    :param config: Task configuration
+    :return: Dict mapping phase names to tuples of plugins enabled by *config*, sorted by handler priority
+    """
+    plan = {}
+    for plugin in all_plugins.itervalues():
+        if plugin.name in config or plugin.builtin:
+            for phase in plugin.phase_handlers:
+                plan.setdefault(phase, []).append(plugin)
+    for phase, plugins in plan.iteritems():
+        plan[phase] = tuple(sorted(plugins, key=lambda p: p.phase_handlers[phase], reverse=True))
+    return plan
 
 
 def root_config_validator():
     """Returns a validator for the 'tasks' key of config."""
     # TODO: better error messages
-    valid_plugins = [p for p in all_plugins if hasattr(all_plugins[p].instance, 'validator')]
+    valid_plugins = get_validated_plugin_keywords()
     root = validator.factory('dict')
     root.reject_keys(valid_plugins, message='plugins should go under a specific task. '
                                             '(and tasks are not allowed to be named the same as any plugins)')
@@ -0,0 +1,71 @@
+"""Bloom filter, a compact set of strings that can tell when a string has certainly not been added."""
+
+from __future__ import unicode_literals, division, absolute_import
+import math
+import struct
+import hashlib
+
+
+class BloomFilter(object):
+    """
+    Set of strings which gives false positives at about the given error rate, but never false negatives.
+    Strings can not be removed.
+    """
+
+    def __init__(self, size, hashes, bits=None, count=0):
+        """
+        :param int size: Number of bits
+        :param int hashes: Number of bits set for each string
+        :param bits: Bits of previously stored filter, see :attr:`bits`
+        :param int count: Number of strings in previously stored filter
+        """
+        self.size = size
+        self.hashes = hashes
+        self._bits = bytearray(bits) if bits is not None else bytearray((size + 7) // 8)
+        #: Number of strings added, duplicates included
+        self.count = count
+
+    @classmethod
+    def for_capacity(cls, capacity, error_rate=0.01):
+        """
+        :param int capacity: Number of strings after which the error rate starts to grow
+        :param float error_rate: Wanted probability of false positives
+        :returns: Empty :class:`BloomFilter` sized for *capacity* strings
+        """
+        capacity = max(capacity, 1)
+        size = int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        hashes = max(int(round(size / capacity * math.log(2))), 1)
+        return cls(size, hashes)
+
+    @property
+    def capacity(self):
+        """Number of strings the filter was sized for."""
+        return int(self.size * math.log(2) / self.hashes)
+
+    @property
+    def bits(self):
+        """Bits of the filter as a byte string, for storing."""
+        return bytes(self._bits)
+
+    def _indexes(self, value):
+        if isinstance(value, unicode):
+            value = value.encode('utf-8')
+        # double hashing, see Kirsch and Mitzenmacher: Less Hashing, Same Performance
+        first, second = struct.unpack(b'<QQ', hashlib.md5(value).digest())
+        for i in xrange(self.hashes):
+            yield (first + i * second) % self.size
+
+    def add(self, value):
+        for index in self._indexes(value):
+            self._bits[index >> 3] |= 1 << (index & 7)
+        self.count += 1
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+
+    def __contains__(self, value):
+        for index in self._indexes(value):
+            if not self._bits[index >> 3] & (1 << (index & 7)):
+                return False
+        return True
@@ -118,13 +118,8 @@ class cached(object):
             else:
                 if self.persist and not task.manager.options.nocache:
                     # Check database cache
-                    db_cache = task.session.query(InputCache).filter(InputCache.name == self.name).\
-                        filter(InputCache.hash == hash).\
-                        filter(InputCache.added > datetime.now() - self.persist).\
-                        first()
-                    if db_cache:
-                        entries = [Entry(e.entry) for e in db_cache.entries]
-                        log.verbose('Restored %s entries from db cache' % len(entries))
+                    entries = self.load_db_cache(task, hash, max_age=self.persist)
+                    if entries is not None:
                         # Store to in memory cache
                         self.cache[cache_name] = copy.deepcopy(entries)
                         return entries
@@ -136,45 +131,105 @@ class cached(object):
                     response = func(*args, **kwargs)
                 except PluginError as e:
                     # If there was an error producing entries, but we have valid entries in the db cache, return those.
-                    if self.persist and not task.manager.options.nocache:
-                        db_cache = task.session.query(InputCache).filter(InputCache.name == self.name).\
-                            filter(InputCache.hash == hash).first()
-                        if db_cache and db_cache.entries:
-                            log.error('There was an error during %s input (%s), using cache instead.' %
-                                    (self.name, e))
-                            entries = [Entry(e.entry) for e in db_cache.entries]
-                            log.verbose('Restored %s entries from db cache' % len(entries))
-                            # Store to in memory cache
-                            self.cache[cache_name] = copy.deepcopy(entries)
-                            return entries
-                    # If there was nothing in the db cache, re-raise the error.
-                    raise
+                    entries = self.load_db_cache_on_error(task, cache_name, hash, e)
+                    if entries is None:
+                        # If there was nothing in the db cache, re-raise the error.
+                        raise
+                    return entries
                 if api_ver == 1:
                     response = task.entries
-                if not isinstance(response, list):
-                    log.warning('Input %s did not return a list, cannot cache.' % self.name)
+                if isinstance(response, list):
+                    self.store(task, cache_name, hash, response)
                     return response
-                # store results to cache
-                log.debug('storing to cache %s %s entries' % (cache_name, len(response)))
-                try:
-                    self.cache[cache_name] = copy.deepcopy(response)
-                except TypeError:
-                    # might be caused because of backlog restoring some idiotic stuff, so not neccessarily a bug
-                    log.critical('Unable to save task content into cache, if problem persists longer than a day please report this as a bug')
-                if self.persist:
-                    # Store to database
-                    log.debug('Storing cache %s to database.' % cache_name)
-                    db_cache = task.session.query(InputCache).filter(InputCache.name == self.name).\
-                        filter(InputCache.hash == hash).first()
-                    if not db_cache:
-                        db_cache = InputCache(name=self.name, hash=hash)
-                    db_cache.entries = [InputCacheEntry(entry=e) for e in response]
-                    db_cache.added = datetime.now()
-                    task.session.merge(db_cache)
+                if hasattr(response, 'next'):
+                    # entries are produced lazily, they are cached once all have been produced
+                    return self.store_when_produced(task, cache_name, hash, response)
+                log.warning('Input %s did not return a list, cannot cache.' % self.name)
                 return response
 
         return wrapped_func
 
+    def load_db_cache(self, task, hash, max_age=None, allow_empty=True):
+        """
+        :param timedelta max_age: Ignore cache older than this
+        :param bool allow_empty: Whether a cache without entries is used
+        :return: List of entries from the database cache, or None if there is no cache.
+        """
+        query = task.session.query(InputCache).filter(InputCache.name == self.name).\
+            filter(InputCache.hash == hash)
+        if max_age:
+            query = query.filter(InputCache.added > datetime.now() - max_age)
+        db_cache = query.first()
+        if not db_cache or not (allow_empty or db_cache.entries):
+            return None
+        entries = [Entry(e.entry) for e in db_cache.entries]
+        log.verbose('Restored %s entries from db cache' % len(entries))
+        return entries
+
+    def load_db_cache_on_error(self, task, cache_name, hash, error):
+        """:return: List of entries from the database cache to be used instead after *error*, or None."""
+        if not self.persist or task.manager.options.nocache:
+            return None
+        entries = self.load_db_cache(task, hash, allow_empty=False)
+        if entries is not None:
+            log.error('There was an error during %s input (%s), using cache instead.' % (self.name, error))
+            # Store to in memory cache
+            self.cache[cache_name] = copy.deepcopy(entries)
+        return entries
+
+    def store(self, task, cache_name, hash, entries, copied=False):
+        """
+        :param list entries: Entries to store
+        :param bool copied: True if *entries* are copies made before they were added to the task
+        """
+        # store results to cache
+        log.debug('storing to cache %s %s entries' % (cache_name, len(entries)))
+        try:
+            self.cache[cache_name] = entries if copied else copy.deepcopy(entries)
+        except TypeError:
+            # might be caused because of backlog restoring some idiotic stuff, so not neccessarily a bug
+            log.critical('Unable to save task content into cache, if problem persists longer than a day please report this as a bug')
+        if self.persist:
+            # Store to database
+            log.debug('Storing cache %s to database.' % cache_name)
+            db_cache = task.session.query(InputCache).filter(InputCache.name == self.name).\
+                filter(InputCache.hash == hash).first()
+            if not db_cache:
+                db_cache = InputCache(name=self.name, hash=hash)
+            db_cache.entries = [InputCacheEntry(entry=e) for e in entries]
+            db_cache.added = datetime.now()
+            task.session.merge(db_cache)
+
+    def store_when_produced(self, task, cache_name, hash, response):
+        """
+        Yields entries from *response* iterator, and stores them to the cache after the last one.
+        Nothing is stored if consumer stops before all entries have been produced.
+        """
+        # entries are copied before they are yielded, they refer to the task after that
+        copies = []
+        produced = False
+        try:
+            for entry in response:
+                produced = True
+                if copies is not None:
+                    try:
+                        copies.append(copy.deepcopy(entry))
+                    except TypeError:
+                        log.critical('Unable to save task content into cache, if problem persists longer than a day '
+                                     'please report this as a bug')
+                        copies = None
+                yield entry
+        except PluginError as e:
+            # entries from the cache can be used instead only if none were produced yet
+            cached_entries = None if produced else self.load_db_cache_on_error(task, cache_name, hash, e)
+            if cached_entries is None:
+                raise
+            for entry in cached_entries:
+                yield entry
+            return
+        if copies is not None:
+            self.store(task, cache_name, hash, copies, copied=True)
+
 
 @event('manager.execute.started')
 def clear_cache(manager):
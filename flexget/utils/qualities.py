@@ -2,6 +2,9 @@ from __future__ import unicode_literals, division, absolute_import
 import re
 import copy
 import logging
+import sre_parse
+import sre_constants
+from flexget.utils.tools import LRUCache
 
 log = logging.getLogger('utils.qualities')
 
@@ -181,59 +184,209 @@ for items in (_resolutions, _sources, _codecs, _audios):
     for item in items:
         _registry[item.name] = item
 
+# All components of each type, including unknown
+_by_type = {}
+for items in (_resolutions, _sources, _codecs, _audios):
+    _by_type[items[0].type] = [_UNKNOWNS[items[0].type]] + items
+
+# Every component gets a bit of its own, a quality is the union of the bits of its components
+for bit, item in enumerate(item for items in _by_type.itervalues() for item in items):
+    item.bit = 1 << bit
+
+# Quality rank is packed from the modifier sum and component values, from most to least significant
+_VALUE_BITS = 8
+_MODIFIER_OFFSET = 1 << _VALUE_BITS - 1
+assert all(0 <= item.value < 1 << _VALUE_BITS for items in _by_type.itervalues() for item in items)
+
 
 def all_components():
     return _registry.itervalues()
 
 
+def _first_chars(items):
+    """
+    Finds the characters a parsed regexp can start with.
+
+    :param items: Parsed regexp from :func:`sre_parse.parse`
+    :returns: Tuple (set of lower case characters or None if any character, whether the regexp can match empty)
+    """
+    chars = set()
+    for op, av in items:
+        if op in (sre_constants.AT, sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            # zero width
+            continue
+        if op == sre_constants.LITERAL:
+            chars.add(unichr(av).lower())
+            return chars, False
+        if op == sre_constants.IN:
+            for in_op, in_av in av:
+                if in_op == sre_constants.LITERAL:
+                    chars.add(unichr(in_av).lower())
+                elif in_op == sre_constants.RANGE:
+                    chars.update(unichr(c).lower() for c in xrange(in_av[0], in_av[1] + 1))
+                else:
+                    return None, False
+            return chars, False
+        if op == sre_constants.SUBPATTERN:
+            branches, min_repeat = [av[1]], 1
+        elif op == sre_constants.BRANCH:
+            branches, min_repeat = av[1], 1
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+            branches, min_repeat = [av[2]], av[0]
+        else:
+            return None, False
+        nullable = False
+        for branch in branches:
+            branch_chars, branch_nullable = _first_chars(branch)
+            if branch_chars is None:
+                return None, False
+            chars.update(branch_chars)
+            nullable = nullable or branch_nullable
+        if min_repeat and not nullable:
+            return chars, False
+    return chars, True
+
+
+# Components which may match starting from a given (lower case) character, in registry order
+_by_first_char = {}
+_any_first_char = []
+for items in (_resolutions, _sources, _codecs, _audios):
+    for item in items:
+        first, nullable = _first_chars(sre_parse.parse(item.regexp.pattern, item.regexp.flags))
+        if first is None or nullable:
+            _any_first_char.append(item)
+        else:
+            for char in first:
+                _by_first_char.setdefault(char, []).append(item)
+for char in _by_first_char:
+    _by_first_char[char].extend(_any_first_char)
+
+# All component matches start from a word character which is not preceded by one
+_word_start = re.compile(r'(?<![^\W_])[^\W_]')
+
+
+def _scan(text):
+    """
+    Finds all quality components from *text* in one pass over the start of words.
+
+    :returns: Dict from component name to list of (start, end) of its matches in *text*
+    """
+    matches = {}
+    for word in _word_start.finditer(text):
+        start = word.start()
+        for component in _by_first_char.get(text[start].lower(), _any_first_char):
+            match = component.regexp.match(text, start)
+            if match:
+                matches.setdefault(component.name, []).append(match.span())
+    return matches
+
+
+#: Maximum number of parsed qualities kept in memory
+CACHE_SIZE = 10000
+
+# text -> Quality
+_cache = LRUCache(CACHE_SIZE)
+
+
 class Quality(object):
-    """Parses and stores the quality of an entry in the four component categories."""
+    """
+    Parses and stores the quality of an entry in the four component categories.
+
+    Qualities are immutable, and parsing the same text again returns the same cached instance.
+    """
+
+    def __new__(cls, text=''):
+        if not text:
+            return _UNKNOWN_QUALITY
+        quality = _cache.get(text)
+        if quality is None:
+            quality = object.__new__(cls)
+            quality._parse(text)
+            _cache[text] = quality
+        return quality
 
     def __init__(self, text=''):
         """
         :param text: A string to parse quality from
         """
-        self.text = text
-        self.clean_text = text
-        if text:
-            self.parse(text)
-        else:
-            self.resolution = _UNKNOWNS['resolution']
-            self.source = _UNKNOWNS['source']
-            self.codec = _UNKNOWNS['codec']
-            self.audio = _UNKNOWNS['audio']
 
-    def parse(self, text):
+    @classmethod
+    def _from_components(cls, text='', **components):
+        quality = object.__new__(cls)
+        quality._init(text, text, components)
+        return quality
+
+    def _init(self, text, clean_text, components):
+        """Sets the attributes of a new quality, and its precomputed rank and component bits."""
+        object.__setattr__(self, 'text', text)
+        object.__setattr__(self, 'clean_text', clean_text)
+        rank = bits = modifier = 0
+        for type in ('resolution', 'source', 'codec', 'audio'):
+            component = components.get(type) or _UNKNOWNS[type]
+            object.__setattr__(self, type, component)
+            rank = rank << _VALUE_BITS | component.value
+            bits |= component.bit
+            modifier += component.modifier or 0
+        # compares like _comparator, the modifier sum first and then the components in order
+        object.__setattr__(self, '_rank', (modifier + _MODIFIER_OFFSET) << _VALUE_BITS * 4 | rank)
+        object.__setattr__(self, '_bits', bits)
+
+    def _parse(self, text):
         """Parses a string to determine the quality in the four component categories.
 
+        Matches of all components are found in one pass. From each category the highest matching component is
+        chosen, unless a lower one with a modifier matches, and its text is removed before the next category.
+        Text matched by a lower component of the category is not matched again by higher ones, so that eg. `web`
+        of `web-rip` is not taken as webdl.
+
         :param text: The string to parse
         """
-        self.text = text
-        self.clean_text = text
-        self.resolution = self._find_best(_resolutions, _UNKNOWNS['resolution'])
-        self.source = self._find_best(_sources, _UNKNOWNS['source'])
-        self.codec = self._find_best(_codecs, _UNKNOWNS['codec'])
-        self.audio = self._find_best(_audios, _UNKNOWNS['audio'])
-        # If any of the matched components have defaults, set them now.
-        for component in self.components:
-            for default in component.defaults:
-                default = _registry[default]
-                if not getattr(self, default.type):
-                    setattr(self, default.type, default)
-
-    def _find_best(self, qlist, default=None):
-        """Finds the highest matching quality component from `qlist`"""
-        text = self.clean_text
-        result = None
-        for item in qlist:
-            match = item.matches(text)
-            if match[0]:
-                result = item
-                self.clean_text = match[1]
+        matches = _scan(text)
+        removed = []
+        found = {}
+        for qlist in (_resolutions, _sources, _codecs, _audios):
+            best_span = None
+            taken = list(removed)
+            for item in qlist:
+                for span in matches.get(item.name, []):
+                    # text of components found from earlier categories, or lower ones in this category, is taken
+                    if not any(span[0] < end and start < span[1] for start, end in taken):
+                        break
+                else:
+                    continue
+                found[item.type], best_span = item, span
+                taken.append(span)
                 if item.modifier is not None:
                     # If this item has a modifier, do not proceed to check higher qualities in the list
                     break
-        return result or default
+            if best_span:
+                removed.append(best_span)
+        # If any of the matched components have defaults, set them now.
+        for component in found.values():
+            for default in component.defaults:
+                default = _registry[default]
+                found.setdefault(default.type, default)
+        clean_text = text
+        for start, end in sorted(removed, reverse=True):
+            clean_text = clean_text[:start] + clean_text[end:]
+        self._init(text, clean_text, found)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Quality objects are immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('Quality objects are immutable')
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo=None):
+        return self
+
+    def __reduce__(self):
+        if self.text:
+            return Quality, (self.text,)
+        return _unpickle, (self.resolution.name, self.source.name, self.codec.name, self.audio.name)
 
     @property
     def name(self):
@@ -261,7 +414,7 @@ class Quality(object):
         return True
 
     def __nonzero__(self):
-        return any(self._comparator)
+        return self._rank != _UNKNOWN_RANK
 
     def __eq__(self, other):
         if isinstance(other, basestring):
@@ -272,7 +425,7 @@ class Quality(object):
             if other is None:
                 return False
             raise TypeError('Cannot compare %r and %r' % (self, other))
-        return self._comparator == other._comparator
+        return self._rank == other._rank
 
     def __ne__(self, other):
         return not self.__eq__(other)
@@ -284,7 +437,7 @@ class Quality(object):
                 raise TypeError('`%s` does not appear to be a valid quality string.' % other.text)
         if not isinstance(other, Quality):
             raise TypeError('Cannot compare %r and %r' % (self, other))
-        return self._comparator < other._comparator
+        return self._rank < other._rank
 
     def __ge__(self, other):
         return not self.__lt__(other)
@@ -304,7 +457,7 @@ class Quality(object):
 
     def __hash__(self):
         # Make these usable as dict keys
-        return hash(self.name)
+        return hash(self._rank)
 
 
 def get(quality_name):
@@ -320,10 +473,17 @@ def get(quality_name):
         found_components[component.type] = component
     if not found_components:
         raise ValueError('No quality specified')
-    result = Quality()
-    for type, component in found_components.iteritems():
-        setattr(result, type, component)
-    return result
+    return Quality._from_components(**found_components)
+
+
+def _unpickle(*names):
+    """Unpickles a quality which was not parsed from text."""
+    return Quality._from_components(**dict((_registry[name].type, _registry[name]) for name in names
+                                           if name in _registry))
+
+
+_UNKNOWN_QUALITY = Quality._from_components()
+_UNKNOWN_RANK = _UNKNOWN_QUALITY._rank
 
 
 class RequirementComponent(object):
@@ -340,6 +500,10 @@ class RequirementComponent(object):
         self.acceptable = []
         self.none_of = []
 
+    def mask(self, loose=False):
+        """:returns: Union of the bits of all components of this type which are allowed."""
+        return sum(comp.bit for comp in _by_type[self.type] if self.allows(comp, loose=loose))
+
     def allows(self, comp, loose=False):
         if comp.type != self.type:
             raise TypeError('Cannot compare %r against %s' % (comp, self.type))
@@ -401,6 +565,15 @@ class Requirements(object):
         self.audio = RequirementComponent('audio')
         if req:
             self.parse_requirements(req)
+        else:
+            self._compile()
+
+    def _compile(self):
+        """Precomputes bits of all allowed components, so that :meth:`allows` does not need to check components."""
+        self._mask = self._loose_mask = 0
+        for component in self.components:
+            self._mask |= component.mask()
+            self._loose_mask |= component.mask(loose=True)
 
     @property
     def components(self):
@@ -419,6 +592,7 @@ class Requirements(object):
         if self.text == 'any':
             for component in self.components:
                 component.reset()
+                self._compile()
                 return
 
         text = text.replace(',', ' ')
@@ -436,6 +610,8 @@ class Requirements(object):
                         component.add_requirement(part)
         except KeyError as e:
             raise ValueError('%s is not a valid quality component.' % e.message)
+        finally:
+            self._compile()
 
     def allows(self, qual, loose=False):
         """Determine whether this set of requirements allows a given quality.
@@ -449,10 +625,8 @@ class Requirements(object):
             qual = Quality(qual)
             if not qual:
                 raise TypeError('`%s` does not appear to be a valid quality string.' % qual.text)
-        for r_component, q_component in zip(self.components, qual.components):
-            if not r_component.allows(q_component, loose=loose):
-                return False
-        return True
+        # each component of the quality must be one of the allowed components of its type
+        return not qual._bits & ~(self._loose_mask if loose else self._mask)
 
     def __str__(self):
         return self.text or 'any'
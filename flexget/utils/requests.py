@@ -2,11 +2,13 @@ from __future__ import unicode_literals, division, absolute_import
 import urllib2
 import time
 import logging
+import threading
 from datetime import timedelta, datetime
 from urlparse import urlparse
 import requests
 # Allow some request objects to be imported from here instead of requests
 from requests import RequestException
+from flexget.event import event, fire_event
 from flexget.utils.tools import parse_timedelta
 
 log = logging.getLogger('requests')
@@ -19,6 +21,10 @@ unresponsive_hosts = {}
 # Time to wait before trying an unresponsive site again
 WAIT_TIME = timedelta(seconds=60)
 
+# Responses shared between sessions during one execution, keyed by :func:`_share_key`
+shared_responses = {}
+_shared_lock = threading.Lock()
+
 
 def is_unresponsive(url):
     """
@@ -60,22 +66,81 @@ def _wrap_urlopen(url, timeout=None):
         raise RequestException(msg)
     resp = requests.Response()
     resp.raw = raw
+    # urllib responses can not be read like urllib3 ones, so the content is read here
+    resp._content = raw.read()
+    resp._content_consumed = True
     resp.status_code = raw.code or 200
     resp.headers = requests.structures.CaseInsensitiveDict(raw.headers)
     return resp
 
 
+class SharedResponse(object):
+    """A response being fetched, other requests for the same key wait for it to complete."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+def _share_key(session, method, url, kwargs):
+    """
+    :returns: Key identifying identical requests made from *session*, or None if request should not be shared.
+    """
+    if method.upper() != 'GET' or kwargs.get('data') or kwargs.get('files'):
+        return None
+    headers = dict((k.lower(), v) for k, v in session.headers.iteritems())
+    headers.update((k.lower(), v) for k, v in (kwargs.get('headers') or {}).iteritems())
+    params = kwargs.get('params') or {}
+    if isinstance(params, dict):
+        params = sorted(params.iteritems())
+    cookies = sorted((c.domain, c.path, c.name, c.value) for c in session.cookies)
+    cookies.extend(sorted((kwargs.get('cookies') or {}).items()))
+    try:
+        key = (url, repr(params), repr(kwargs.get('auth') or session.auth), tuple(sorted(headers.iteritems())),
+               tuple(cookies))
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def _copy_response(response):
+    """
+    :returns: New response with the already read content of *response*, so callers can not affect each other.
+    """
+    copy = requests.Response()
+    for attr in ('status_code', 'headers', 'url', 'encoding', 'reason', 'cookies', 'history', 'request'):
+        if hasattr(response, attr):
+            setattr(copy, attr, getattr(response, attr))
+    copy._content = response.content
+    copy._content_consumed = True
+    return copy
+
+
+@event('manager.execute.started')
+@event('manager.execute.completed')
+def clear_shared_responses(manager):
+    """Shared responses are valid only for one execution."""
+    with _shared_lock:
+        shared_responses.clear()
+
+
 class Session(requests.Session):
     """
     Subclass of requests Session class which defines some of our own defaults, records unresponsive sites,
     and raises errors by default.
 
+    GET requests made with `share_response`, or from sessions created with `share_responses`, share their responses
+    with each other during an execution, identical requests made by several tasks result in only one request to the
+    site. Only use it for requests without side effects, eg. fetching feeds.
     """
 
-    def __init__(self, timeout=30, max_retries=1):
+    def __init__(self, timeout=30, max_retries=1, share_responses=False):
         """Set some defaults for our session if not explicitly defined."""
         requests.Session.__init__(self)
         self.timeout = timeout
+        self.share_responses = share_responses
         self.stream = True
         self.adapters['http://'].max_retries = max_retries
         # Stores min intervals between requests for certain sites
@@ -103,12 +168,56 @@ class Session(requests.Session):
         """
         Does a request, but raises Timeout immediately if site is known to timeout, and records sites that timeout.
         Also raises errors getting the content by default.
+
+        Fires ``requests.completed`` event with parameters *url, response, took* after each request.
+
+        Pass ``share_response=True`` to share the GET response with identical requests of other tasks, or
+        ``share_response=False`` to always do the request from a session created with `share_responses`.
         """
 
         # Raise Timeout right away if site is known to timeout
         if is_unresponsive(url):
             raise requests.Timeout('Requests to this site are known to timeout.')
 
+        share = kwargs.pop('share_response', self.share_responses)
+        key = share and _share_key(self, method, url, kwargs)
+        if not key:
+            return self._request(method, url, *args, **kwargs)
+
+        raise_status = kwargs.pop('raise_status', True)
+        with _shared_lock:
+            shared = shared_responses.get(key)
+            owner = shared is None
+            if owner:
+                shared = shared_responses[key] = SharedResponse()
+        if owner:
+            try:
+                shared.response = self._request(method, url, raise_status=False, *args, **kwargs)
+                # Read the content so that it can be given to everyone waiting
+                shared.response.content
+            except Exception as e:
+                shared.error = e
+                with _shared_lock:
+                    shared_responses.pop(key, None)
+                raise
+            finally:
+                shared.done.set()
+        else:
+            if not shared.done.is_set():
+                log.debug('Waiting for identical request to %s' % url)
+            shared.done.wait()
+            if shared.error is not None:
+                raise shared.error
+            log.debug('Using shared response for %s' % url)
+
+        result = _copy_response(shared.response)
+        if raise_status:
+            result.raise_for_status()
+        return result
+
+    def _request(self, method, url, *args, **kwargs):
+        """Does the actual request, see :meth:`request`."""
+
         # Check if we need to add a delay before request to this site
         for domain, domain_dict in self.domain_delay.iteritems():
             if domain in url:
@@ -126,9 +235,12 @@ class Session(requests.Session):
         kwargs.setdefault('timeout', self.timeout)
         raise_status = kwargs.pop('raise_status', True)
 
+        start = time.time()
         # If we do not have an adapter for this url, pass it off to urllib
         if not any(url.startswith(adapter) for adapter in self.adapters):
-            return _wrap_urlopen(url, timeout=kwargs['timeout'])
+            result = _wrap_urlopen(url, timeout=kwargs['timeout'])
+            fire_event('requests.completed', url, result, time.time() - start)
+            return result
 
         try:
             result = requests.Session.request(self, method, url, *args, **kwargs)
@@ -136,6 +248,7 @@ class Session(requests.Session):
             # Mark this site in known unresponsive list
             set_unresponsive(url)
             raise
+        fire_event('requests.completed', url, result, time.time() - start)
 
         if raise_status:
             result.raise_for_status()
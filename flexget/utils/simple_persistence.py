@@ -8,19 +8,29 @@ can replace underlying mechanism in single point (and provide transparent switch
 """
 
 from __future__ import unicode_literals, division, absolute_import
+import copy
 import logging
 from datetime import datetime
 import pickle
+import threading
+import weakref
 from sqlalchemy import Column, Integer, String, DateTime, PickleType, select, Index
 from UserDict import DictMixin
 from flexget import schema
 from flexget.manager import Session
+from flexget.event import event
 from flexget.utils.database import safe_pickle_synonym
 from flexget.utils.sqlalchemy_utils import table_schema, create_index
+from flexget.utils.tools import chunked
 
 log = logging.getLogger('util.simple_persistence')
 Base = schema.versioned_base('simple_persistence', 2)
 
+# all persistence instances by id, so that their unsaved changes can be discarded between executions
+_instances = weakref.WeakValueDictionary()
+# (taskname, plugin) -> {key: value}, shared by all instances so they see each others changes
+_cache = {}
+_lock = threading.RLock()
 
 @schema.upgrade('simple_persistence')
 def upgrade(ver, session):
@@ -69,63 +79,154 @@ class SimpleKeyValue(Base):
 Index('ix_simple_persistence_feed_plugin_key', SimpleKeyValue.task, SimpleKeyValue.plugin, SimpleKeyValue.key)
 
 
-class SimplePersistence(DictMixin):
+class SimplePersistence(DictMixin, object):
+    """
+    Dictionary of values stored for *plugin*. All keys of the plugin are loaded with one query on first access and
+    later reads are served from memory, the loaded values are shared by all instances for the same task and plugin.
+    Values are written to the database as they are set, unless :attr:`write_back` is enabled, in which case changed
+    keys are written by :meth:`flush`.
+
+    Values are copied when they are read and set, modifying a mutable value in place does not change the stored
+    value, it must be set again.
+    """
+
+    #: Changed keys are kept in memory until :meth:`flush`
+    write_back = False
 
     def __init__(self, plugin, session=None):
-        self.taskname = None
-        self.plugin = plugin
-        self.session = session
+        self._taskname = None
+        self._plugin = plugin
+        self._session = session
+        # (taskname, plugin) -> set of keys changed by this instance
+        self._dirty = {}
+        _instances[id(self)] = self
 
-    def __setitem__(self, key, value):
+    @property
+    def plugin(self):
+        return self._plugin
+
+    @property
+    def taskname(self):
+        return self._taskname
+
+    @property
+    def session(self):
+        return self._session
+
+    def _values(self):
+        """:returns: Dict of all values for current task and plugin, loaded with one query."""
+        ident = (self.taskname, self.plugin)
+        values = _cache.get(ident)
+        if values is None:
+            session = self.session or Session()
+            try:
+                values = {}
+                for skv in session.query(SimpleKeyValue).filter(SimpleKeyValue.task == self.taskname).\
+                        filter(SimpleKeyValue.plugin == self.plugin).order_by(SimpleKeyValue.id):
+                    values.setdefault(skv.key, skv.value)
+            finally:
+                if not self.session:
+                    session.close()
+            log.trace('loaded %s keys for %s' % (len(values), self.plugin))
+            _cache[ident] = values
+        return values
+
+    def _changed(self, key):
+        ident = (self.taskname, self.plugin)
+        if self.write_back:
+            self._dirty.setdefault(ident, set()).add(key)
+            return
         session = self.session or Session()
-        skv = session.query(SimpleKeyValue).filter(SimpleKeyValue.task == self.taskname).\
-            filter(SimpleKeyValue.plugin == self.plugin).filter(SimpleKeyValue.key == key).first()
-        if skv:
-            # update existing
-            log.debug('updating key %s value %s' % (key, repr(value)))
-            skv.value = value
-        else:
-            # add new key
-            skv = SimpleKeyValue(self.taskname, self.plugin, key, value)
-            log.debug('adding key %s value %s' % (key, repr(value)))
-            session.add(skv)
-        if not self.session:
-            # If we created a temporary session for this call, make sure we commit
-            session.commit()
-            session.close()
+        try:
+            self._write(session, ident, [key])
+            if not self.session:
+                # If we created a temporary session for this call, make sure we commit
+                session.commit()
+        finally:
+            if not self.session:
+                session.close()
+
+    def _write(self, session, ident, keys):
+        """Writes *keys* of *ident* from the cache to the database, deleting keys no longer in the cache."""
+        taskname, plugin = ident
+        values = _cache.get(ident, {})
+        existing = {}
+        for chunk in chunked(keys):
+            for skv in session.query(SimpleKeyValue).filter(SimpleKeyValue.task == taskname).\
+                    filter(SimpleKeyValue.plugin == plugin).filter(SimpleKeyValue.key.in_(chunk)):
+                existing.setdefault(skv.key, []).append(skv)
+        for key in keys:
+            if key not in values:
+                log.debug('deleting key %s' % key)
+                for skv in existing.get(key, []):
+                    session.delete(skv)
+            elif key in existing:
+                # update existing
+                log.debug('updating key %s value %s' % (key, repr(values[key])))
+                for skv in existing[key]:
+                    skv.value = values[key]
+            else:
+                # add new key
+                log.debug('adding key %s value %s' % (key, repr(values[key])))
+                session.add(SimpleKeyValue(taskname, plugin, key, values[key]))
+
+    def flush(self):
+        """Writes all changed keys to the database using current session."""
+        with _lock:
+            dirty, self._dirty = self._dirty, {}
+            if not dirty:
+                return
+            session = self.session or Session()
+            try:
+                for ident, keys in dirty.iteritems():
+                    self._write(session, ident, sorted(keys))
+                if not self.session:
+                    session.commit()
+            finally:
+                if not self.session:
+                    session.close()
+
+    def invalidate(self):
+        """Discards changes which have not been flushed, values they touched are loaded again on next access."""
+        with _lock:
+            for ident in self._dirty:
+                _cache.pop(ident, None)
+            self._dirty = {}
+
+    def __setitem__(self, key, value):
+        with _lock:
+            self._values()[key] = copy.deepcopy(value)
+            self._changed(key)
 
     def __getitem__(self, key):
-        session = self.session or Session()
-        skv = session.query(SimpleKeyValue).filter(SimpleKeyValue.task == self.taskname).\
-            filter(SimpleKeyValue.plugin == self.plugin).filter(SimpleKeyValue.key == key).first()
-        if not self.session:
-            session.close()
-        if not skv:
-            raise KeyError('%s is not contained in the simple_persistence table.' % key)
-        else:
-            return skv.value
+        with _lock:
+            values = self._values()
+            if key not in values:
+                raise KeyError('%s is not contained in the simple_persistence table.' % key)
+            return copy.deepcopy(values[key])
 
     def __delitem__(self, key):
-        session = self.session or Session()
-        session.query(SimpleKeyValue).filter(SimpleKeyValue.task == self.taskname).\
-            filter(SimpleKeyValue.plugin == self.plugin).filter(SimpleKeyValue.key == key).delete()
-        if not self.session:
-            session.commit()
-            session.close()
+        with _lock:
+            self._values().pop(key, None)
+            self._changed(key)
+
+    def __contains__(self, key):
+        with _lock:
+            return key in self._values()
 
     def keys(self):
-        session = self.session or Session()
-        query = session.query(SimpleKeyValue.key).filter(SimpleKeyValue.task == self.taskname).\
-            filter(SimpleKeyValue.plugin == self.plugin).all()
-        if query:
-            return [item.key for item in query]
-        else:
-            return []
+        with _lock:
+            return list(self._values())
 
 
 class SimpleTaskPersistence(SimplePersistence):
+    """
+    Values of the plugin currently running in the task. During task execution changes are written back when
+    the task commits its session, and discarded if the task is aborted.
+    """
 
     def __init__(self, task):
+        super(SimpleTaskPersistence, self).__init__(None)
         self.task = task
 
     @property
@@ -139,3 +240,24 @@ class SimpleTaskPersistence(SimplePersistence):
     @property
     def session(self):
         return self.task.session
+
+    def begin(self):
+        """Called when task execution starts, changes are kept until :meth:`flush`."""
+        self.invalidate()
+        self.write_back = True
+
+    def end(self):
+        """Called when task execution has ended, any changes which were not flushed are discarded."""
+        if self._dirty:
+            log.debug('discarding unsaved changes of %s' % ', '.join('%s' % plugin for task, plugin in self._dirty))
+        self.invalidate()
+        self.write_back = False
+
+
+@event('manager.execute.started')
+def invalidate_caches(manager):
+    """Values may have been changed by other processes between executions."""
+    with _lock:
+        for persistence in _instances.values():
+            persistence.invalidate()
+        _cache.clear()
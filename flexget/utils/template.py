@@ -1,7 +1,6 @@
 from __future__ import unicode_literals, division, absolute_import
 import logging
 import os
-import re
 import sys
 from copy import copy
 from datetime import datetime, date, time
@@ -16,6 +15,7 @@ from jinja2 import (Environment, StrictUndefined, ChoiceLoader,
 from flexget.event import event
 from flexget.plugin import PluginError
 from flexget.utils.pathscrub import pathscrub
+from flexget.utils.tools import compile_regexp
 
 log = logging.getLogger('utils.template')
 
@@ -55,14 +55,14 @@ def filter_pathscrub(val, os_mode=None):
 
 def filter_re_replace(val, pattern, repl):
     """Perform a regexp replacement on the given string."""
-    return re.sub(pattern, repl, unicode(val))
+    return compile_regexp(pattern).sub(repl, unicode(val))
 
 
 def filter_re_search(val, pattern):
     """Perform a search for given regexp pattern, return the matching portion of the text."""
     if not isinstance(val, basestring):
         return val
-    result = re.search(pattern, val)
+    result = compile_regexp(pattern).search(val)
     if result:
         return result.group(0)
     return ''
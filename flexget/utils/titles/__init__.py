@@ -1,5 +1,5 @@
 # make importing these a bit less hassle
 from __future__ import unicode_literals, division, absolute_import
-from flexget.utils.titles.series import SeriesParser, ID_TYPES
+from flexget.utils.titles.series import SeriesParser, SeriesIndex, ID_TYPES
 from flexget.utils.titles.movie import MovieParser
-from flexget.utils.titles.parser import TitleParser, ParseWarning
+from flexget.utils.titles.parser import TitleParser, ParseWarning, parse_cache
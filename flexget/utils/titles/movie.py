@@ -2,7 +2,7 @@ from __future__ import unicode_literals, division, absolute_import
 import logging
 import re
 
-from flexget.utils.titles.parser import TitleParser
+from flexget.utils.titles.parser import TitleParser, cached_parse
 from flexget.utils import qualities
 from flexget.utils.tools import str_to_int
 
@@ -35,6 +35,7 @@ class MovieParser(TitleParser):
     def __str__(self):
         return "<MovieParser(name=%s,year=%s,quality=%s)>" % (self.name, self.year, self.quality)
 
+    @cached_parse
     def parse(self, data=None):
         """Parse movie name. Populates name, year, quality and proper_count attributes"""
 
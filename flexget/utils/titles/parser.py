@@ -1,6 +1,17 @@
 from __future__ import unicode_literals, division, absolute_import
 import re
+import copy
+import functools
 
+from flexget.event import event
+from flexget.utils.tools import LRUCache
+
+#: Maximum number of results kept in :data:`parse_cache`
+PARSE_CACHE_SIZE = 20000
+
+#: Results of parsing titles, keyed by title, parser type, parser configuration and parse arguments.
+#: Cleared when execution starts.
+parse_cache = LRUCache(PARSE_CACHE_SIZE)
 
 class ParseWarning(Warning):
 
@@ -9,6 +20,47 @@ class ParseWarning(Warning):
         self.kwargs = kwargs
 
 
+def _arg_key(value):
+    # Qualities with equal components compare equal, text tells them apart
+    return repr(value), getattr(value, 'text', None)
+
+
+def cached_parse(func):
+    """
+    Decorates `parse` method of a :class:`TitleParser` to use :data:`parse_cache`.
+
+    Parse results are stored as a snapshot of parser attributes, including a :class:`ParseWarning` raised by the
+    parse. Parsers get their own copies of the attributes, so a cached result can not be modified through them.
+    """
+
+    @functools.wraps(func)
+    def parse(self, data=None, *args, **kwargs):
+        key = (type(self), data, None if data else self.data, self.fingerprint(), tuple(_arg_key(arg) for arg in args),
+               tuple(sorted((name, _arg_key(value)) for name, value in kwargs.iteritems())))
+        result = parse_cache.get(key)
+        if result is None:
+            warning = None
+            try:
+                func(self, data, *args, **kwargs)
+            except ParseWarning as pw:
+                warning = pw
+            result = copy.deepcopy(self.__dict__), warning
+            parse_cache[key] = result
+        else:
+            self.__dict__.update(copy.deepcopy(result[0]))
+            if result[1]:
+                raise ParseWarning(result[1].value, **result[1].kwargs)
+        if result[1]:
+            raise result[1]
+
+    return parse
+
+
+@event('manager.execute.started')
+def clear_parse_cache(manager):
+    parse_cache.clear()
+
+
 class TitleParser(object):
 
     propers = ['proper', 'repack', 'rerip', 'real', 'final']
@@ -28,6 +80,18 @@ class TitleParser(object):
 
     sounds = ['AC3', 'DD5.1', 'DTS']
 
+    def fingerprint(self):
+        """
+        :returns: Hashable configuration of the parser. Parsers of same type with equal fingerprints must give equal
+            results for any title.
+        """
+        return ()
+
+    @staticmethod
+    def patterns(regexps):
+        """:returns: Tuple of patterns in *regexps*, without compiling them."""
+        return tuple(getattr(regexp, 'pattern', regexp) for regexp in list.__iter__(regexps))
+
     @staticmethod
     def re_not_in_word(regexp):
         return r'(?<![^\W_])' + regexp + r'(?![^\W_])'
@@ -5,7 +5,7 @@ from datetime import datetime, timedelta
 
 from dateutil.parser import parse as parsedate
 
-from flexget.utils.titles.parser import TitleParser, ParseWarning
+from flexget.utils.titles.parser import TitleParser, ParseWarning, cached_parse
 from flexget.utils import qualities
 from flexget.utils.tools import ReList
 
@@ -172,6 +172,12 @@ class SeriesParser(TitleParser):
         res = '^' + ignore + blank + '*' + '(' + res + ')' + blank + '*'
         return res
 
+    def fingerprint(self):
+        return (self.name, self.identified_by, self.re_from_name, self.patterns(self.name_regexps),
+                tuple(self.patterns(getattr(self, mode + '_regexps')) for mode in ID_TYPES), self.strict_name,
+                tuple(self.allow_groups), self.allow_seasonless, self.date_dayfirst, self.date_yearfirst)
+
+    @cached_parse
     def parse(self, data=None, field=None, quality=None):
         # Clear the output variables before parsing
         self._reset()
@@ -582,3 +588,66 @@ class SeriesParser(TitleParser):
 
     def __eq__(self, other):
         return self is other
+
+
+class SeriesIndex(object):
+
+    """
+    Index of series names, used to find the few series a title could belong to instead of trying the name
+    regexp of every series on it.
+
+    Regexps generated by :meth:`SeriesParser.name_to_re` match the name at the start of the title, after an
+    optional ignored prefix, with any blanks between and inside the words. Names are stored in a character
+    trie with blanks removed, so that a title is a candidate for every series whose name is a prefix of it.
+    Series with custom name regexps are candidates for every title.
+    """
+
+    # Blanks are any non word characters except & and _, like in name_to_re
+    blank_re = re.compile(r'(?:[^\w&]|_)+', re.UNICODE)
+    prefix_res = [re.compile('^' + prefix, re.IGNORECASE | re.UNICODE) for prefix in SeriesParser.ignore_prefixes]
+
+    def __init__(self):
+        self._trie = {}
+        self._always = []
+
+    @classmethod
+    def squash(cls, text):
+        """:returns: *text* in lower case without blanks, with '&' spelled out as 'and'."""
+        return cls.blank_re.sub('', text).lower().replace('&', 'and')
+
+    def add(self, key, name, name_regexps=None):
+        """
+        :param key: Returned by :meth:`candidates` for titles which may match the series
+        :param string name: Series name
+        :param list name_regexps: Custom name regexps of the series, if any
+        """
+        if name_regexps:
+            self._always.append(key)
+            return
+        if name.endswith(')'):
+            # parenthetical is optional, same as in name_to_re
+            p_start = name.rfind('(')
+            if p_start != -1:
+                name = name[:p_start - 1]
+        node = self._trie
+        for char in self.squash(name):
+            node = node.setdefault(char, {})
+        node.setdefault(None, []).append(key)
+
+    def candidates(self, title):
+        """:returns: Set of keys of the series which may match *title*."""
+        found = set(self._always)
+        variants = [title]
+        for prefix_re in self.prefix_res:
+            match = prefix_re.match(title)
+            if match:
+                variants.append(title[match.end():])
+        for variant in variants:
+            node = self._trie
+            found.update(node.get(None, []))
+            for char in self.squash(variant):
+                node = node.get(char)
+                if node is None:
+                    break
+                found.update(node.get(None, []))
+        return found
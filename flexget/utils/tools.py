@@ -8,6 +8,7 @@ import time
 import re
 import sys
 import locale
+import threading
 from urlparse import urlparse
 from htmlentitydefs import name2codepoint
 from datetime import timedelta
@@ -314,7 +315,7 @@ class ReList(list):
     def __getitem__(self, k):
         item = list.__getitem__(self, k)
         if isinstance(item, basestring):
-            item = re.compile(item, re.IGNORECASE | re.UNICODE)
+            item = compile_regexp(item, self.flags)
             self[k] = item
         return item
 
@@ -322,6 +323,12 @@ class ReList(list):
         for i in range(len(self)):
             yield self[i]
 
+    def __deepcopy__(self, memo):
+        # regexps, compiled or not, are immutable
+        result = ReList(list.__iter__(self))
+        result.__dict__.update(self.__dict__)
+        return result
+
 
 # Determine the encoding for io
 io_encoding = None
@@ -368,3 +375,114 @@ def parse_timedelta(value):
         return timedelta(**params)
     except TypeError:
         raise ValueError('Invalid time format \'%s\'' % value)
+
+
+def chunked(seq, size=900):
+    """
+    Divides *seq* into lists of at most *size* items, eg. for IN queries of a size sqlite can handle (<1000).
+
+    :param seq: Any iterable
+    """
+    chunk = []
+    for item in seq:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class LRUCache(object):
+    """
+    Thread safe mapping of at most *size* items, least recently used items are dropped first.
+
+    Counts hits and misses of :meth:`get`, see :meth:`stats`.
+    """
+
+    # indexes of links in the list of items, a link is [previous link, next link, key, value]
+    _PREV, _NEXT, _KEY, _VALUE = 0, 1, 2, 3
+
+    def __init__(self, size=1000):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        # key -> link, links form a circular list from least to most recently used, starting after root
+        self._items = {}
+        self._root = []
+        self._root[:] = [self._root, self._root, None, None]
+        self._lock = threading.Lock()
+
+    def _unlink(self, link):
+        link[self._PREV][self._NEXT] = link[self._NEXT]
+        link[self._NEXT][self._PREV] = link[self._PREV]
+
+    def _append(self, link):
+        # most recently used end is just before root
+        last = self._root[self._PREV]
+        link[self._PREV], link[self._NEXT] = last, self._root
+        last[self._NEXT] = self._root[self._PREV] = link
+
+    def get(self, key, default=None):
+        with self._lock:
+            link = self._items.get(key)
+            if link is None:
+                self.misses += 1
+                return default
+            self._unlink(link)
+            self._append(link)
+            self.hits += 1
+            return link[self._VALUE]
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            link = self._items.get(key)
+            if link is not None:
+                self._unlink(link)
+                link[self._VALUE] = value
+            else:
+                link = self._items[key] = [None, None, key, value]
+            self._append(link)
+            while len(self._items) > self.size:
+                oldest = self._root[self._NEXT]
+                self._unlink(oldest)
+                del self._items[oldest[self._KEY]]
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._root[:] = [self._root, self._root, None, None]
+            self.hits = self.misses = 0
+
+    def stats(self):
+        """:returns: Dict with hits, misses, current and maximum size of the cache."""
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._items), 'max_size': self.size}
+
+
+#: Maximum number of compiled regexps kept in :data:`regexp_cache`
+REGEXP_CACHE_SIZE = 5000
+
+#: Compiled regexps shared by the whole process, keyed by pattern and flags
+regexp_cache = LRUCache(REGEXP_CACHE_SIZE)
+
+
+def compile_regexp(pattern, flags=0):
+    """
+    Compile regexp *pattern* with *flags*, or return it from :data:`regexp_cache` if it has been compiled before.
+    Already compiled regexps are returned as is.
+    """
+    if not isinstance(pattern, basestring):
+        return pattern
+    # str and unicode patterns compile differently even when they are equal
+    key = (type(pattern), pattern, flags)
+    regexp = regexp_cache.get(key)
+    if regexp is None:
+        regexp = re.compile(pattern, flags)
+        regexp_cache[key] = regexp
+    return regexp
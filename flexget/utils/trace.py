@@ -0,0 +1,182 @@
+"""
+Records a timeline of an execution in Chrome trace event format, which can be opened in chrome://tracing or
+Perfetto. Enabled with ``--trace-file``.
+
+Code is instrumented with :func:`span`, which does nothing when not tracing. Tasks, phases, plugins, lazy fields,
+plugin loading, HTTP requests and database commits are recorded as complete (``X``) events, one timeline row per
+thread.
+"""
+from __future__ import unicode_literals, division, absolute_import
+import os
+import json
+import time
+import logging
+import threading
+import weakref
+from urlparse import urlparse
+
+from flexget.event import add_event_handler, remove_event_handler
+
+log = logging.getLogger('trace')
+
+#: Active :class:`Tracer`, None when not tracing
+tracer = None
+
+# Plugin start times of tasks being executed
+_plugin_start = {}
+# Commit start times of sessions being committed
+_commit_start = weakref.WeakKeyDictionary()
+_sql_listening = False
+
+
+class Tracer(object):
+    """Collects spans as Chrome trace complete events."""
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.events = []
+        self.threads = {}
+
+    def add(self, name, category, start, end, **args):
+        """
+        Add span which has already ended.
+
+        :param string name: Name shown in timeline
+        :param string category: Category of the span, eg. task, phase or plugin
+        :param float start: Start time from :func:`time.time`
+        :param float end: End time from :func:`time.time`
+        :param args: Details shown for the span
+        """
+        thread = threading.current_thread()
+        if thread.ident not in self.threads:
+            self.threads[thread.ident] = thread.name
+        event = {'name': name, 'cat': category, 'ph': 'X', 'pid': self.pid, 'tid': thread.ident,
+                 'ts': int(start * 1000000), 'dur': int((end - start) * 1000000)}
+        if args:
+            event['args'] = args
+        # list.append is atomic, spans can be added from multiple threads
+        self.events.append(event)
+
+    def span(self, name, category, **args):
+        return Span(self, name, category, args)
+
+    def write(self, path):
+        """Write collected spans to file *path*."""
+        metadata = [{'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': ident, 'args': {'name': name}}
+                    for ident, name in self.threads.iteritems()]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': metadata + self.events, 'displayTimeUnit': 'ms'}, f)
+
+
+class Span(object):
+    """Context manager adding a span for the time spent in the block."""
+
+    def __init__(self, tracer, name, category, args):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.tracer.add(self.name, self.category, self.start, time.time(), **self.args)
+
+
+class NullSpan(object):
+    """Context manager which does nothing, used when not tracing."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        pass
+
+NULL_SPAN = NullSpan()
+
+
+def span(name, category, **args):
+    """
+    :returns: Context manager recording the time spent in the block, when tracing.
+    """
+    if tracer is None:
+        return NULL_SPAN
+    return tracer.span(name, category, **args)
+
+
+def _before_plugin(task, keyword):
+    _plugin_start[task.name] = time.time()
+
+
+def _after_plugin(task, keyword):
+    start = _plugin_start.pop(task.name, None)
+    if start is not None and tracer:
+        tracer.add(keyword, 'plugin', start, time.time(), task=task.name, phase=task.current_phase)
+
+
+def _request_completed(url, response, took):
+    if tracer:
+        end = time.time()
+        tracer.add(urlparse(url).netloc or url, 'http', end - took, end, url=url,
+                   status=getattr(response, 'status_code', None))
+
+
+def _before_commit(session):
+    if tracer:
+        _commit_start[session] = time.time()
+
+
+def _after_commit(session):
+    start = _commit_start.pop(session, None)
+    if start is not None and tracer:
+        tracer.add('commit', 'db', start, time.time())
+
+
+def _listen_sql():
+    global _sql_listening
+    if _sql_listening:
+        return
+    # listeners can not be removed in this SQLAlchemy version, they do nothing when not tracing
+    from sqlalchemy import event as sa_event
+    from sqlalchemy.orm import Session
+    sa_event.listen(Session, 'before_commit', _before_commit)
+    sa_event.listen(Session, 'after_commit', _after_commit)
+    _sql_listening = True
+
+_handlers = [('task.execute.before_plugin', _before_plugin),
+             ('task.execute.after_plugin', _after_plugin),
+             ('requests.completed', _request_completed)]
+
+
+def start():
+    """Start tracing."""
+    global tracer
+    if tracer:
+        return
+    tracer = Tracer()
+    _listen_sql()
+    for name, func in _handlers:
+        add_event_handler(name, func)
+
+
+def stop(path=None):
+    """
+    Stop tracing.
+
+    :param string path: Write recorded spans to this file, or discard them if not given.
+    """
+    global tracer
+    if not tracer:
+        return
+    for name, func in _handlers:
+        remove_event_handler(name, func)
+    stopped, tracer = tracer, None
+    if path:
+        try:
+            stopped.write(path)
+        except IOError as e:
+            log.error('Unable to write trace file %s: %s' % (path, e))
+        else:
+            log.info('Wrote trace of %s spans to %s' % (len(stopped.events), path))
@@ -12,6 +12,8 @@ class Errors(object):
         self.messages = []
         self.path = []
         self.path_level = None
+        # set when result depends on the filesystem, not only on validated data
+        self.checked_filesystem = False
 
     def count(self):
         """Return number of errors."""
@@ -457,6 +459,7 @@ class FileValidator(TextValidator):
     def validate(self, data):
         import os
 
+        self.errors.checked_filesystem = True
         if not os.path.isfile(os.path.expanduser(data)):
             self.errors.add('File %s does not exist' % data)
             return False
@@ -499,7 +502,10 @@ class PathValidator(TextValidator):
             if result:
                 path = os.path.dirname(data[0:result.start()])
 
-        if not self.allow_missing and not os.path.isdir(os.path.expanduser(path)):
+        if self.allow_missing:
+            return True
+        self.errors.checked_filesystem = True
+        if not os.path.isdir(os.path.expanduser(path)):
             self.errors.add('Path %s does not exist' % path)
             return False
         return True
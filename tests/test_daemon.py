@@ -0,0 +1,87 @@
+from __future__ import unicode_literals, division, absolute_import
+import os
+import json
+import socket
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+from tests import FlexGetBase
+from flexget.daemon import Daemon, read_lockfile, EOF
+
+
+class TestDaemon(FlexGetBase):
+
+    __yaml__ = """
+        daemon:
+          interval: 2 hours
+        tasks:
+          test:
+            mock:
+              - {title: 'entry 1', url: 'http://localhost/1'}
+            accept_all: yes
+          scheduled:
+            schedule: 10 minutes
+            mock:
+              - {title: 'entry 2', url: 'http://localhost/2'}
+          _disabled:
+            mock:
+              - {title: 'entry 3', url: 'http://localhost/3'}
+    """
+
+    def setup(self):
+        super(TestDaemon, self).setup()
+        fd, self.manager.lockfile = tempfile.mkstemp(prefix='.flexget-lock')
+        os.close(fd)
+        self.daemon = Daemon(self.manager)
+
+    def teardown(self):
+        try:
+            os.remove(self.manager.lockfile)
+        finally:
+            super(TestDaemon, self).teardown()
+
+    def test_schedule(self):
+        self.daemon.update_schedule()
+        due = self.daemon.pop_due()
+        assert sorted(due) == ['scheduled', 'test'], 'disabled task should not be scheduled, got %s' % due
+        self.daemon.reschedule(due)
+        now = datetime.now()
+        assert not self.daemon.pop_due(now), 'tasks should not be due right after execution'
+        assert self.daemon.pop_due(now + timedelta(minutes=11)) == ['scheduled']
+        assert self.daemon.pop_due(now + timedelta(hours=3)) == ['test']
+
+    def test_reschedule_replaces_previous(self):
+        self.daemon.update_schedule()
+        self.daemon.reschedule(['test'])
+        self.daemon.reschedule(['test'])
+        due = self.daemon.pop_due(datetime.now() + timedelta(hours=3))
+        assert due.count('test') == 1, 'outdated schedule entries should be skipped'
+
+    def test_control_socket(self):
+        output = []
+
+        def client():
+            while 'port' not in read_lockfile(self.manager.lockfile):
+                threading.Event().wait(0.05)
+            info = read_lockfile(self.manager.lockfile)
+            sock = socket.create_connection(('127.0.0.1', int(info['port'])))
+            try:
+                stream = sock.makefile('rw')
+                stream.write(json.dumps({'token': info['token'], 'options': {'onlytask': 'test'}}) + '\n')
+                stream.flush()
+                output.extend(line.rstrip('\n') for line in stream)
+            finally:
+                sock.close()
+                self.daemon.stop()
+
+        thread = threading.Thread(target=client)
+        thread.start()
+        self.daemon.run()
+        thread.join()
+        assert output and output[-1] == EOF, 'execution output should end with EOF'
+        # entry was accepted already by the scheduled execution when daemon started
+        assert any('entry 1' in line and 'already seen' in line for line in output), \
+            'output of execution should be sent to client'
+        assert not any('entry 2' in line for line in output), 'only task given in request should be executed'
+        assert self.manager.options.onlytask is None, 'options given in request should only apply to it'
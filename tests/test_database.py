@@ -0,0 +1,129 @@
+from __future__ import unicode_literals, division, absolute_import
+import os
+import time
+import tempfile
+import threading
+
+from tests import FlexGetBase
+from sqlalchemy.pool import NullPool
+
+from flexget.manager import Session
+from flexget.utils.simple_persistence import SimpleKeyValue
+
+
+class TestConcurrentReaders(FlexGetBase):
+
+    __yaml__ = """
+        database:
+          journal_mode: wal
+          synchronous: normal
+          busy_timeout: 100
+          cache_size: -4096
+        tasks:
+          test:
+            mock:
+              - {title: 'entry 1', url: 'http://localhost/1'}
+    """
+
+    def setup(self):
+        fd, self.db_file = tempfile.mkstemp(suffix='.sqlite')
+        os.close(fd)
+        self.database_uri = 'sqlite:///%s' % self.db_file
+        super(TestConcurrentReaders, self).setup()
+
+    def teardown(self):
+        try:
+            super(TestConcurrentReaders, self).teardown()
+        finally:
+            for suffix in ['', '-wal', '-shm']:
+                if os.path.exists(self.db_file + suffix):
+                    os.remove(self.db_file + suffix)
+
+    def test_pragmas(self):
+        connection = self.manager.engine.connect()
+        try:
+            assert connection.execute('PRAGMA journal_mode').scalar() == 'wal'
+            assert connection.execute('PRAGMA synchronous').scalar() == 1, 'synchronous should be normal'
+            assert connection.execute('PRAGMA cache_size').scalar() == -4096
+        finally:
+            connection.close()
+
+    def test_pool(self):
+        assert isinstance(self.manager.engine.pool, NullPool), 'connections should not be pooled with one worker'
+
+    def test_read_during_commit(self):
+        """Readers, such as webui, should not wait for a task holding the write lock."""
+        locked = threading.Event()
+        times = {}
+        counts = []
+
+        def write():
+            connection = self.manager.engine.connect()
+            try:
+                transaction = connection.begin()
+                # most restrictive lock a committing task can hold
+                connection.execute('BEGIN EXCLUSIVE')
+                for i in xrange(1000):
+                    connection.execute(SimpleKeyValue.__table__.insert(),
+                                       feed='test', plugin='test', key='key %s' % i, value=None)
+                locked.set()
+                time.sleep(1)
+                times['committed'] = time.time()
+                transaction.commit()
+            finally:
+                locked.set()
+                connection.close()
+
+        def read():
+            locked.wait()
+            session = Session()
+            try:
+                counts.append(session.query(SimpleKeyValue).filter(SimpleKeyValue.plugin == 'test').count())
+            finally:
+                session.close()
+            times.setdefault('read', []).append(time.time())
+
+        writer = threading.Thread(target=write)
+        readers = [threading.Thread(target=read) for _ in xrange(10)]
+        writer.start()
+        for reader in readers:
+            reader.start()
+        for thread in readers + [writer]:
+            thread.join()
+
+        assert counts == [0] * 10, 'readers should not see uncommitted rows, got %s' % counts
+        assert max(times['read']) < times['committed'], 'readers should not wait for the commit'
+        session = Session()
+        try:
+            assert session.query(SimpleKeyValue).filter(SimpleKeyValue.plugin == 'test').count() == 1000
+        finally:
+            session.close()
+
+
+class TestDefaults(FlexGetBase):
+
+    __yaml__ = """
+        tasks:
+          test:
+            mock:
+              - {title: 'entry 1', url: 'http://localhost/1'}
+    """
+
+    def setup(self):
+        fd, self.db_file = tempfile.mkstemp(suffix='.sqlite')
+        os.close(fd)
+        self.database_uri = 'sqlite:///%s' % self.db_file
+        super(TestDefaults, self).setup()
+
+    def teardown(self):
+        try:
+            super(TestDefaults, self).teardown()
+        finally:
+            os.remove(self.db_file)
+
+    def test_journal_mode(self):
+        connection = self.manager.engine.connect()
+        try:
+            assert connection.execute('PRAGMA journal_mode').scalar() == 'delete', 'wal should be used only if enabled'
+        finally:
+            connection.close()
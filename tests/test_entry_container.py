@@ -0,0 +1,85 @@
+from __future__ import unicode_literals, division, absolute_import
+
+from flexget.entry import Entry
+from flexget.task import EntryContainer, Task
+
+
+class FakeTask(object):
+    name = 'fake'
+    current_plugin = 'test'
+
+    def _run_entry_phase(self, phase, entry, **kwargs):
+        pass
+
+
+class TestEntryContainer(object):
+
+    def setup(self):
+        self.container = EntryContainer(task=FakeTask())
+        self.container.extend(Entry('entry %s' % i, 'http://localhost/%s' % i) for i in range(10))
+
+    def titles(self, entries):
+        return [entry['title'] for entry in entries]
+
+    def test_state_views(self):
+        c = self.container
+        c[3].accept()
+        c[1].accept()
+        c[5].reject()
+        c[7].fail()
+        assert self.titles(c.accepted) == ['entry 1', 'entry 3']
+        assert self.titles(c.rejected) == ['entry 5']
+        assert self.titles(c.failed) == ['entry 7']
+        assert len(c.entries) == 8
+        assert len(c.undecided) == 6
+        assert self.titles(c.entries) == ['entry %s' % i for i in [0, 1, 2, 3, 4, 6, 8, 9]]
+        assert c.accepted[1]['title'] == 'entry 3'
+        assert c.entries[4]['title'] == 'entry 4'
+        assert not c.accepted[5:]
+        c[1].reject()
+        assert self.titles(c.accepted) == ['entry 3']
+        assert self.titles(c.rejected) == ['entry 1', 'entry 5']
+
+    def test_change_during_iteration(self):
+        c = self.container
+        seen = []
+        for entry in c.entries:
+            seen.append(entry['title'])
+            if entry['title'] == 'entry 2':
+                # like a lazy filter, rejected entries later in the list are skipped
+                c[4].reject()
+            entry.accept()
+        assert 'entry 4' not in seen
+        assert len(seen) == 9
+        assert len(c.accepted) == 9
+        for entry in c.accepted:
+            entry.reject()
+        assert not c.accepted
+        assert len(c.rejected) == 10
+
+    def test_decided_during_iteration(self):
+        c = self.container
+        c.append(Entry('entry 4', 'http://localhost/4'))
+        task = FakeTask()
+        task.all_entries = c
+        seen = []
+        for entry in Task.undecided.fget(task):
+            seen.append(entry['title'])
+            if entry['title'] == 'entry 2':
+                c[4].reject()
+        assert seen.count('entry 4') == 0, 'entries with same title and url as rejected one should be skipped'
+        assert c.is_decided(c[10])
+        c[4].fail()
+        assert not c.is_decided(c[10]), 'failed entry is not decided'
+
+    def test_reorder(self):
+        c = self.container
+        c[0].accept()
+        c[9].accept()
+        c.accepted.sort(key=lambda e: e['title'], reverse=True)
+        assert self.titles(c.accepted) == ['entry 9', 'entry 0']
+        c.remove(c[0])
+        assert self.titles(c.accepted) == ['entry 0']
+        c[:] = []
+        assert not c.accepted
+        assert not c.entries
@@ -0,0 +1,68 @@
+from __future__ import unicode_literals, division, absolute_import
+
+from nose.tools import raises
+
+from flexget.event import add_event_handler, remove_event_handler, fire_event, get_events
+
+
+class TestEvents(object):
+
+    def setup(self):
+        self.called = []
+        self.funcs = []
+
+    def teardown(self):
+        for func in self.funcs:
+            try:
+                remove_event_handler('test.event', func)
+            except ValueError:
+                pass
+
+    def handler(self, name, priority):
+        def func():
+            self.called.append(name)
+        add_event_handler('test.event', func, priority)
+        self.funcs.append(func)
+        return func
+
+    def test_order(self):
+        self.handler('low', 50)
+        self.handler('first', 128)
+        self.handler('high', 200)
+        self.handler('second', 128)
+        fire_event('test.event')
+        assert self.called == ['high', 'first', 'second', 'low'], self.called
+
+    def test_priority_change(self):
+        self.handler('a', 100)
+        self.handler('b', 50)
+        get_events('test.event')[1].priority = 150
+        fire_event('test.event')
+        assert self.called == ['b', 'a'], self.called
+
+    def test_remove(self):
+        func = self.handler('a', 100)
+        self.handler('b', 50)
+        remove_event_handler('test.event', func)
+        fire_event('test.event')
+        assert self.called == ['b'], self.called
+
+    def test_remove_during_fire(self):
+        def remover():
+            remove_event_handler('test.event', other)
+            remove_event_handler('test.event', remover)
+        add_event_handler('test.event', remover, 200)
+        self.funcs.append(remover)
+        other = self.handler('other', 100)
+        fire_event('test.event')
+        # handlers removed while firing are still called for that event
+        assert self.called == ['other'], self.called
+        fire_event('test.event')
+        assert self.called == ['other'], self.called
+
+    @raises(ValueError)
+    def test_remove_unknown(self):
+        remove_event_handler('test.event', lambda: None)
+
+    def test_no_handlers(self):
+        fire_event('test.no_handlers')
@@ -1,5 +1,8 @@
 from __future__ import unicode_literals, division, absolute_import
 from tests import FlexGetBase
+from flexget.entry import Entry
+from flexget.plugin import register_plugin
+from flexget.utils.cached_input import cached
 
 
 class TestInputs(FlexGetBase):
@@ -44,3 +47,63 @@ class TestInputs(FlexGetBase):
         # TODO: fix this
         self.execute_task('test_no_url')
         assert len(self.task.entries) == 2, 'Should have created 2 entries'"""
+
+
+class StreamInput(object):
+    """Fake input producing entries lazily, records how many were produced."""
+
+    produced = 0
+
+    @cached('test_stream')
+    def on_task_input(self, task, config):
+        for i in xrange(config):
+            StreamInput.produced += 1
+            yield Entry(title='entry %s' % i, url='http://localhost/%s' % i)
+
+register_plugin(StreamInput, 'test_stream', api_ver=2)
+
+
+class TestStreamingInput(FlexGetBase):
+
+    __yaml__ = """
+        tasks:
+          test_stream:
+            test_stream: 10
+          test_max_entries:
+            test_stream: 1000
+            max_entries: 5
+            mock:
+              - {title: 'mock entry', url: 'http://localhost/mock'}
+          test_inputs:
+            inputs:
+              - test_stream: 3
+              - mock:
+                  - {title: 'entry 1', url: 'http://localhost/other'}
+    """
+
+    def setup(self):
+        super(TestStreamingInput, self).setup()
+        StreamInput.produced = 0
+        cached.cache = {}
+
+    def test_stream(self):
+        # Don't use execute_task, manager clears input cache before each execution
+        self.manager.create_tasks()
+        task = self.manager.tasks['test_stream']
+        task.execute()
+        assert len(task.entries) == 10, 'should have created 10 entries'
+        # cached once all entries were produced
+        task.execute()
+        assert len(task.entries) == 10, 'should have restored 10 entries from cache'
+        assert StreamInput.produced == 10, 'input should not be run again'
+
+    def test_max_entries(self):
+        self.execute_task('test_max_entries')
+        assert len(self.task.entries) == 5, 'should have stopped at max_entries'
+        assert StreamInput.produced == 5, 'input should not produce more entries than needed'
+        assert not self.task.find_entry(title='mock entry'), 'inputs after max_entries should not be run'
+        assert not cached.cache, 'partially consumed input should not be cached'
+
+    def test_inputs(self):
+        self.execute_task('test_inputs')
+        assert len(self.task.entries) == 3, 'duplicate from second input should be skipped'
@@ -5,6 +5,7 @@ from tests import FlexGetBase
 from nose.plugins.attrib import attr
 from nose.tools import raises
 from flexget.entry import EntryUnicodeError, Entry
+from flexget.plugin import register_plugin
 
 
 class TestDisableBuiltins(FlexGetBase):
@@ -161,6 +162,142 @@ class TestEntryUnicodeError(object):
         e['invalid'] = b'\x8e'
 
 
+class TestEntrySnapshots(object):
+
+    def test_snapshot_not_modified(self):
+        entry = Entry('title', 'url', tags=['a'], info={'size': 1})
+        entry.take_snapshot('first')
+        entry['tags'].append('b')
+        entry['info']['size'] = 2
+        entry['title'] = 'changed'
+        assert entry.snapshots['first']['tags'] == ['a'], 'in place change should not modify snapshot'
+        assert entry.snapshots['first']['info'] == {'size': 1}
+        assert entry.snapshots['first']['title'] == 'title'
+        assert entry['tags'] == ['a', 'b']
+
+    def test_unchanged_fields_shared(self):
+        entry = Entry('title', 'url', tags=['a'], other=['b'])
+        entry.take_snapshot('first')
+        entry['tags'].append('c')
+        entry.take_snapshot('second')
+        first, second = entry.snapshots['first'], entry.snapshots['second']
+        assert first['other'] is second['other'], 'unchanged field should be shared between snapshots'
+        assert first['tags'] is not second['tags']
+        assert second['tags'] == ['a', 'c']
+
+    def test_copied_entry(self):
+        entry = Entry('title', 'url', tags=['a'])
+        entry.take_snapshot('first')
+        copied = Entry(entry)
+        copied['tags'].append('b')
+        assert entry.snapshots['first']['tags'] == ['a'], 'copy of entry should not modify snapshot'
+        assert entry['tags'] == ['a']
+
+    def test_other_access_copies(self):
+        entry = Entry('title', 'url', tags=['a'], info={'size': 1}, other=['c'])
+        entry.take_snapshot('first')
+        entry.get('tags').append('b')
+        dict(entry.items())['info']['size'] = 2
+        for value in entry.values():
+            if value == ['c']:
+                value.append('d')
+        snapshot = entry.snapshots['first']
+        assert snapshot['tags'] == ['a'], 'change via get should not modify snapshot'
+        assert snapshot['info'] == {'size': 1}, 'change via items should not modify snapshot'
+        assert snapshot['other'] == ['c'], 'change via values should not modify snapshot'
+        assert entry['tags'] == ['a', 'b'] and entry['info'] == {'size': 2} and entry['other'] == ['c', 'd']
+
+    def test_lazy_field_evaluated(self):
+        def lazy_loader(entry, field):
+            entry['lazy_field'] = entry['title']
+            return entry['lazy_field']
+
+        entry = Entry('title', 'url')
+        entry.register_lazy_fields(['lazy_field'], lazy_loader)
+        entry.take_snapshot('first')
+        entry['title'] = 'changed'
+        assert entry.snapshots['first']['lazy_field'] == 'title', 'snapshot should store value of lazy field'
+
+
+class CountMetainfo(object):
+    """Fake metainfo plugin, records how many times it has been run."""
+
+    runs = 0
+
+    def on_task_metainfo(self, task, config):
+        CountMetainfo.runs += 1
+        for entry in task.entries:
+            entry['computed'] = CountMetainfo.runs
+
+register_plugin(CountMetainfo, 'test_count_metainfo', api_ver=2)
+
+
+class RerunFilter(object):
+    """Fake filter plugin, requests a rerun without reusing entries."""
+
+    def on_task_filter(self, task, config):
+        assert task._rerun_checkpoints is None, 'entries should not be checkpointed unless reuse is requested'
+        if not task.is_rerun:
+            task.rerun()
+
+register_plugin(RerunFilter, 'test_rerun_filter', api_ver=2)
+
+
+class TestRerun(FlexGetBase):
+
+    __yaml__ = """
+        tasks:
+          test_rerun:
+            mock:
+              - {title: 'entry a', url: 'http://localhost/a'}
+              - {title: 'entry b', url: 'http://localhost/b'}
+            test_count_metainfo: yes
+            regexp:
+              accept:
+                - entry a
+            rerun: yes
+          test_rerun_filter_changes:
+            mock:
+              - {title: 'entry c', url: 'http://localhost/c', name: 'a-b-c'}
+            manipulate:
+              - name:
+                  phase: filter
+                  replace:
+                    regexp: '-'
+                    format: '--'
+            rerun: yes
+          test_rerun_no_reuse:
+            mock:
+              - {title: 'entry d', url: 'http://localhost/d'}
+            test_count_metainfo: yes
+            test_rerun_filter: yes
+    """
+
+    def setup(self):
+        super(TestRerun, self).setup()
+        CountMetainfo.runs = 0
+
+    def test_reuse_entries(self):
+        self.execute_task('test_rerun')
+        assert self.task._rerun_count == 1, 'task should have been rerun'
+        assert CountMetainfo.runs == 1, 'metainfo should not be run again on rerun'
+        assert not self.task.find_entry(title='entry a'), 'accepted entry should not be processed again'
+        entry = self.task.find_entry('entries', title='entry b')
+        assert entry and entry.undecided, 'undecided entry should be processed again'
+        assert entry['computed'] == 1, 'metainfo from first run should be kept'
+
+    def test_filter_changes_not_reused(self):
+        self.execute_task('test_rerun_filter_changes')
+        assert self.task._rerun_count == 1, 'task should have been rerun'
+        entry = self.task.find_entry('entries', title='entry c')
+        assert entry['name'] == 'a--b--c', 'filter phase changes from first run should not be applied again'
+
+    def test_no_reuse(self):
+        self.execute_task('test_rerun_no_reuse')
+        assert self.task._rerun_count == 1, 'task should have been rerun'
+        assert CountMetainfo.runs == 2, 'metainfo should be run again when entries are not reused'
+
+
 class TestFilterRequireField(FlexGetBase):
 
     __yaml__ = """
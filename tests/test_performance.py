@@ -0,0 +1,58 @@
+from __future__ import unicode_literals, division, absolute_import
+import os
+import copy
+import json
+import shutil
+import tempfile
+
+from tests import FlexGetBase
+
+
+class TestTelemetry(FlexGetBase):
+
+    __yaml__ = """
+        tasks:
+          test:
+            mock:
+              - {title: 'entry 1', url: 'http://localhost/1'}
+              - {title: 'entry 2', url: 'http://localhost/2'}
+            accept_all: yes
+    """
+
+    def setup(self):
+        super(TestTelemetry, self).setup()
+        # plugin module must be imported by plugin loading, so that its options are registered
+        from flexget.plugins.cli.performance import enable, disable
+        self.disable = disable
+        self.tempdir = tempfile.mkdtemp()
+        self.manager.options = copy.copy(self.manager.options)
+        self.manager.options.telemetry_json = os.path.join(self.tempdir, 'telemetry.json')
+        self.manager.options.telemetry_prometheus = os.path.join(self.tempdir, 'telemetry.prom')
+        enable()
+
+    def teardown(self):
+        self.disable()
+        shutil.rmtree(self.tempdir)
+        super(TestTelemetry, self).teardown()
+
+    def test_json_lines(self):
+        self.execute_task('test')
+        self.execute_task('test')
+        with open(self.manager.options.telemetry_json) as f:
+            records = [json.loads(line) for line in f]
+        mock = [r for r in records if r['plugin'] == 'mock']
+        assert len(mock) == 2, 'should have appended a record for each execution'
+        assert mock[0]['phase'] == 'input'
+        assert mock[0]['entries_in'] == 0 and mock[0]['entries_out'] == 2
+        seen = [r for r in records if r['plugin'] == 'seen' and r['phase'] == 'filter']
+        assert seen and seen[0]['sql_queries'] > 0, 'seen filter should have executed queries'
+
+    def test_prometheus(self):
+        self.execute_task('test')
+        with open(self.manager.options.telemetry_prometheus) as f:
+            lines = f.read().splitlines()
+        assert '# TYPE flexget_plugin_wall_seconds gauge' in lines
+        assert any(line.startswith('flexget_plugin_entries_out{task="test",phase="input",plugin="mock"} 2')
+                   for line in lines), 'should contain entries produced by mock input'
+        assert any(line.startswith('flexget_cache_hits{cache="title_parse"} ') for line in lines), \
+            'should contain title parse cache statistics'
@@ -1,5 +1,6 @@
 from __future__ import unicode_literals, division, absolute_import
 import os
+import sys
 import glob
 
 from nose.tools import raises
@@ -73,3 +74,69 @@ class TestExternalPluginLoading(FlexGetBase):
     def test_external_plugin_loading(self):
         self.execute_task('ext_plugin')
         assert self.task.find_entry(title='test entry'), 'External plugin did not create entry'
+
+
+class TestExecutionPlan(FlexGetBase):
+    __yaml__ = """
+        tasks:
+          test:
+            mock:
+              - {title: 'entry', url: 'http://localhost/entry'}
+            accept_all: yes
+    """
+
+    def test_plan_cached(self):
+        from flexget.task import Task
+        task = Task(self.manager, 'test', self.manager.config['tasks']['test'])
+        filters = task.execution_plan('filter')
+        assert [p.name for p in filters if p.name == 'accept_all'], 'accept_all missing from filter phase'
+        assert task.execution_plan('filter') is filters, 'execution plan should not be rebuilt'
+        handlers = [p.phase_handlers['filter'] for p in filters]
+        assert handlers == sorted(handlers, reverse=True), 'plugins not in priority order'
+
+    def test_plan_invalidated(self):
+        from flexget.task import Task
+        task = Task(self.manager, 'test', dict(self.manager.config['tasks']['test']))
+        filters = task.execution_plan('filter')
+        plugin.plugins_changed()
+        assert task.execution_plan('filter') is not filters, 'execution plan not rebuilt after plugins changed'
+        del task.config['accept_all']
+        assert 'accept_all' not in [p.name for p in task.execution_plan('filter')], \
+            'execution plan not rebuilt after config change'
+
+
+class TestPluginManifest(object):
+    module = 'flexget.plugins.external_plugin'
+
+    def setup(self):
+        os.environ['FLEXGET_PLUGIN_PATH'] = os.path.join(os.path.dirname(__file__), 'external_plugins')
+        self.dirs = plugin.get_standard_plugins_path()
+        self.unload()
+
+    def teardown(self):
+        del os.environ['FLEXGET_PLUGIN_PATH']
+        plugin.load_deferred_plugins()
+
+    def unload(self):
+        sys.modules.pop(self.module, None)
+        plugin.plugins.pop('external_plugin', None)
+
+    def test_deferred(self):
+        records = plugin._load_plugins_from_dirs(self.dirs)
+        assert not records[self.module]['eager'], 'external_plugin should not need to be imported eagerly'
+        assert records[self.module]['plugins'][0]['name'] == 'external_plugin'
+        self.unload()
+        plugin._load_plugins_from_dirs(self.dirs, records)
+        assert self.module not in sys.modules, 'unchanged module should not be imported'
+        assert 'external_plugin' in plugin.get_plugin_keywords()
+        assert [p for p in plugin.get_plugins(phase='input') if p.name == 'external_plugin'], \
+            'deferred plugin should be loaded by get_plugins'
+        assert self.module in sys.modules
+
+    def test_changed_file(self):
+        records = plugin._load_plugins_from_dirs(self.dirs)
+        records[self.module]['file'][1] -= 1
+        self.unload()
+        plugin._load_plugins_from_dirs(self.dirs, records)
+        assert self.module in sys.modules, 'changed module should be imported'
+        assert 'external_plugin' in plugin.plugins
@@ -14,6 +14,26 @@ class TestQualityModule(object):
             got_val = Quality(test_val).name
             assert got_val == '720p', got_val
 
+    def test_cached(self):
+        assert Quality('Test.File.720p.hdtv') is Quality('Test.File.720p.hdtv'), 'parsed quality should be reused'
+        assert Quality('Test.File.720p.hdtv').clean_text == 'Test.File..'
+
+    def test_immutable(self):
+        import copy
+        import pickle
+        from flexget.utils.qualities import get
+
+        quality = Quality('720p hdtv')
+        try:
+            quality.source = get('bluray').source
+        except AttributeError:
+            pass
+        else:
+            assert False, 'quality should not be modifiable'
+        assert copy.deepcopy(quality) is quality
+        assert pickle.loads(pickle.dumps(quality)) is quality
+        assert pickle.loads(pickle.dumps(get('1080p bluray'))) == get('1080p bluray')
+
 
 class TestQualityParser(object):
 
@@ -40,6 +60,9 @@ class TestQualityParser(object):
                  ('Test.File.720p.h264.web.dl', '720p webdl h264'),
                  ('Test.File.1080p.web.x264', '1080p webdl h264'),
                  ('Test.File.web-dl', 'webdl'),
+                 ('Test.File.WEB-Rip', 'webrip'),
+                 ('Test.File.WEB.Rip', 'webrip'),
+                 ('Test.File.Web Rip.720p', '720p webrip'),
                  ('Test.File.720P', '720p'),
                  ('Test.File.1920x1080', '1080p'),
                  ('Test.File.1080i', '1080i'),
@@ -73,6 +96,52 @@ class TestQualityParser(object):
             assert quality == item[1], '`%s` quality should be `%s` not `%s`' % (item[0], item[1], quality)
 
 
+class TestQualityRanks(object):
+    """Precomputed ranks and requirement bits must give the same results as comparing components."""
+
+    def qualities(self):
+        import itertools
+        from flexget.utils import qualities
+
+        return [Quality._from_components(resolution=res, source=src, codec=codec, audio=audio)
+                for res, src, codec, audio in itertools.product(*[qualities._by_type[type] for type in
+                                                                  ('resolution', 'source', 'codec', 'audio')])]
+
+    def test_rank(self):
+        ordered = sorted(self.qualities(), key=lambda q: q._rank)
+        for lower, higher in zip(ordered, ordered[1:]):
+            assert lower._comparator <= higher._comparator, '%r should not be below %r' % (higher, lower)
+            assert (lower == higher) == (lower._comparator == higher._comparator)
+            assert (lower < higher) == (lower._comparator < higher._comparator)
+            assert bool(higher) == any(higher._comparator)
+
+    def test_requirements(self):
+        import random
+        from flexget.utils.qualities import Requirements, all_components
+
+        components = sorted(all_components(), key=lambda c: (c.type, c.value))
+        texts = ['any', '']
+        for comp in components:
+            texts.extend(fmt % comp.name for fmt in ('%s', '<%s', '<=%s', '>%s', '>=%s', '%s+', '!%s'))
+            texts.extend('%s-%s' % (comp.name, other.name) for other in components if other.type == comp.type)
+            texts.extend('%s|%s' % (comp.name, other.name) for other in components
+                         if other.type == comp.type and other is not comp)
+        random.seed(0)
+        texts.extend(' '.join(random.sample(texts[2:], 3)) for i in xrange(200))
+        qualities = self.qualities()
+        for text in texts:
+            try:
+                req = Requirements(text)
+            except ValueError:
+                continue
+            for quality in random.sample(qualities, 50):
+                for loose in (False, True):
+                    expected = all(r_comp.allows(q_comp, loose=loose)
+                                   for r_comp, q_comp in zip(req.components, quality.components))
+                    assert req.allows(quality, loose=loose) == expected, \
+                        '%s allows %r should be %s (loose=%s)' % (text, quality, expected, loose)
+
+
 class TestFilterQuality(FlexGetBase):
 
     __yaml__ = """
@@ -1,4 +1,5 @@
 from __future__ import unicode_literals, division, absolute_import
+import re
 from tests import FlexGetBase
 
 
@@ -139,3 +140,15 @@ class TestRegexp(FlexGetBase):
         self.execute_task('test_match_in_list')
         assert self.task.find_entry('accepted', title='expression'), '\'expression\' should have been accepted'
         assert self.task.find_entry('entries', title='regular') not in self.task.accepted, '\'regular\' should not have been accepted'
+
+
+class TestCompileRegexp(object):
+
+    def test_shared(self):
+        from flexget.utils.tools import compile_regexp, ReList
+        regexp = compile_regexp('foo.*bar', re.I)
+        assert compile_regexp('foo.*bar', re.I) is regexp, 'same pattern and flags should be compiled once'
+        assert compile_regexp('foo.*bar') is not regexp, 'different flags should compile separately'
+        assert compile_regexp(regexp) is regexp
+        relist = ReList(['foo.*bar'], flags=re.I)
+        assert relist[0] is regexp, 'ReList should use shared compiled regexps'
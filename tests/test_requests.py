@@ -0,0 +1,67 @@
+from __future__ import unicode_literals, division, absolute_import
+import os
+import threading
+
+from flexget.event import add_event_handler, remove_event_handler
+from flexget.utils import requests
+
+
+class TestSharedResponses(object):
+
+    url = 'file://' + os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rss.xml')
+
+    def setup(self):
+        requests.clear_shared_responses(None)
+        self.fetched = []
+        add_event_handler('requests.completed', self.completed)
+
+    def teardown(self):
+        remove_event_handler('requests.completed', self.completed)
+        requests.clear_shared_responses(None)
+
+    def completed(self, url, response, took):
+        self.fetched.append(url)
+
+    def test_shared(self):
+        first = requests.Session(share_responses=True).get(self.url)
+        second = requests.Session(share_responses=True).get(self.url)
+        assert len(self.fetched) == 1, 'should have fetched only once'
+        assert first.content == second.content
+        assert first is not second, 'each caller should get its own response'
+
+    def test_not_shared(self):
+        requests.Session(share_responses=True).get(self.url)
+        requests.Session().get(self.url)
+        requests.Session(share_responses=True).get(self.url, share_response=False)
+        assert len(self.fetched) == 3, 'should have fetched every time'
+
+    def test_opt_in(self):
+        requests.Session().get(self.url, share_response=True)
+        requests.Session().get(self.url, share_response=True)
+        assert len(self.fetched) == 1, 'requests opting in should be shared'
+
+    def test_different_headers(self):
+        session = requests.Session(share_responses=True)
+        session.get(self.url)
+        session.get(self.url, headers={'If-Modified-Since': 'Sat, 29 Oct 1994 19:43:31 GMT'})
+        assert len(self.fetched) == 2, 'requests with different headers should not be shared'
+
+    def test_concurrent(self):
+        responses = []
+
+        def fetch():
+            responses.append(requests.Session(share_responses=True).get(self.url))
+
+        threads = [threading.Thread(target=fetch) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(responses) == 5
+        assert len(self.fetched) == 1, 'concurrent requests should be coalesced'
+
+    def test_cleared(self):
+        requests.Session(share_responses=True).get(self.url)
+        requests.clear_shared_responses(None)
+        requests.Session(share_responses=True).get(self.url)
+        assert len(self.fetched) == 2, 'shared responses should be cleared between executions'
@@ -133,3 +133,197 @@ class TestFilterSeenMovies(FlexGetBase):
         self.execute_task('strict')
         assert len(self.task.rejected) == 1, 'Too many movies were rejected'
         assert not self.task.find_entry(title='Seen movie title 10'), 'strict should not have passed movie 10'
+
+
+class TestSeenPrefilter(FlexGetBase):
+
+    __yaml__ = """
+        presets:
+          global:
+            accept_all: yes
+        tasks:
+          learn:
+            mock:
+              - {title: 'item 1', url: 'http://localhost/1'}
+              - {title: 'item 2', url: 'http://localhost/2'}
+          filter:
+            mock:
+              - {title: 'item 1', url: 'http://localhost/new1'}
+              - {title: 'item 2 again', url: 'http://localhost/2'}
+              - {title: 'item 3', url: 'http://localhost/3'}
+    """
+
+    def check_filter(self):
+        self.execute_task('filter')
+        assert self.task.find_entry('rejected', title='item 1'), 'item 1 should be seen by title'
+        assert self.task.find_entry('rejected', title='item 2 again'), 'item 2 should be seen by url'
+        assert self.task.find_entry('accepted', title='item 3'), 'item 3 should not be seen'
+
+    def test_prefilter(self):
+        from flexget.plugins.filter.seen import prefilter
+        self.execute_task('learn')
+        assert 'item 1' in prefilter.bloom and 'http://localhost/2' in prefilter.bloom
+        self.check_filter()
+
+    def test_stored(self):
+        from flexget.plugins.filter.seen import prefilter
+        self.execute_task('learn')
+        # filter should be loaded from database
+        prefilter.reset()
+        self.check_filter()
+
+    def test_learned_elsewhere(self):
+        from flexget.manager import Session
+        from flexget.plugins.filter.seen import prefilter, SeenEntry, SeenField
+        self.execute_task('learn')
+        # another process learns, only database is changed
+        session = Session()
+        se = SeenEntry('item 3', 'other')
+        se.fields.append(SeenField('title', 'item 3'))
+        session.add(se)
+        session.commit()
+        session.close()
+        assert 'item 3' not in prefilter.bloom
+        self.execute_task('filter')
+        assert self.task.find_entry('rejected', title='item 3'), 'item 3 should be seen'
+
+    def test_removed_elsewhere(self):
+        from flexget.manager import Session
+        from flexget.plugins.filter.seen import prefilter, SeenEntry, SeenField
+        self.execute_task('learn')
+        last_field_id = prefilter.last_field_id
+        # another process removes the latest value and learns a new one
+        session = Session()
+        session.query(SeenField).filter(SeenField.id == last_field_id).delete()
+        se = SeenEntry('item 3', 'other')
+        se.fields.append(SeenField('title', 'item 3'))
+        session.add(se)
+        session.commit()
+        assert se.fields[0].id > last_field_id, 'id of removed value should not be reused'
+        session.close()
+        self.execute_task('filter')
+        assert self.task.find_entry('rejected', title='item 3'), 'item 3 should be seen'
+        session = Session()
+        assert prefilter.field_count == session.query(SeenField).count(), 'filter should have been built again'
+        session.close()
+
+    def test_forget(self):
+        from flexget.manager import Session
+        from flexget.plugins.filter.seen import prefilter, forget
+        self.execute_task('learn')
+        self.execute_task('filter')
+        assert forget('item 2') == (1, 2)
+        assert prefilter.bloom is None, 'filter should be built again after values are removed'
+        session = Session()
+        assert prefilter.load(session) is None and prefilter.bloom is None, 'stored filter should be removed'
+        session.close()
+        self.execute_task('filter')
+        assert self.task.find_entry('accepted', title='item 2 again'), 'item 2 should have been forgotten'
+
+    def test_learn_without_filter(self):
+        from flexget.manager import Session
+        from flexget.plugins.filter.seen import prefilter, learn_seen
+        self.execute_task('learn')
+        prefilter.reset()
+        session = Session()
+        learn_seen(session, 'other', [('item 3', [('title', 'item 3')])])
+        session.commit()
+        session.close()
+        assert 'item 3' in prefilter.bloom, 'learned value should be in filter'
+        self.execute_task('filter')
+        assert self.task.find_entry('rejected', title='item 3'), 'item 3 should be seen'
+
+
+class TestSeenLearn(FlexGetBase):
+
+    __yaml__ = """
+        tasks:
+          test:
+            mock:
+              - {title: 'item 1', url: 'http://localhost/1'}
+              - {title: 'item 2', url: 'http://localhost/1'}
+              - {title: 'item 3', url: 'http://localhost/3', original_url: 'http://localhost/3'}
+            accept_all: yes
+    """
+
+    def test_bulk_learn(self):
+        from flexget.plugin import get_plugin_by_name
+        from flexget.plugins.filter.seen import SeenEntry, SeenField
+        self.execute_task('test')
+        session = self.task.session
+        assert session.query(SeenEntry).count() == 3
+        assert session.query(SeenField).count() == 5, 'duplicate values should be learned only once'
+        item_2 = session.query(SeenEntry).filter(SeenEntry.title == 'item 2').one()
+        assert [sf.value for sf in item_2.fields] == ['item 2']
+
+        # learning again should not add anything
+        get_plugin_by_name('seen').instance.learn_entries(self.task, self.task.all_entries)
+        assert session.query(SeenEntry).count() == 3
+        assert session.query(SeenField).count() == 5
+
+    def test_learned_meanwhile(self):
+        import sys
+        from flexget.manager import Session
+        from flexget.plugins.filter.seen import SeenEntry, SeenField, learn_seen
+        seen_module = sys.modules[learn_seen.__module__]
+        self.execute_task('test')
+        # another task learns item 1 after this one has looked for it
+        find_seen = seen_module.find_seen
+        seen_module.find_seen = lambda *args, **kwargs: {}
+        session = Session()
+        try:
+            assert learn_seen(session, 'other', [('item 1', [('title', 'item 1')]), ('new', [('title', 'new')])]) == 1
+            assert learn_seen(session, 'other', [('item 1', [('title', 'item 1')])], local=True) == 1, \
+                'locally learned values should not be removed'
+            session.commit()
+        finally:
+            seen_module.find_seen = find_seen
+        assert session.query(SeenField).filter(SeenField.value == 'item 1').count() == 2
+        assert session.query(SeenEntry).filter(SeenEntry.task == 'other').count() == 2
+        session.close()
+
+
+class TestSeenCompact(FlexGetBase):
+
+    __yaml__ = """
+        tasks:
+          test:
+            mock:
+              - {title: 'item 1', url: 'http://localhost/1'}
+            accept_all: yes
+    """
+
+    def test_compact(self):
+        from datetime import datetime
+        from flexget.manager import Session
+        from flexget.plugins.filter.seen import SeenEntry, SeenField, compact, period_of
+
+        session = Session()
+        old = datetime(2000, 1, 1)
+        for task, month, values in [('test', 1, ['item 1', 'http://localhost/1']),
+                                    ('test', 2, ['item 1', 'http://localhost/2']),
+                                    ('test', 3, ['http://localhost/1']),
+                                    ('other', 3, ['item 1'])]:
+            se = SeenEntry('item', task)
+            se.added = old.replace(month=month)
+            se.period = period_of(se.added)
+            for value in values:
+                se.fields.append(SeenField('title', value))
+            session.add(se)
+        recent = SeenEntry('item', 'test')
+        recent.fields.append(SeenField('title', 'item 1'))
+        session.add(recent)
+        session.commit()
+
+        assert compact(session) == (1, 2), 'duplicate values in the same task should be removed'
+        periods = sorted(se.period for se in session.query(SeenEntry))
+        assert periods == [200000, 200000, 200000, period_of(datetime.now())], \
+            'old titles should be merged into yearly partition, recent ones kept in monthly partition'
+        assert sorted(sf.value for sf in session.query(SeenField)) == \
+            ['http://localhost/1', 'http://localhost/2', 'item 1', 'item 1', 'item 1']
+        assert compact(session) == (0, 0), 'nothing should be left to compact'
+        session.close()
+
+        # values are still seen
+        self.execute_task('test')
+        assert self.task.find_entry('rejected', title='item 1'), 'item 1 should still be seen'
@@ -1577,3 +1577,50 @@ class TestAutoLockin(FlexGetBase):
         assert len(self.task.accepted) == 4, 'All specials should have been accepted'
         self.execute_task('try_reg')
         assert len(self.task.accepted) == 2, 'Specials should not have caused episode type lock-in'
+
+
+class TestSeriesPreload(FlexGetBase):
+
+    __yaml__ = """
+        presets:
+          global:
+            series:
+              - Foo
+              - Bar
+              - Unseen
+        tasks:
+          test:
+            mock:
+              - {title: 'Foo S01E01 HDTV'}
+              - {title: 'Foo S01E01 720p HDTV'}
+              - {title: 'Bar S01E01 HDTV'}
+          test_again:
+            mock:
+              - {title: 'Foo S01E01 HDTV'}
+              - {title: 'Foo S01E02 HDTV'}
+              - {title: 'Bar S01E05 HDTV'}
+    """
+
+    def test_preload(self):
+        from flexget.plugins.filter.series import SeriesCache, Release, normalize_series_name
+        from flexget.manager import Session
+
+        self.execute_task('test')
+        assert SeriesCache.of(self.task.session), 'series should have been preloaded'
+        assert self.task.find_entry('accepted', title='Foo S01E01 720p HDTV')
+        assert self.task.find_entry('accepted', title='Bar S01E01 HDTV')
+
+        self.execute_task('test_again')
+        assert self.task.find_entry('rejected', title='Foo S01E01 HDTV'), 'downloaded episode should be rejected'
+        assert self.task.find_entry('accepted', title='Foo S01E02 HDTV')
+        assert self.task.find_entry('rejected', title='Bar S01E05 HDTV'), \
+            'latest download should be found from preloaded episodes'
+        # series instances are detached after the task, look them up by normalized name
+        cache = SeriesCache.of(self.task.session)
+        preloaded = set(name for name, series in cache.series.iteritems() if series in cache.episodes)
+        assert preloaded == set(normalize_series_name(name) for name in ['Foo', 'Bar']), \
+            'episodes should be preloaded only for series with entries'
+        session = Session()
+        assert session.query(Release).filter(Release.title == 'Foo S01E01 HDTV').count() == 1, \
+            'preloaded release should not be stored again'
+        session.close()
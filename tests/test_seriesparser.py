@@ -2,7 +2,7 @@
 
 from __future__ import unicode_literals, division, absolute_import
 from nose.tools import assert_raises, raises
-from flexget.utils.titles import SeriesParser, ParseWarning
+from flexget.utils.titles import SeriesParser, SeriesIndex, ParseWarning, parse_cache
 
 #
 # NOTE:
@@ -604,3 +604,78 @@ class TestSeriesParser(object):
         # bad data with leftover escaping
         s = self.parse(name=u"FlexGet's show", data=u"FlexGet\\'s show s01e01")
         assert s.valid
+
+
+class TestSeriesIndex(object):
+
+    def test_candidates(self):
+        index = SeriesIndex()
+        index.add('foo', 'Foo')
+        index.add('foo bar', 'Foo & Bar')
+        index.add('show', 'The Show (US)')
+        index.add('custom', 'Custom', name_regexps=['^cust'])
+        assert index.candidates('Foo.S01E01') == set(['foo', 'custom'])
+        assert index.candidates('foo and bar s01e01') == set(['foo', 'foo bar', 'custom'])
+        assert index.candidates('FooBar S01E01') == set(['foo', 'custom'])
+        assert index.candidates('[group] The.Show.(UK).S01E01') == set(['show', 'custom'])
+        assert index.candidates('Something S01E01') == set(['custom'])
+
+    def test_same_as_parser(self):
+        names = ['Foo', 'Foo & Bar', 'The Show (US)', "FlexGet's show", 'Foo 2']
+        titles = ['Foo S01E01', 'foo&bar s01e01', 'Foo.and.Bar.S01E02', 'HD 720p: The Show US S01E01',
+                  'FlexGets show s01e01', 'FlexGet show s01e01', 'Foo2 S02E03', 'Bar Foo S01E01', '[Foo] S01E01']
+        index = SeriesIndex()
+        for name in names:
+            index.add(name, name)
+        for title in titles:
+            candidates = index.candidates(title)
+            for name in names:
+                parser = SeriesParser(name)
+                parser.parse(title)
+                if parser.valid:
+                    assert name in candidates, '%s should be a candidate for %s' % (name, title)
+
+
+class TestParseCache(object):
+
+    def setup(self):
+        parse_cache.clear()
+
+    def test_cached(self):
+        s = SeriesParser(name='Something Interesting')
+        s.parse('Something.Interesting.S01E02.720p.HDTV-FlexGet')
+        assert parse_cache.stats()['misses'] == 1
+        s2 = SeriesParser(name='Something Interesting')
+        s2.parse('Something.Interesting.S01E02.720p.HDTV-FlexGet')
+        assert parse_cache.stats()['hits'] == 1, 'second parse should have been cached'
+        assert s2.valid and s2.identifier == 'S01E02' and s2.quality == s.quality
+
+    def test_config_changes_result(self):
+        title = 'Something Interesting foo S01E02'
+        s = SeriesParser(name='Something Interesting')
+        s.parse(title)
+        assert s.valid
+        s = SeriesParser(name='Something Interesting', strict_name=True)
+        s.parse(title)
+        assert not s.valid, 'parser with different configuration should not use cached result'
+
+    def test_result_not_shared(self):
+        title = 'Something.Interesting.S01E02.720p.HDTV-FlexGet'
+        s = SeriesParser(name='Something Interesting', allow_groups=['flexget'])
+        s.parse(title)
+        name_regexps = len(s.name_regexps)
+        s.allow_groups.append('other')
+        s.name_regexps.append('changed')
+        for i in range(2):
+            s2 = SeriesParser(name='Something Interesting', allow_groups=['flexget'])
+            s2.parse(title)
+            assert s2.allow_groups == ['flexget'], 'cached result should not be changed through parsers'
+            assert len(s2.name_regexps) == name_regexps
+            s2.allow_groups.append('other')
+        assert parse_cache.stats()['hits'] == 2
+
+    def test_warning(self):
+        for i in range(2):
+            s = SeriesParser(name='Something Interesting', identified_by='ep')
+            assert_raises(ParseWarning, s.parse, 'Something Interesting 2012.01.01')
+        assert parse_cache.stats()['hits'] == 1
@@ -1,5 +1,16 @@
 from __future__ import unicode_literals, division, absolute_import
 from tests import FlexGetBase
+from flexget.plugin import register_plugin
+
+
+class PersistAbort(object):
+    """Fake plugin which stores a value and aborts the task."""
+
+    def on_task_filter(self, task, config):
+        task.simple_persistence['value'] = 'stored'
+        task.abort('Aborted after storing value')
+
+register_plugin(PersistAbort, 'test_persist_abort', api_ver=2)
 
 
 class TestSimplePersistence(FlexGetBase):
@@ -9,6 +20,14 @@ class TestSimplePersistence(FlexGetBase):
           test:
             mock:
               - {title: 'irrelevant'}
+          interval:
+            interval: 1 day
+            mock:
+              - {title: 'irrelevant'}
+          aborted:
+            test_persist_abort: yes
+            mock:
+              - {title: 'irrelevant'}
     """
 
     def test_setdefault(self):
@@ -20,3 +39,41 @@ class TestSimplePersistence(FlexGetBase):
         value2 = task.simple_persistence.setdefault('test', 'def')
 
         assert value1 == value2, 'set default broken'
+
+    def test_write_back(self):
+        from flexget.manager import Session
+        from flexget.utils.simple_persistence import SimpleKeyValue
+
+        self.execute_task('interval')
+        session = Session()
+        assert session.query(SimpleKeyValue).filter(SimpleKeyValue.key == 'last_time').count() == 1, \
+            'value should be written when task commits'
+        session.close()
+
+        self.execute_task('aborted', abort_ok=True)
+        session = Session()
+        assert not session.query(SimpleKeyValue).filter(SimpleKeyValue.task == 'aborted').count(), \
+            'values of aborted task should not be written'
+        session.close()
+
+    def test_values_copied(self):
+        from flexget.utils.simple_persistence import SimplePersistence
+
+        persist = SimplePersistence('test_copied')
+        persist['list'] = [1]
+        persist['list'].append(2)
+        assert persist['list'] == [1], 'in place modification should not change stored value'
+        value = persist['list']
+        value.append(2)
+        persist['list'] = value
+        value.append(3)
+        assert persist['list'] == [1, 2], 'value should be stored as it was when set'
+
+    def test_shared_cache(self):
+        from flexget.utils.simple_persistence import SimplePersistence
+
+        first = SimplePersistence('test_shared')
+        second = SimplePersistence('test_shared')
+        assert 'key' not in second
+        first['key'] = 'value'
+        assert second.get('key') == 'value', 'instances of same plugin should see each others changes'
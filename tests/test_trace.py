@@ -0,0 +1,49 @@
+from __future__ import unicode_literals, division, absolute_import
+import os
+import json
+import tempfile
+
+from tests import FlexGetBase
+from flexget.utils import trace
+
+
+class TestTrace(FlexGetBase):
+
+    __yaml__ = """
+        tasks:
+          test:
+            mock:
+              - {title: 'entry 1', url: 'http://localhost/1'}
+            accept_all: yes
+    """
+
+    def setup(self):
+        super(TestTrace, self).setup()
+        fd, self.trace_file = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+
+    def teardown(self):
+        trace.stop()
+        os.remove(self.trace_file)
+        super(TestTrace, self).teardown()
+
+    def test_spans(self):
+        trace.start()
+        self.execute_task('test')
+        trace.stop(self.trace_file)
+        with open(self.trace_file) as f:
+            events = json.load(f)['traceEvents']
+        spans = set((event['cat'], event['name']) for event in events if event['ph'] == 'X')
+        assert ('task', 'test') in spans, 'should have a span for the task'
+        assert ('phase', 'filter') in spans, 'should have a span for each phase'
+        assert ('plugin', 'accept_all') in spans, 'should have a span for each plugin'
+        assert ('db', 'commit') in spans, 'should have a span for commits'
+        task_span = [event for event in events if event['ph'] == 'X' and event['cat'] == 'task'][0]
+        plugin_span = [event for event in events if event['name'] == 'accept_all'][0]
+        assert task_span['ts'] <= plugin_span['ts'] <= task_span['ts'] + task_span['dur'], \
+            'plugin span should be within task span'
+
+    def test_not_tracing(self):
+        with trace.span('nothing', 'test'):
+            pass
+        assert trace.tracer is None
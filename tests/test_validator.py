@@ -1,5 +1,7 @@
 from __future__ import unicode_literals, division, absolute_import
 from flexget import validator
+from flexget.task import Task, validation_stats, clear_validation_results
+from tests import FlexGetBase
 from tests.util import maketemp
 
 
@@ -107,3 +109,54 @@ class TestValidator(object):
         print path.errors.messages
         assert path.errors.messages, 'missing_directory should be invalid'
         path_allow_missing.errors.messages = []
+
+
+class TestTaskValidationCache(FlexGetBase):
+
+    __yaml__ = """
+        tasks:
+          test:
+            mock:
+              - {title: 'entry', url: 'http://localhost/entry'}
+            accept_all: yes
+          invalid:
+            accept_all: maybe
+          paths:
+            exists: /
+    """
+
+    def test_unchanged_config(self):
+        task = Task(self.manager, 'test', self.manager.config['tasks']['test'])
+        assert not task.validate()
+        hits = validation_stats['hits']
+        assert not task.validate()
+        assert validation_stats['hits'] == hits + 1, 'unchanged config should not be validated again'
+        task.config['accept_all'] = 'maybe'
+        assert task.validate(), 'changed config should be validated'
+        assert validation_stats['hits'] == hits + 1
+
+    def test_new_execution(self):
+        task = Task(self.manager, 'test', self.manager.config['tasks']['test'])
+        task.validate()
+        hits = validation_stats['hits']
+        clear_validation_results(self.manager)
+        task.validate()
+        assert validation_stats['hits'] == hits + 1, 'unchanged config should not be validated on new execution'
+
+    def test_filesystem(self):
+        task = Task(self.manager, 'paths', self.manager.config['tasks']['paths'])
+        assert not task.validate()
+        misses = validation_stats['misses']
+        task.validate()
+        assert validation_stats['misses'] == misses, 'paths should not be checked again during execution'
+        clear_validation_results(self.manager)
+        task.validate()
+        assert validation_stats['misses'] == misses + 1, 'paths should be checked again on new execution'
+
+    def test_cached_errors(self):
+        task = Task(self.manager, 'invalid', self.manager.config['tasks']['invalid'])
+        errors = task.validate()
+        assert errors, 'invalid config should have errors'
+        task = Task(self.manager, 'invalid', self.manager.config['tasks']['invalid'])
+        assert task.validate() == errors, 'errors should be returned from cache'
+        assert task.aborted, 'task with cached errors should be aborted'
@@ -0,0 +1,73 @@
+from __future__ import unicode_literals, division, absolute_import
+import os
+import tempfile
+
+from tests import FlexGetBase
+
+
+class TestWorkers(FlexGetBase):
+
+    __yaml__ = """
+        workers: 3
+        presets:
+          global:
+            accept_all: yes
+        tasks:
+          test_1:
+            mock:
+              - {title: 'entry 1', url: 'http://localhost/1'}
+              - {title: 'shared', url: 'http://localhost/shared'}
+          test_2:
+            mock:
+              - {title: 'entry 2', url: 'http://localhost/2'}
+              - {title: 'shared', url: 'http://localhost/shared'}
+          test_3:
+            mock:
+              - {title: 'entry 3', url: 'http://localhost/3'}
+          test_local:
+            seen: local
+            mock:
+              - {title: 'shared', url: 'http://localhost/shared'}
+    """
+
+    def setup(self):
+        # parallel execution is not possible with in-memory database
+        fd, self.db_filename = tempfile.mkstemp(suffix='.sqlite')
+        os.close(fd)
+        self.database_uri = 'sqlite:///%s' % self.db_filename
+        super(TestWorkers, self).setup()
+
+    def teardown(self):
+        try:
+            super(TestWorkers, self).teardown()
+        finally:
+            os.remove(self.db_filename)
+
+    def test_parallel(self):
+        from sqlalchemy.pool import QueuePool
+        assert self.manager.workers == 3
+        assert isinstance(self.manager.engine.pool, QueuePool), 'connections should be pooled for workers'
+        self.manager.execute()
+        for name, title in [('test_1', 'entry 1'), ('test_2', 'entry 2'), ('test_3', 'entry 3')]:
+            task = self.manager.tasks[name]
+            assert not task.aborted, '%s should not have aborted' % name
+            assert task.find_entry('accepted', title=title), '%s should have accepted %s' % (name, title)
+
+    def test_shared_seen(self):
+        from flexget.manager import Session
+        from flexget.plugins.filter.seen import SeenField
+
+        self.manager.execute()
+        # tasks filter at the same time, but values learned by one task are not stored again by the other
+        session = Session()
+        try:
+            count = session.query(SeenField).filter(SeenField.value == 'http://localhost/shared').count()
+        finally:
+            session.close()
+        assert count == 2, 'shared url should be learned once globally and once locally, got %s' % count
+        assert self.manager.tasks['test_local'].find_entry('accepted', title='shared'), \
+            'local seen task should not conflict with global seen'
+        self.manager.execute()
+        for name in ['test_1', 'test_2']:
+            assert not self.manager.tasks[name].find_entry('accepted', title='shared'), \
+                'shared entry should be seen by %s on next execution' % name